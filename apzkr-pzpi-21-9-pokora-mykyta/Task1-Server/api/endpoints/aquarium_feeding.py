@@ -1,12 +1,19 @@
 from datetime import datetime
 from functools import wraps
 
-from fastapi import APIRouter, Depends, HTTPException, Path, Query
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Optional, Union
 from schemas.feeding_schemas import FeedingScheduleCreate, FeedingScheduleResponse
-from schemas.water_parameter_schemas import WaterParameterResponse
+from schemas.water_parameter_schemas import (
+    WaterParameterResponse, WaterParameterRollupResponse, WaterParameterStatsResponse, WaterParameterChartResponse
+)
+from schemas.water_quality_schemas import WaterQualityThresholdCreate, WaterQualityThresholdResponse
+from services import water_parameter_export
 from services.device_feeding_service import DeviceFeedingService, get_device_feeding_service
+from services.pagination import Page
 from services.role_manager import RoleManager, get_role_manager
+from api.pagination import get_page, set_next_cursor
 from api.user import get_current_user
 
 aquarium_feeding_router = APIRouter(tags=["Годування акваріумів"], prefix="/aquariums/{aquarium_id}")
@@ -83,30 +90,136 @@ async def get_feeding_schedules(
 @require_permissions("manage_feeding")
 async def feed_now(
         aquarium_id: int = Path(..., description="ID акваріума"),
+        timeout: Optional[float] = Query(None, ge=0, le=60,
+                                         description="Скільки секунд чекати результату від пристрою; "
+                                                     "за замовчуванням - до вичерпання повторів"),
         current_user: dict = Depends(get_current_user),
         device_service: DeviceFeedingService = Depends(get_device_feeding_service),
         role_manager: RoleManager = Depends(get_role_manager)
 ):
     try:
-        result = await device_service.feed_now(aquarium_id)
+        result = await device_service.feed_now(aquarium_id, timeout)
         return result
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@aquarium_feeding_router.get("/water-parameters", response_model=List[WaterParameterResponse],
+@aquarium_feeding_router.get("/water-parameters",
+                             response_model=List[Union[WaterParameterResponse, WaterParameterRollupResponse]],
                              summary="Отримання параметрів мікроклімату акваріума")
 @require_permissions("view_water_parameters")
 async def get_water_parameters(
+        response: Response,
         aquarium_id: int = Path(..., description="ID акваріума"),
         start_date: datetime = Query(..., description="Початкова дата"),
         end_date: datetime = Query(..., description="Кінцева дата"),
+        max_points: Optional[int] = Query(None, gt=0,
+                                          description="Максимальна кількість точок; якщо сирих вимірювань більше, "
+                                                      "повертаються агрегати за хвилину, годину або добу"),
+        page: Optional[Page] = Depends(get_page),
         current_user: dict = Depends(get_current_user),
         device_service: DeviceFeedingService = Depends(get_device_feeding_service),
         role_manager: RoleManager = Depends(get_role_manager)
 ):
+    if max_points is not None and page is not None:
+        raise HTTPException(status_code=400, detail="Посторінковий вивід не поєднується з max_points")
     try:
-        water_parameters = device_service.get_water_parameters(aquarium_id, start_date, end_date)
-        return [WaterParameterResponse.from_orm(param) for param in water_parameters]
+        if max_points is not None:
+            return device_service.get_water_parameter_history(aquarium_id, start_date, end_date, max_points)
+        if page is not None:
+            parameters, next_cursor = device_service.get_water_parameters_page(aquarium_id, start_date, end_date, page)
+            set_next_cursor(response, next_cursor)
+            return parameters
+        return device_service.get_water_parameters(aquarium_id, start_date, end_date)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
+
+
+@aquarium_feeding_router.get("/water-parameters/stats", response_model=List[WaterParameterStatsResponse],
+                             summary="Статистика параметрів мікроклімату акваріума за інтервалами")
+@require_permissions("view_water_parameters")
+async def get_water_parameter_stats(
+        aquarium_id: int = Path(..., description="ID акваріума"),
+        start_date: datetime = Query(..., description="Початкова дата"),
+        end_date: datetime = Query(..., description="Кінцева дата"),
+        bucket_seconds: int = Query(3600, gt=0, description="Розмір інтервалу агрегації в секундах"),
+        current_user: dict = Depends(get_current_user),
+        device_service: DeviceFeedingService = Depends(get_device_feeding_service),
+        role_manager: RoleManager = Depends(get_role_manager)
+):
+    try:
+        return device_service.get_water_parameter_statistics(aquarium_id, start_date, end_date, bucket_seconds)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@aquarium_feeding_router.get("/water-parameters/chart", response_model=WaterParameterChartResponse,
+                             summary="Проріджені ряди параметрів мікроклімату для графіків")
+@require_permissions("view_water_parameters")
+async def get_water_parameter_chart(
+        aquarium_id: int = Path(..., description="ID акваріума"),
+        start_date: datetime = Query(..., description="Початкова дата"),
+        end_date: datetime = Query(..., description="Кінцева дата"),
+        max_points: int = Query(200, ge=10, le=5000, description="Максимальна кількість точок на показник"),
+        method: str = Query("lttb", pattern="^(lttb|minmax)$", description="Метод проріджування: lttb або minmax"),
+        current_user: dict = Depends(get_current_user),
+        device_service: DeviceFeedingService = Depends(get_device_feeding_service),
+        role_manager: RoleManager = Depends(get_role_manager)
+):
+    try:
+        return device_service.get_water_parameter_chart(aquarium_id, start_date, end_date, max_points, method)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@aquarium_feeding_router.get("/water-quality-thresholds", response_model=List[WaterQualityThresholdResponse],
+                             summary="Отримання порогів якості води акваріума")
+@require_permissions("view_water_parameters")
+async def get_water_quality_thresholds(
+        aquarium_id: int = Path(..., description="ID акваріума"),
+        current_user: dict = Depends(get_current_user),
+        device_service: DeviceFeedingService = Depends(get_device_feeding_service),
+        role_manager: RoleManager = Depends(get_role_manager)
+):
+    thresholds = device_service.get_water_quality_thresholds(aquarium_id)
+    return [WaterQualityThresholdResponse.from_orm(threshold) for threshold in thresholds]
+
+
+@aquarium_feeding_router.put("/water-quality-thresholds", response_model=List[WaterQualityThresholdResponse],
+                             summary="Встановлення порогів якості води акваріума")
+@require_permissions("manage_water_quality")
+async def set_water_quality_thresholds(
+        aquarium_id: int = Path(..., description="ID акваріума"),
+        thresholds: List[WaterQualityThresholdCreate] = ...,
+        current_user: dict = Depends(get_current_user),
+        device_service: DeviceFeedingService = Depends(get_device_feeding_service),
+        role_manager: RoleManager = Depends(get_role_manager)
+):
+    try:
+        updated = device_service.set_water_quality_thresholds(aquarium_id, thresholds)
+        return [WaterQualityThresholdResponse.from_orm(threshold) for threshold in updated]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@aquarium_feeding_router.get("/water-parameters/export", summary="Потокове вивантаження параметрів мікроклімату",
+                             response_class=StreamingResponse)
+@require_permissions("view_water_parameters")
+async def export_water_parameters(
+        aquarium_id: int = Path(..., description="ID акваріума"),
+        start_date: datetime = Query(..., description="Початкова дата"),
+        end_date: datetime = Query(..., description="Кінцева дата"),
+        export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$",
+                                   description="Формат вивантаження: ndjson або csv"),
+        current_user: dict = Depends(get_current_user),
+        device_service: DeviceFeedingService = Depends(get_device_feeding_service),
+        role_manager: RoleManager = Depends(get_role_manager)
+):
+    content = water_parameter_export.export_water_parameters(export_format, start_date, end_date,
+                                                             aquarium_id=aquarium_id)
+    return StreamingResponse(
+        content,
+        media_type=water_parameter_export.EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition":
+                 f'attachment; filename="aquarium_{aquarium_id}_water_parameters.{export_format}"'}
+    )
@@ -1,13 +1,20 @@
+from datetime import datetime
 from functools import wraps
 
-from fastapi import APIRouter, Depends, HTTPException, Query, Path
-from typing import List, Annotated
+from fastapi import APIRouter, Depends, HTTPException, Query, Path, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Annotated, Optional
 
 from data import Company, db_session
 from schemas.aquarium_schemas import AquariumResponse, AquariumCreate
 from schemas.company_schemas import CompanyCreate, CompanyUpdate, CompanyResponse, UserCompanyResponse
+from schemas.Iot_device_schemas import DevicePresenceResponse
+from services import water_parameter_export
 from services.company_service import CompanyService, get_company_manager
+from services.device_presence import PresenceIndex, get_presence_index
 from services.role_manager import RoleManager, get_role_manager
+from services.pagination import Page
+from api.pagination import get_page, set_next_cursor
 from api.user import get_current_user
 from sqlalchemy.orm import Session
 import logging
@@ -186,29 +193,88 @@ async def delete_company_aquarium(
                     summary="Отримання списку акваріумів компанії")
 @require_permissions("view_company_aquariums")
 async def get_company_aquariums(
+        response: Response,
         company_id: int = Path(..., description="ID компанії"),
+        page: Optional[Page] = Depends(get_page),
         current_user: dict = Depends(get_current_user),
         company_service: CompanyService = Depends(get_company_manager),
         role_manager: RoleManager = Depends(get_role_manager)
 ):
     try:
-        aquariums = company_service.get_company_aquariums(company_id, current_user['uid'])
+        aquariums, next_cursor = company_service.get_company_aquariums(company_id, current_user['uid'], page)
+        set_next_cursor(response, next_cursor)
         return [AquariumResponse.from_orm(aquarium) for aquarium in aquariums]
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
 
+@company_router.get("/{company_id}/devices/presence", response_model=List[DevicePresenceResponse],
+                    summary="Стан підключення всіх пристроїв компанії")
+@require_permissions("view_company_aquariums")
+async def get_company_devices_presence(
+        company_id: int = Path(..., description="ID компанії"),
+        current_user: dict = Depends(get_current_user),
+        presence: PresenceIndex = Depends(get_presence_index),
+        role_manager: RoleManager = Depends(get_role_manager)
+):
+    # Відповідь береться з індексу присутності в пам'яті, без запиту до бази
+    return [
+        DevicePresenceResponse(
+            unique_address=entry.unique_address,
+            aquarium_id=entry.aquarium_id,
+            online=entry.online,
+            connected_at=datetime.fromtimestamp(entry.connected_at) if entry.connected_at else None,
+            last_seen=datetime.fromtimestamp(entry.last_seen) if entry.last_seen else None,
+            rtt_ms=entry.rtt_ms,
+            firmware=entry.firmware
+        )
+        for entry in presence.company(company_id)
+    ]
+
+
 @company_router.get("/{company_id}/users", response_model=List[UserCompanyResponse],
                     summary="Отримання всіх користувачів компанії")
 @require_permissions("view_company_users")
 async def get_all_company_users(
+        response: Response,
         company_id: int = Path(..., description="ID компанії"),
+        page: Optional[Page] = Depends(get_page),
         current_user: dict = Depends(get_current_user),
         company_service: CompanyService = Depends(get_company_manager),
         role_manager: RoleManager = Depends(get_role_manager)
 ):
     try:
-        users = company_service.get_all_company_users(company_id)
+        users, next_cursor = company_service.get_all_company_users(company_id, page)
+        set_next_cursor(response, next_cursor)
         return [UserCompanyResponse.from_orm(user) for user in users]
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
+
+
+@company_router.get("/{company_id}/water-parameters/export",
+                    summary="Потокове вивантаження параметрів мікроклімату всіх акваріумів компанії",
+                    response_class=StreamingResponse)
+@require_permissions("view_water_parameters")
+async def export_company_water_parameters(
+        company_id: int = Path(..., description="ID компанії"),
+        start_date: datetime = Query(..., description="Початкова дата"),
+        end_date: datetime = Query(..., description="Кінцева дата"),
+        export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$",
+                                   description="Формат вивантаження: ndjson або csv"),
+        current_user: dict = Depends(get_current_user),
+        company_service: CompanyService = Depends(get_company_manager),
+        role_manager: RoleManager = Depends(get_role_manager)
+):
+    try:
+        company_service.get_user_company(company_id, current_user['uid'])
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    content = water_parameter_export.export_water_parameters(export_format, start_date, end_date,
+                                                             company_id=company_id)
+    return StreamingResponse(
+        content,
+        media_type=water_parameter_export.EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition":
+                 f'attachment; filename="company_{company_id}_water_parameters.{export_format}"'}
+    )
@@ -1,9 +1,11 @@
 from functools import wraps
-from fastapi import APIRouter, Depends, HTTPException, Path, Query, Body
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Body, Response
 from typing import List, Optional
 from schemas.fish_schemas import FishCreate, FishUpdate, FishResponse
 from services.company_service import CompanyService, get_company_manager
+from services.pagination import Page
 from services.role_manager import RoleManager, get_role_manager
+from api.pagination import get_page, set_next_cursor
 from api.user import get_current_user
 import logging
 
@@ -72,14 +74,17 @@ async def add_fish(
 @fish_router.get("", response_model=List[FishResponse], summary="Отримання списку риб в акваріумі")
 @require_permissions("view_fish")
 async def get_aquarium_fish(
+        response: Response,
         aquarium_id: int = Path(..., description="ID акваріума"),
         company_id: int = Query(..., description="ID компанії"),
+        page: Optional[Page] = Depends(get_page),
         current_user: dict = Depends(get_current_user),
         company_service: CompanyService = Depends(get_company_manager),
         role_manager: RoleManager = Depends(get_role_manager)
 ):
     try:
-        fish = company_service.get_aquarium_fish(company_id, aquarium_id, current_user['uid'])
+        fish, next_cursor = company_service.get_aquarium_fish(company_id, aquarium_id, current_user['uid'], page)
+        set_next_cursor(response, next_cursor)
         return [FishResponse.from_orm(f) for f in fish]
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
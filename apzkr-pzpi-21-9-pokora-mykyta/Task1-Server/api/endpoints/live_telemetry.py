@@ -0,0 +1,87 @@
+import logging
+from typing import List
+
+from fastapi import APIRouter, Depends, Query, WebSocket, WebSocketDisconnect, status
+
+from data.models import Aquarium
+from data.session import DatabaseSession
+from services.auth_service import auth_service
+from services.live_telemetry import LiveSubscriber, LiveTelemetryHub, get_live_telemetry_hub
+from services.role_manager import RoleManager
+
+logger = logging.getLogger(__name__)
+
+live_telemetry_router = APIRouter(tags=["Телеметрія наживо"], prefix="/live")
+
+MAX_SUBSCRIPTIONS = 200
+
+
+def get_allowed_aquariums(user_id: str, aquarium_ids: List[int]) -> List[int]:
+    with DatabaseSession() as db:
+        role_manager = RoleManager(db)
+        companies = {}
+        allowed = []
+        for aquarium_id, company_id in db.query(Aquarium.id, Aquarium.company_id).filter(
+                Aquarium.id.in_(aquarium_ids)).all():
+            if company_id not in companies:
+                companies[company_id] = role_manager.check_permissions(
+                    user_id, ["view_water_parameters"], company_id)
+            if companies[company_id]:
+                allowed.append(aquarium_id)
+    return sorted(allowed)
+
+
+@live_telemetry_router.websocket("/water-parameters")
+async def live_water_parameters(
+        websocket: WebSocket,
+        token: str = Query(..., description="Токен доступу; браузер не може передати заголовок Authorization"),
+        hub: LiveTelemetryHub = Depends(get_live_telemetry_hub)
+):
+    """
+    Показники води та стан пристроїв наживо. Клієнт надсилає
+    {"action": "subscribe" | "unsubscribe", "aquarium_ids": [...]} і отримує повідомлення
+    {"type": "reading" | "status", "aquarium_id": ..., ...} для акваріумів, які має право переглядати.
+    """
+    try:
+        user = auth_service.verify_token(token)
+    except Exception:
+        user = None
+    if user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    subscriber = await hub.connect(websocket, user["uid"])
+    try:
+        while True:
+            data = await websocket.receive_json()
+            await handle_message(hub, subscriber, data)
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.warning(f"Помилка WebSocket показників наживо користувача {subscriber.user_id}: {str(e)}")
+    finally:
+        await hub.disconnect(subscriber)
+
+
+async def handle_message(hub: LiveTelemetryHub, subscriber: LiveSubscriber, data: dict):
+    action = data.get("action")
+    try:
+        aquarium_ids = sorted({int(aquarium_id) for aquarium_id in data.get("aquarium_ids", [])})
+    except (TypeError, ValueError):
+        hub.reply(subscriber, {"type": "error", "detail": "aquarium_ids має бути списком ID акваріумів"})
+        return
+
+    if action == "subscribe":
+        if len(subscriber.aquarium_ids | set(aquarium_ids)) > MAX_SUBSCRIPTIONS:
+            hub.reply(subscriber, {"type": "error",
+                                   "detail": f"Можна підписатися не більше ніж на {MAX_SUBSCRIPTIONS} акваріумів"})
+            return
+        allowed = get_allowed_aquariums(subscriber.user_id, aquarium_ids)
+        hub.reply(subscriber, {"type": "subscribed", "aquarium_ids": allowed,
+                               "denied": sorted(set(aquarium_ids) - set(allowed))})
+        await hub.subscribe(subscriber, allowed)
+    elif action == "unsubscribe":
+        await hub.unsubscribe(subscriber, aquarium_ids)
+        hub.reply(subscriber, {"type": "unsubscribed", "aquarium_ids": aquarium_ids})
+    else:
+        hub.reply(subscriber, {"type": "error", "detail": f"Невідома дія {action}"})
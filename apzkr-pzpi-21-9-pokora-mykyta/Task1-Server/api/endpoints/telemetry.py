@@ -0,0 +1,106 @@
+from fastapi import APIRouter, Depends, HTTPException
+
+from api.user import get_current_user
+from services.company_service import CompanyService, get_company_manager
+from services.connection_manager import ConnectionManager
+from services.connection_singleton import get_connection_manager
+from services.device_commands import DeviceCommandTracker, get_device_command_tracker
+from services.feeding_schedule_index import FeedingScheduleIndex, get_feeding_schedule_index
+from services.live_telemetry import LiveTelemetryHub, get_live_telemetry_hub
+from services.rate_limiter import DeviceRateLimiter, get_device_rate_limiter
+from services.recent_readings import RecentReadings, get_recent_readings
+from services.scheduler_leader import SchedulerLeader, get_scheduler_leader
+from services.telemetry_buffer import TelemetryBuffer, get_telemetry_buffer
+from services.telemetry_dedup import TelemetryDeduplicator, get_telemetry_deduplicator
+from services.water_quality_alerts import WaterQualityAlerts, get_water_quality_alerts
+
+telemetry_router = APIRouter(tags=["Телеметрія"], prefix="/telemetry")
+
+
+@telemetry_router.get("/ingestion", summary="Стан буфера запису телеметрії")
+async def get_ingestion_stats(
+        current_user: dict = Depends(get_current_user),
+        telemetry_buffer: TelemetryBuffer = Depends(get_telemetry_buffer)
+):
+    return telemetry_buffer.stats()
+
+
+@telemetry_router.get("/recent-readings", summary="Стан буфера останніх показників у пам'яті")
+async def get_recent_readings_stats(
+        current_user: dict = Depends(get_current_user),
+        recent_readings: RecentReadings = Depends(get_recent_readings)
+):
+    return recent_readings.stats()
+
+
+@telemetry_router.get("/water-quality-alerts", summary="Стан контролю якості води")
+async def get_water_quality_alerts_stats(
+        current_user: dict = Depends(get_current_user),
+        water_quality_alerts: WaterQualityAlerts = Depends(get_water_quality_alerts)
+):
+    return water_quality_alerts.stats()
+
+
+@telemetry_router.get("/rate-limits", summary="Лічильники обмеження частоти кадрів від пристроїв")
+async def get_rate_limit_stats(
+        current_user: dict = Depends(get_current_user),
+        rate_limiter: DeviceRateLimiter = Depends(get_device_rate_limiter),
+        company_service: CompanyService = Depends(get_company_manager),
+        connection_manager: ConnectionManager = Depends(get_connection_manager)
+):
+    # Лічильники спільні для всього парку, а окремі пристрої показуються лише з компаній користувача
+    try:
+        companies = company_service.get_user_companies(current_user['uid'])
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    unique_addresses = {entry.unique_address for company in companies
+                        for entry in connection_manager.presence.company(company.id)}
+    return rate_limiter.stats(unique_addresses)
+
+
+@telemetry_router.get("/deduplication", summary="Лічильники відсіювання повторних кадрів телеметрії")
+async def get_deduplication_stats(
+        current_user: dict = Depends(get_current_user),
+        deduplicator: TelemetryDeduplicator = Depends(get_telemetry_deduplicator)
+):
+    return deduplicator.stats()
+
+
+@telemetry_router.get("/connections", summary="Черги вихідних повідомлень WebSocket пристроїв")
+async def get_connection_stats(
+        current_user: dict = Depends(get_current_user),
+        connection_manager: ConnectionManager = Depends(get_connection_manager)
+):
+    return connection_manager.stats()
+
+
+@telemetry_router.get("/commands", summary="Лічильники команд пристроям та їх підтверджень")
+async def get_command_stats(
+        current_user: dict = Depends(get_current_user),
+        tracker: DeviceCommandTracker = Depends(get_device_command_tracker)
+):
+    return tracker.stats()
+
+
+@telemetry_router.get("/live", summary="Підписки веб-клієнтів на показники наживо")
+async def get_live_telemetry_stats(
+        current_user: dict = Depends(get_current_user),
+        hub: LiveTelemetryHub = Depends(get_live_telemetry_hub)
+):
+    return hub.stats()
+
+
+@telemetry_router.get("/feeding-schedules", summary="Індекс розкладів годування в пам'яті")
+async def get_feeding_schedule_stats(
+        current_user: dict = Depends(get_current_user),
+        schedule_index: FeedingScheduleIndex = Depends(get_feeding_schedule_index)
+):
+    return schedule_index.stats()
+
+
+@telemetry_router.get("/scheduler", summary="Чи виконує цей процес планувальник")
+async def get_scheduler_stats(
+        current_user: dict = Depends(get_current_user),
+        leader: SchedulerLeader = Depends(get_scheduler_leader)
+):
+    return leader.stats()
@@ -1,10 +1,15 @@
+from typing import Optional
+
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
-from sqlalchemy.orm import Session
 
 from services.connection_singleton import get_connection_manager
-from services.device_feeding_service import DeviceFeedingService, get_device_feeding_service
+from services.device_feeding_service import DeviceFeedingService
 from services.connection_manager import ConnectionManager
-from data.session import db_session
+from services.device_protocol import receive_message
+from services.rate_limiter import get_device_rate_limiter
+from services.recent_readings import get_recent_readings
+from services.telemetry_dedup import frame_sequence
+from data.session import DatabaseSession
 import logging
 import asyncio
 
@@ -17,42 +22,69 @@ ws_router = APIRouter()
 async def websocket_endpoint(
         websocket: WebSocket,
         unique_address: str,
-        db: Session = Depends(db_session),
-        device_service: DeviceFeedingService = Depends(get_device_feeding_service),
         connection_manager: ConnectionManager = Depends(get_connection_manager)
 ):
+    # З'єднання живе годинами, тож сесія бази береться лише на час обробки одного повідомлення,
+    # а не тримає з'єднання пулу весь цей час
     logger.info(f"WebSocket підключення від пристрою {unique_address}")
     await connection_manager.connect(websocket, unique_address)
+    rate_limiter = get_device_rate_limiter()
+    aquarium_id = None
+
+    async def save_parameters(frame: dict):
+        nonlocal aquarium_id
+        try:
+            with DatabaseSession() as db:
+                device_service = DeviceFeedingService(db, connection_manager)
+                device = device_service.get_device_info(unique_address)
+                aquarium_id = device.aquarium_id
+                await device_service.save_water_parameters(device.aquarium_id, frame["parameters"],
+                                                           frame_sequence(device.id, frame))
+        except Exception as e:
+            logger.exception(f"Помилка при збереженні параметрів води для пристрою {unique_address}: {str(e)}")
+
     try:
-        await device_service.sync_device_status(unique_address)
+        with DatabaseSession() as db:
+            await DeviceFeedingService(db, connection_manager).sync_device_status(unique_address)
 
         while True:
-            data = await websocket.receive_json()
+            data = await receive_message(websocket)
+            connection_manager.touch(unique_address)
 
-            if data["action"] == "identify":
-                await device_service.handle_device_identification(unique_address)
-            elif data["action"] == "feed_result":
+            if data["action"] == "pong":
+                connection_manager.record_pong(unique_address, data.get("ts", 0))
+            elif data["action"] == "identify":
+                with DatabaseSession() as db:
+                    await DeviceFeedingService(db, connection_manager).handle_device_identification(
+                        unique_address, data.get("firmware"))
+            elif data["action"] in ("feed_result", "command_result"):
                 try:
-                    await device_service.handle_feed_result(unique_address, data["success"])
+                    with DatabaseSession() as db:
+                        await DeviceFeedingService(db, connection_manager).handle_command_result(
+                            unique_address, data["success"], data.get("command_id"), data.get("error"))
                 except Exception as e:
                     logger.exception(
-                        f"Помилка при обробці результату годування для пристрою {unique_address}: {str(e)}")
+                        f"Помилка при обробці результату команди для пристрою {unique_address}: {str(e)}")
             elif data["action"] == "water_parameters":
-                try:
-                    device = device_service.get_device_by_address(unique_address)
-                    await device_service.save_water_parameters(device.aquarium_id, data["parameters"])
-                except Exception as e:
-                    logger.exception(f"Помилка при збереженні параметрів води для пристрою {unique_address}: {str(e)}")
+                await rate_limiter.submit(unique_address, data, save_parameters)
             else:
                 logger.warning(f"Невідома дія від пристрою {unique_address}: {data['action']}")
     except WebSocketDisconnect:
         pass
-        await handle_disconnect(unique_address, connection_manager)
+        await handle_disconnect(unique_address, websocket, aquarium_id, connection_manager)
     except Exception as e:
         logger.exception(f"Помилка при обробці WebSocket для пристрою {unique_address}: {str(e)}")
-        await handle_disconnect(unique_address, connection_manager)
+        await handle_disconnect(unique_address, websocket, aquarium_id, connection_manager)
 
 
-async def handle_disconnect(unique_address: str, connection_manager: ConnectionManager):
-    await connection_manager.disconnect(unique_address)
+async def handle_disconnect(unique_address: str, websocket: WebSocket, aquarium_id: Optional[int],
+                            connection_manager: ConnectionManager):
+    if not await connection_manager.disconnect(unique_address, websocket):
+        # Пристрій уже перепідключився: відро, відкладений кадр і буфер показників належать новому з'єднанню
+        logger.info(f"Застаріле з'єднання пристрою {unique_address} закрито")
+        return
+    get_device_rate_limiter().forget(unique_address)
+    if aquarium_id is not None:
+        # Після відключення буфер більше не містить усіх показників акваріума
+        get_recent_readings().discard(aquarium_id)
     logger.info(f"Пристрій {unique_address} відключено від WebSocket")
\ No newline at end of file
@@ -0,0 +1,23 @@
+from typing import Optional
+
+from fastapi import HTTPException, Query, Response
+
+from services.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, Page, decode_cursor
+
+
+def get_page(
+        limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE,
+                                     description="Розмір сторінки; без limit і cursor повертається весь список"),
+        cursor: Optional[str] = Query(None, description=f"Курсор наступної сторінки із заголовка {NEXT_CURSOR_HEADER}")
+) -> Optional[Page]:
+    if limit is None and cursor is None:
+        return None
+    try:
+        return Page(limit=limit or DEFAULT_PAGE_SIZE, after=decode_cursor(cursor) if cursor else None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]):
+    if next_cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
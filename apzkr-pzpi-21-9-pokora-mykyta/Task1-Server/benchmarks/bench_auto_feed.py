@@ -0,0 +1,104 @@
+"""
+Підготовка автоматичного годування для парку годівниць, яким розклад настав в одну хвилину.
+
+Для кожного розміру парку вимірює claim_feedings: пакетом на всі розклади одразу та по одному
+розкладу, як годування виконувалося раніше. Команди лише записуються в базу, без надсилання
+пристроям; усі пристрої вважаються підключеними до цього процесу. Після кожного виміру журнал
+годувань і команди видаляються, а корм відновлюється; пристрої лишаються для повторних запусків,
+як і після симулятора парку.
+
+Запуск з каталогу Task1-Server (потрібна база Postgres з застосованими міграціями):
+    python benchmarks/bench_auto_feed.py [кількість_пристроїв ...]
+"""
+import pathlib
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, str(pathlib.Path(__file__).parents[1]))
+
+from sqlalchemy import event  # noqa: E402
+
+from data.models import DeviceCommand, FeedingEvent, FeedingSchedule, FoodPatch, IoTDevice  # noqa: E402
+from data.session import DatabaseSession, db_engine  # noqa: E402
+from device_fleet_simulator import schedule_feeding, seed_devices  # noqa: E402
+from services.connection_singleton import get_connection_manager  # noqa: E402
+from services.device_feeding_service import DeviceFeedingService  # noqa: E402
+from services.feeding_schedule_index import DueFeeding  # noqa: E402
+
+PREFIX = "BENCH_FEED_"
+
+
+class StatementCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *args):
+        self.count += 1
+
+
+def reset(db, device_ids: list, schedule_ids: list):
+    db.query(FeedingEvent).filter(FeedingEvent.schedule_id.in_(schedule_ids)).delete(synchronize_session=False)
+    db.query(DeviceCommand).filter(DeviceCommand.device_id.in_(device_ids)).delete(synchronize_session=False)
+    db.query(FoodPatch).filter(FoodPatch.iot_device_id.in_(device_ids)).update(
+        {FoodPatch.quantity: 10_000}, synchronize_session=False)
+    db.commit()
+
+
+def measure(service: DeviceFeedingService, batches: list, statements: StatementCounter) -> tuple:
+    statements.count = 0
+    started = time.perf_counter()
+    sent = 0
+    for batch in batches:
+        commands, _, _ = service.claim_feedings(batch)
+        sent += len(commands)
+    return time.perf_counter() - started, statements.count, sent
+
+
+def main():
+    sizes = sorted(int(size) for size in sys.argv[1:]) or [1000, 3000, 10000]
+    # Журнал кожного запиту спотворив би час вимірів
+    db_engine.echo = False
+    statements = StatementCounter()
+    event.listen(db_engine, "before_cursor_execute", statements)
+    connection_manager = get_connection_manager()
+
+    print(f"{'пристроїв':>10}{'с (пакет)':>11}{'запитів':>9}{'с (по одному)':>15}{'запитів':>9}{'команд':>8}")
+    with DatabaseSession() as db:
+        for size in sizes:
+            # Пристрої попередніх запусків лишаються в базі, тож береться лише потрібна кількість
+            addresses = [f"{PREFIX}{i}" for i in range(size)]
+            seeded = seed_devices(db, PREFIX, size)
+            aquarium_ids = {unique_address: seeded[unique_address] for unique_address in addresses}
+            devices = db.query(IoTDevice.id, IoTDevice.unique_address).filter(
+                IoTDevice.unique_address.in_(addresses)).all()
+            device_ids = [device_id for device_id, _ in devices]
+            connection_manager.presence.load(db)
+            for _, unique_address in devices:
+                connection_manager.presence.mark_online(unique_address, connection_manager.worker_id)
+
+            fire_at = datetime.now().replace(second=0, microsecond=0)
+            schedule_feeding(db, list(aquarium_ids.values()), fire_at)
+            schedules = db.query(FeedingSchedule.id, FeedingSchedule.aquarium_id).filter(
+                FeedingSchedule.aquarium_id.in_(aquarium_ids.values())).all()
+            schedule_ids = [schedule_id for schedule_id, _ in schedules]
+            service = DeviceFeedingService(db, connection_manager)
+            try:
+                reset(db, device_ids, schedule_ids)
+                batched = measure(service, [[DueFeeding(schedule_id, aquarium_id, fire_at)
+                                             for schedule_id, aquarium_id in schedules]], statements)
+                reset(db, device_ids, schedule_ids)
+                # Інша дата, щоб журнал не відсіяв годування як уже виконані
+                single = measure(service, [[DueFeeding(schedule_id, aquarium_id, fire_at - timedelta(days=1))]
+                                           for schedule_id, aquarium_id in schedules], statements)
+                print(f"{size:>10}{batched[0]:>11.3f}{batched[1]:>9}{single[0]:>15.3f}{single[1]:>9}{batched[2]:>8}")
+            finally:
+                db.rollback()
+                reset(db, device_ids, schedule_ids)
+                db.query(FeedingSchedule).filter(FeedingSchedule.id.in_(schedule_ids)).delete(
+                    synchronize_session=False)
+                db.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Затримка розсилки повідомлення всім пристроям: послідовне надсилання та черги з завданнями запису.
+
+Імітує пристрої з випадковою затримкою мережі, серед яких частка "завислих", і вимірює, коли
+повідомлення отримали перший пристрій, 99% швидких пристроїв і всі швидкі пристрої.
+
+Запуск з каталогу Task1-Server:
+    python benchmarks/bench_broadcast_fanout.py [кількість_пристроїв]
+"""
+import asyncio
+import contextlib
+import io
+import pathlib
+import random
+import sys
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).parents[1]))
+
+from services.connection_manager import ConnectionManager  # noqa: E402
+from services.device_bus import LocalDeviceBus  # noqa: E402
+from services.device_presence import PresenceIndex  # noqa: E402
+from services.device_protocol import JSON_CODEC, send_message  # noqa: E402
+
+STALLED_SHARE = 0.01
+STALL_SECONDS = 2.0
+MESSAGE = {"action": "status_update", "is_active": True}
+
+
+class FakeWebSocket:
+    def __init__(self, delay: float, received: list):
+        self.delay = delay
+        self.received = received
+        self.scope = {}
+        self.query_params = {}
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_text(self, payload):
+        await asyncio.sleep(self.delay)
+        self.received.append((time.perf_counter(), self.delay))
+
+    send_bytes = send_text
+
+    async def close(self, code=1000):
+        pass
+
+
+def make_sockets(count: int, received: list) -> list:
+    random.seed(42)
+    return [
+        FakeWebSocket(STALL_SECONDS if random.random() < STALLED_SHARE else random.uniform(0.001, 0.02), received)
+        for _ in range(count)
+    ]
+
+
+def report(name: str, started: float, received: list):
+    fast = sorted(at - started for at, delay in received if delay < STALL_SECONDS)
+    print(f"{name:<14}{fast[0] * 1000:>12.1f}{fast[int(len(fast) * 0.99) - 1] * 1000:>12.1f}{fast[-1] * 1000:>14.1f}")
+
+
+async def sequential(count: int):
+    received = []
+    sockets = make_sockets(count, received)
+    started = time.perf_counter()
+    for websocket in sockets:
+        await send_message(websocket, MESSAGE, JSON_CODEC)
+    report("послідовно", started, received)
+
+
+async def queued(count: int):
+    received = []
+    manager = ConnectionManager(LocalDeviceBus(), PresenceIndex(stale_after=60.0), queue_size=64,
+                                send_timeout=STALL_SECONDS * 2, overflow_policy="disconnect",
+                                heartbeat_interval=30.0, heartbeat_timeout=90.0)
+    await manager.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i, websocket in enumerate(make_sockets(count, received)):
+            await manager.connect(websocket, f"BENCH_{i}")
+
+    started = time.perf_counter()
+    await manager.broadcast(MESSAGE)
+    fast_count = sum(1 for connection in manager.active_connections.values()
+                     if connection.websocket.delay < STALL_SECONDS)
+    while sum(1 for _, delay in received if delay < STALL_SECONDS) < fast_count:
+        await asyncio.sleep(0.001)
+    report("черги", started, received)
+    await manager.stop()
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    print(f"{count} пристроїв, {STALLED_SHARE:.0%} завислих на {STALL_SECONDS} с")
+    print(f"{'':<14}{'перший, мс':>12}{'p99, мс':>12}{'останній, мс':>14}")
+    asyncio.run(queued(count))
+    # Послідовна розсилка чекає кожен пристрій, тож для неї достатньо меншої вибірки
+    asyncio.run(sequential(min(count, 500)))
+
+
+if __name__ == "__main__":
+    main()
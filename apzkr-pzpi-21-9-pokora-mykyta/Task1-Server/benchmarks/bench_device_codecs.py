@@ -0,0 +1,76 @@
+"""
+Порівняння JSON і MessagePack для кадрів телеметрії пристроїв.
+
+Запуск з каталогу Task1-Server:
+    python benchmarks/bench_device_codecs.py [кількість_кадрів]
+"""
+import pathlib
+import random
+import sys
+import timeit
+
+sys.path.insert(0, str(pathlib.Path(__file__).parents[1]))
+
+from services.device_protocol import JSON_CODEC, MSGPACK_CODEC, encode_message, decode_message  # noqa: E402
+
+
+def legacy_frame() -> dict:
+    # Кадр у форматі старої прошивки: повні ключі та адреса пристрою в кожному повідомленні
+    return {
+        "action": "water_parameters",
+        "unique_address": "ESP21_0",
+        "parameters": {
+            "ph": float(random.randint(0, 4095)),
+            "temperature": round(random.uniform(18, 30), 1),
+            "salinity": float(random.randint(0, 4095)),
+            "oxygen_level": float(random.randint(0, 4095)),
+        },
+    }
+
+
+def compact_frame(frame: dict) -> dict:
+    return {"action": frame["action"], "parameters": frame["parameters"]}
+
+
+def measure(frames: list, codec: str) -> tuple:
+    payloads = [encode_message(frame, codec) for frame in frames]
+    assert decode_message(payloads[0]) == frames[0]
+    count = len(frames)
+    return (
+        sum(len(payload.encode() if isinstance(payload, str) else payload) for payload in payloads) / count,
+        timeit.timeit(lambda: [decode_message(p) for p in payloads], number=1) / count,
+        timeit.timeit(lambda: [encode_message(f, codec) for f in frames], number=1) / count,
+    )
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    random.seed(42)
+    frames = {"повний": [legacy_frame() for _ in range(count)]}
+    frames["без адреси"] = [compact_frame(frame) for frame in frames["повний"]]
+
+    # Обидва кодеки кодують однаковий вміст кадру, а вплив відкинутої адреси пристрою рахується окремо
+    results = {(variant, codec): measure(variant_frames, codec)
+               for variant, variant_frames in frames.items() for codec in (JSON_CODEC, MSGPACK_CODEC)}
+
+    print(f"Кадрів: {count}")
+    print(f"{'кадр':<12}{'кодек':<10}{'байт/кадр':>12}{'розбір, мкс':>14}{'кодування, мкс':>17}")
+    for (variant, codec), (size, decode_time, encode_time) in results.items():
+        print(f"{variant:<12}{codec:<10}{size:>12.1f}{decode_time * 1e6:>14.2f}{encode_time * 1e6:>17.2f}")
+
+    for variant in frames:
+        json_size, json_decode, _ = results[(variant, JSON_CODEC)]
+        msgpack_size, msgpack_decode, _ = results[(variant, MSGPACK_CODEC)]
+        print(f"Кодек, кадр «{variant}»: розмір -{(1 - msgpack_size / json_size) * 100:.0f}%, "
+              f"розбір x{json_decode / msgpack_decode:.2f}")
+    for codec in (JSON_CODEC, MSGPACK_CODEC):
+        full_size = results[("повний", codec)][0]
+        compact_size = results[("без адреси", codec)][0]
+        print(f"Без адреси пристрою ({codec}): розмір -{(1 - compact_size / full_size) * 100:.0f}%")
+    json_size = results[("повний", JSON_CODEC)][0]
+    msgpack_size = results[("без адреси", MSGPACK_CODEC)][0]
+    print(f"Разом (старий JSON -> MessagePack без адреси): розмір -{(1 - msgpack_size / json_size) * 100:.0f}%")
+
+
+if __name__ == "__main__":
+    main()
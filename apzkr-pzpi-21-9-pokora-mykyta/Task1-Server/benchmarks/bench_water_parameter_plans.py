@@ -0,0 +1,124 @@
+"""
+Плани запитів до water_parameters зі зростанням таблиці.
+
+Наповнює базу синтетичними показниками кількох тестових акваріумів і для кожного розміру
+таблиці виконує EXPLAIN ANALYZE запиту за добу для одного акваріума: з індексами та секціями
+і з вимкненими індексами для порівняння. Наприкінці тестові дані видаляються.
+
+Запуск з каталогу Task1-Server (потрібна база з застосованими міграціями):
+    python benchmarks/bench_water_parameter_plans.py [кількість_рядків ...]
+"""
+import pathlib
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, str(pathlib.Path(__file__).parents[1]))
+
+from sqlalchemy import text  # noqa: E402
+
+from data.session import DatabaseSession  # noqa: E402
+from services.water_parameter_partitions import create_partition, list_partitions, month_start, next_month  # noqa: E402
+
+AQUARIUMS = 10
+STEP_SECONDS = 10
+RANGE_QUERY = """
+    SELECT measured_at, ph, temperature, salinity, oxygen_level
+    FROM water_parameters
+    WHERE aquarium_id = :aquarium_id AND measured_at >= :start_date AND measured_at <= :end_date
+    ORDER BY measured_at DESC
+"""
+
+
+def scanned_relations(plan: dict) -> set:
+    relations = {plan["Relation Name"]} if "Relation Name" in plan else set()
+    for child in plan.get("Plans", []):
+        relations |= scanned_relations(child)
+    return relations
+
+
+def plan_lines(plan: dict, depth: int = 0) -> list:
+    relation = f" on {plan['Relation Name']}" if "Relation Name" in plan else ""
+    index = f" using {plan['Index Name']}" if "Index Name" in plan else ""
+    lines = [f"{'  ' * depth}{plan['Node Type']}{relation}{index} "
+             f"(rows={plan['Actual Rows']}, loops={plan['Actual Loops']}, {plan['Actual Total Time']:.2f} мс)"]
+    for child in plan.get("Plans", []):
+        lines += plan_lines(child, depth + 1)
+    return lines
+
+
+def explain(db, params: dict, use_indexes: bool) -> tuple:
+    db.execute(text(f"SET LOCAL enable_indexscan = {'on' if use_indexes else 'off'}"))
+    db.execute(text(f"SET LOCAL enable_bitmapscan = {'on' if use_indexes else 'off'}"))
+    result = db.execute(text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {RANGE_QUERY}"), params).scalar()[0]
+    db.rollback()
+    plan = result["Plan"]
+    buffers = plan.get("Shared Hit Blocks", 0) + plan.get("Shared Read Blocks", 0)
+    return result["Execution Time"], buffers, len(scanned_relations(plan)), plan_lines(plan)
+
+
+def ensure_partitions(db, oldest: datetime, newest: datetime):
+    existing = {month for _, month in list_partitions(db)}
+    month = month_start(oldest)
+    while month <= newest.date():
+        if month not in existing:
+            create_partition(db, month)
+        month = next_month(month)
+
+
+def main():
+    sizes = sorted(int(size) for size in sys.argv[1:]) or [100_000, 1_000_000, 5_000_000]
+    now = datetime.now().replace(microsecond=0)
+
+    with DatabaseSession() as db:
+        company_id = db.execute(text(
+            "INSERT INTO companies (name) VALUES ('Тестова компанія плану запитів') RETURNING id")).scalar()
+        aquarium_ids = [
+            db.execute(text("INSERT INTO aquariums (name, capacity, company_id) VALUES (:name, 100, :company_id) "
+                            "RETURNING id"), {"name": f"Тестовий акваріум {i}", "company_id": company_id}).scalar()
+            for i in range(AQUARIUMS)
+        ]
+        db.commit()
+
+        plans = []
+        try:
+            print(f"{'рядків':>10}{'секцій':>8}{'мс (індекс)':>13}{'блоків':>9}{'мс (без індексу)':>18}{'блоків':>10}")
+            per_aquarium = 0
+            for size in sizes:
+                target = size // AQUARIUMS
+                oldest = now - timedelta(seconds=STEP_SECONDS * target)
+                ensure_partitions(db, oldest, now)
+                # Кожен етап дописує старішу історію, як це відбувається з часом у реальній таблиці
+                db.execute(text("""
+                    INSERT INTO water_parameters (ph, temperature, salinity, oxygen_level, measured_at, aquarium_id)
+                    SELECT 7 + random(), 24 + 2 * random(), 4096 * random(), 4096 * random(),
+                           :now - make_interval(secs => g * :step), a
+                    FROM unnest(CAST(:aquarium_ids AS INTEGER[])) AS a, generate_series(:first, :last) AS g
+                """), {"now": now, "step": STEP_SECONDS, "aquarium_ids": aquarium_ids,
+                       "first": per_aquarium, "last": target - 1})
+                db.commit()
+                db.execute(text("ANALYZE water_parameters"))
+                db.commit()
+                per_aquarium = target
+
+                params = {"aquarium_id": aquarium_ids[0], "start_date": now - timedelta(days=1), "end_date": now}
+                indexed = explain(db, params, use_indexes=True)
+                scanned = explain(db, params, use_indexes=False)
+                print(f"{size:>10}{indexed[2]:>8}{indexed[0]:>13.2f}{indexed[1]:>9}{scanned[0]:>18.2f}{scanned[1]:>10}")
+                plans.append((size, indexed[3], scanned[3]))
+
+            for size, indexed_plan, scanned_plan in plans:
+                print(f"\nEXPLAIN ANALYZE, {size} рядків, з індексами:")
+                print("\n".join(indexed_plan))
+                print(f"EXPLAIN ANALYZE, {size} рядків, без індексів:")
+                print("\n".join(scanned_plan))
+        finally:
+            db.rollback()
+            db.execute(text("DELETE FROM water_parameters WHERE aquarium_id = ANY(:ids)"), {"ids": aquarium_ids})
+            db.execute(text("DELETE FROM water_parameter_rollups WHERE aquarium_id = ANY(:ids)"), {"ids": aquarium_ids})
+            db.execute(text("DELETE FROM aquariums WHERE id = ANY(:ids)"), {"ids": aquarium_ids})
+            db.execute(text("DELETE FROM companies WHERE id = :id"), {"id": company_id})
+            db.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 import os
 import pathlib
 from functools import lru_cache
+from typing import Optional
 from dotenv import load_dotenv
 
 from pydantic_settings import BaseSettings
@@ -17,6 +18,67 @@ class Settings(BaseSettings):
     DB_PASSWORD: str = os.getenv("DB_PASSWORD")
     DB_SERVER: str = os.getenv("DB_SERVER")
     DB_NAME: str = os.getenv("DB_NAME")
+    # Повний рядок підключення замість DB_*, наприклад окрема база для навантажувальних тестів
+    DATABASE_URL: Optional[str] = os.getenv("DATABASE_URL")
+
+    # Буфер запису телеметрії (write-behind)
+    TELEMETRY_FLUSH_SIZE: int = int(os.getenv("TELEMETRY_FLUSH_SIZE", 500))
+    TELEMETRY_FLUSH_INTERVAL: float = float(os.getenv("TELEMETRY_FLUSH_INTERVAL", 1.0))
+    TELEMETRY_MAX_QUEUE: int = int(os.getenv("TELEMETRY_MAX_QUEUE", 100_000))
+
+    # Кільцевий буфер останніх показників у пам'яті
+    RECENT_READINGS_CAPACITY: int = int(os.getenv("RECENT_READINGS_CAPACITY", 6000))
+    RECENT_READINGS_MAX_AQUARIUMS: int = int(os.getenv("RECENT_READINGS_MAX_AQUARIUMS", 200))
+
+    # Контроль якості води на потоці телеметрії
+    WATER_QUALITY_EWMA_ALPHA: float = float(os.getenv("WATER_QUALITY_EWMA_ALPHA", 0.2))
+    WATER_QUALITY_STATS_WINDOW: int = int(os.getenv("WATER_QUALITY_STATS_WINDOW", 1000))
+    WATER_QUALITY_WARMUP: int = int(os.getenv("WATER_QUALITY_WARMUP", 30))
+    WATER_QUALITY_RULES_TTL: float = float(os.getenv("WATER_QUALITY_RULES_TTL", 300))
+    WATER_QUALITY_FLUSH_INTERVAL: float = float(os.getenv("WATER_QUALITY_FLUSH_INTERVAL", 5.0))
+
+    WATER_PARAMETER_ARCHIVE_AFTER_DAYS: int = int(os.getenv("WATER_PARAMETER_ARCHIVE_AFTER_DAYS", 30))
+    WATER_PARAMETER_ARCHIVE_MAX_CHUNKS: int = int(os.getenv("WATER_PARAMETER_ARCHIVE_MAX_CHUNKS", 500))
+    WATER_PARAMETER_PARTITIONS_AHEAD: int = int(os.getenv("WATER_PARAMETER_PARTITIONS_AHEAD", 3))
+
+    DEVICE_RATE_LIMIT: float = float(os.getenv("DEVICE_RATE_LIMIT", 2.0))
+    DEVICE_RATE_BURST: int = int(os.getenv("DEVICE_RATE_BURST", 10))
+    DEVICE_RATE_POLICY: str = os.getenv("DEVICE_RATE_POLICY", "coalesce")
+
+    TELEMETRY_DEDUP_WINDOW: int = int(os.getenv("TELEMETRY_DEDUP_WINDOW", 1024))
+    TELEMETRY_DEDUP_MAX_DEVICES: int = int(os.getenv("TELEMETRY_DEDUP_MAX_DEVICES", 10000))
+
+    # Маршрутизація команд між процесами API: postgres (LISTEN/NOTIFY) або local (один процес)
+    DEVICE_BUS_BACKEND: str = os.getenv("DEVICE_BUS_BACKEND", "postgres")
+
+    # Черга вихідних повідомлень кожного пристрою та політика для тих, хто не встигає її розбирати
+    DEVICE_SEND_QUEUE_SIZE: int = int(os.getenv("DEVICE_SEND_QUEUE_SIZE", 64))
+    DEVICE_SEND_TIMEOUT: float = float(os.getenv("DEVICE_SEND_TIMEOUT", 10.0))
+    DEVICE_SEND_OVERFLOW_POLICY: str = os.getenv("DEVICE_SEND_OVERFLOW_POLICY", "disconnect")
+
+    # Очікування підтвердження команди пристроєм (секунд на спробу / кількість повторів)
+    DEVICE_COMMAND_TIMEOUT: float = float(os.getenv("DEVICE_COMMAND_TIMEOUT", 5.0))
+    DEVICE_COMMAND_RETRIES: int = int(os.getenv("DEVICE_COMMAND_RETRIES", 2))
+    # Скільки секунд команда чекає в черзі на підключення пристрою
+    DEVICE_COMMAND_QUEUE_TTL: float = float(os.getenv("DEVICE_COMMAND_QUEUE_TTL", 86400.0))
+
+    # Скільки секунд після запланованого часу годування ще виконується: після перезапуску чи затримки
+    FEEDING_GRACE_PERIOD: float = float(os.getenv("FEEDING_GRACE_PERIOD", 900.0))
+    # Скільки команд автоматичного годування надсилається одночасно
+    FEEDING_DISPATCH_CONCURRENCY: int = int(os.getenv("FEEDING_DISPATCH_CONCURRENCY", 200))
+
+    # Планувальник виконує лише один процес, обраний через advisory lock. Процеси API беруть участь у
+    # виборах, якщо SCHEDULER_EMBEDDED=true; інакше планувальник запускається окремо: python scheduler.py
+    SCHEDULER_EMBEDDED: bool = os.getenv("SCHEDULER_EMBEDDED", "true").lower() == "true"
+    SCHEDULER_LOCK_ID: int = int(os.getenv("SCHEDULER_LOCK_ID", 740_215))
+    SCHEDULER_LEADER_RETRY_INTERVAL: float = float(os.getenv("SCHEDULER_LEADER_RETRY_INTERVAL", 5.0))
+
+    # Heartbeat з'єднань пристроїв: період ping і час без жодного повідомлення до відключення, с
+    DEVICE_HEARTBEAT_INTERVAL: float = float(os.getenv("DEVICE_HEARTBEAT_INTERVAL", 30.0))
+    DEVICE_HEARTBEAT_TIMEOUT: float = float(os.getenv("DEVICE_HEARTBEAT_TIMEOUT", 90.0))
+
+    # Надсилання показників веб-клієнтам наживо
+    LIVE_TELEMETRY_SEND_TIMEOUT: float = float(os.getenv("LIVE_TELEMETRY_SEND_TIMEOUT", 10.0))
 
     FIREBASE_CREDENTIALS: str = str(os.getenv("FIREBASE_CREDENTIALS", basedir / "finfare-credentials.json"))
 
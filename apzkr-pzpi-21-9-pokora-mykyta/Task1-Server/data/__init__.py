@@ -1,14 +1,14 @@
 from .models.feeding_schedule import FeedingSchedule
 from .session import Base, db_session, setup_database, teardown_database
 from .models import (
-    User, Company, Aquarium, WaterParameter, Fish,
-    FoodPatch, IoTDevice, FeedingSchedule, Notification,
-    Role
+    User, Company, Aquarium, WaterParameter, WaterParameterRollup, WaterParameterArchive, Fish,
+    FoodPatch, IoTDevice, DeviceBoot, DevicePresence, DeviceCommand, FeedingSchedule, FeedingEvent,
+    Notification, Role, WaterQualityThreshold
 )
 
 __all__ = [
     "Base", "db_session", "setup_database", "teardown_database",
-    "User", "Company", "Aquarium", "WaterParameter", "Fish",
-    "FoodPatch", "IoTDevice", "FeedingSchedule", "Notification",
-    "Role"
+    "User", "Company", "Aquarium", "WaterParameter", "WaterParameterRollup", "WaterParameterArchive", "Fish",
+    "FoodPatch", "IoTDevice", "DeviceBoot", "DevicePresence", "DeviceCommand", "FeedingSchedule", "FeedingEvent",
+    "Notification", "Role", "WaterQualityThreshold"
 ]
\ No newline at end of file
@@ -2,9 +2,16 @@ from .user import User, UserStatus
 from .company import Company
 from .aquarium import Aquarium
 from .water_parameter import WaterParameter
+from .water_parameter_rollup import WaterParameterRollup, RollupResolution
+from .water_parameter_archive import WaterParameterArchive
+from .water_quality_threshold import WaterQualityThreshold
 from .fish import Fish
 from .food_patch import FoodPatch
 from .iot_device import IoTDevice
+from .device_boot import DeviceBoot
+from .device_presence import DevicePresence
+from .device_command import DeviceCommand, DeviceCommandStatus
 from .feeding_schedule import FeedingSchedule
+from .feeding_event import FeedingEvent, FeedingEventStatus
 from .notification import Notification, NotificationType
 from .role import Role
@@ -17,5 +17,11 @@ class Aquarium(Base):
     company = relationship("Company", back_populates="aquariums")
     feeding_schedules = relationship("FeedingSchedule", back_populates="aquarium", cascade="all, delete-orphan")
     water_parameters = relationship("WaterParameter", back_populates="aquarium", cascade="all, delete-orphan")
+    water_parameter_rollups = relationship("WaterParameterRollup", back_populates="aquarium",
+                                           cascade="all, delete-orphan")
+    water_parameter_archives = relationship("WaterParameterArchive", back_populates="aquarium",
+                                            cascade="all, delete-orphan")
+    water_quality_thresholds = relationship("WaterQualityThreshold", back_populates="aquarium",
+                                            cascade="all, delete-orphan")
     fish = relationship("Fish", back_populates="aquarium", cascade="all, delete-orphan")
     iot_device = relationship("IoTDevice", back_populates="aquarium", uselist=False, cascade="all, delete-orphan")
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, BigInteger, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.orm import relationship
+from data.session import Base
+
+
+class DeviceBoot(Base):
+    __tablename__ = 'device_boots'
+    __table_args__ = (
+        UniqueConstraint('device_id', 'boot_id', name='uq_device_boots_boot'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    device_id = Column(Integer, ForeignKey('iot_devices.id'), nullable=False)
+    boot_id = Column(BigInteger, nullable=False)  # випадковий ідентифікатор, що пристрій генерує при кожному старті
+    booted_at = Column(DateTime, nullable=False)  # оцінка часу старту за першим отриманим кадром
+
+    device = relationship("IoTDevice", back_populates="boots")
@@ -0,0 +1,42 @@
+import enum
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, String, Enum, DateTime, ForeignKey, JSON, Index, text
+from sqlalchemy.orm import relationship
+from data.session import Base
+
+
+class DeviceCommandStatus(enum.Enum):
+    QUEUED = "queued"  # пристрій не підключений, команда чекає на його повернення
+    PENDING = "pending"
+    SENT = "sent"
+    ACKNOWLEDGED = "acknowledged"
+    FAILED = "failed"
+    TIMED_OUT = "timed_out"
+    EXPIRED = "expired"  # пристрій не підключився до expires_at
+    SUPERSEDED = "superseded"  # у черзі з'явилася новіша команда, що її скасовує
+
+
+class DeviceCommand(Base):
+    __tablename__ = 'device_commands'
+    __table_args__ = (
+        Index('ix_device_commands_device_status', 'device_id', 'status'),
+        Index('ix_device_commands_queued_expires_at', 'expires_at',
+              postgresql_where=text("status = 'QUEUED'")),
+    )
+
+    id = Column(Integer, primary_key=True)  # ідентифікатор кореляції, який пристрій повертає в результаті
+    device_id = Column(Integer, ForeignKey('iot_devices.id'), nullable=False)
+    action = Column(String, nullable=False)
+    payload = Column(JSON, nullable=True)
+    status = Column(Enum(DeviceCommandStatus), nullable=False, default=DeviceCommandStatus.PENDING)
+    attempts = Column(Integer, nullable=False, default=0)
+    # Порція корму, списана під команду годування; до неї корм повертається в разі невдачі
+    food_patch_id = Column(Integer, ForeignKey('food_patches.id', ondelete='SET NULL'), nullable=True)
+    worker_id = Column(String, nullable=True)  # процес API, що чекає результату
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+    completed_at = Column(DateTime, nullable=True)
+    expires_at = Column(DateTime, nullable=True)  # для команд у черзі відключеного пристрою
+
+    device = relationship("IoTDevice", back_populates="commands")
@@ -0,0 +1,15 @@
+from datetime import datetime
+
+from sqlalchemy import Column, String, DateTime, Index
+from data.session import Base
+
+
+class DevicePresence(Base):
+    __tablename__ = 'device_presence'
+    __table_args__ = (
+        Index('ix_device_presence_worker_id', 'worker_id'),
+    )
+
+    unique_address = Column(String, primary_key=True)
+    worker_id = Column(String, nullable=False)  # процес API, що тримає WebSocket пристрою
+    connected_at = Column(DateTime, nullable=False, default=datetime.now)
@@ -0,0 +1,31 @@
+import enum
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, String, Enum, Date, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.orm import relationship
+from data.session import Base
+
+
+class FeedingEventStatus(enum.Enum):
+    CLAIMED = "claimed"  # процес узяв годування на себе, команда ще не надіслана
+    SENT = "sent"
+    FAILED = "failed"
+
+
+class FeedingEvent(Base):
+    __tablename__ = 'feeding_events'
+    __table_args__ = (
+        # Кожен розклад спрацьовує не більше одного разу на добу, скільки б процесів його не виконували
+        UniqueConstraint('schedule_id', 'fire_date', name='uq_feeding_events_schedule_fire_date'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    schedule_id = Column(Integer, ForeignKey('feeding_schedules.id', ondelete='CASCADE'), nullable=False)
+    fire_date = Column(Date, nullable=False)  # дата запланованого годування, а не фактичного виконання
+    scheduled_at = Column(DateTime, nullable=False)
+    status = Column(Enum(FeedingEventStatus), nullable=False, default=FeedingEventStatus.CLAIMED)
+    command_id = Column(Integer, ForeignKey('device_commands.id', ondelete='SET NULL'), nullable=True)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+
+    schedule = relationship("FeedingSchedule", back_populates="events")
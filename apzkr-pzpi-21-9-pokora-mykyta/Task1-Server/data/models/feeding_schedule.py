@@ -12,3 +12,5 @@ class FeedingSchedule(Base):
     aquarium_id = Column(Integer, ForeignKey('aquariums.id'), nullable=False)
 
     aquarium = relationship("Aquarium", back_populates="feeding_schedules")
+    events = relationship("FeedingEvent", back_populates="schedule", cascade="all, delete-orphan",
+                          passive_deletes=True)
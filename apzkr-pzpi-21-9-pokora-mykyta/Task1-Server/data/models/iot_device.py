@@ -13,3 +13,5 @@ class IoTDevice(Base):
 
     aquarium = relationship("Aquarium", back_populates="iot_device")
     food_patches = relationship("FoodPatch", back_populates="iot_device")
+    boots = relationship("DeviceBoot", back_populates="device", cascade="all, delete-orphan")
+    commands = relationship("DeviceCommand", back_populates="device", cascade="all, delete-orphan")
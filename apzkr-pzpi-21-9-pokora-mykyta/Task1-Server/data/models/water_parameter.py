@@ -1,17 +1,36 @@
-from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, Float, DateTime, ForeignKey, Index, DDL, event
 from sqlalchemy.orm import relationship
 from data.session import Base
 
 
 class WaterParameter(Base):
     __tablename__ = 'water_parameters'
+    __table_args__ = (
+        Index('ix_water_parameters_aquarium_measured_at', 'aquarium_id', 'measured_at', 'id'),
+        Index('ix_water_parameters_measured_at_brin', 'measured_at', postgresql_using='brin'),
+        # Повторно надісланий кадр має той самий час вимірювання, тож ключ секціонування не заважає
+        Index('uq_water_parameters_frame', 'aquarium_id', 'boot_id', 'seq', 'measured_at', unique=True),
+        {'postgresql_partition_by': 'RANGE (measured_at)'},
+    )
 
-    id = Column(Integer, primary_key=True)
+    # Таблиця секціонована за місяцями, тому час вимірювання входить до первинного ключа
+    id = Column(Integer, primary_key=True, autoincrement=True)
     ph = Column(Float, nullable=False)
     temperature = Column(Float, nullable=False)
     salinity = Column(Float, nullable=False)
     oxygen_level = Column(Float, nullable=False)
-    measured_at = Column(DateTime, nullable=False)
+    measured_at = Column(DateTime, primary_key=True, nullable=False)
     aquarium_id = Column(Integer, ForeignKey('aquariums.id'), nullable=False)
+    boot_id = Column(BigInteger)  # відсутні для прошивок без нумерації кадрів
+    seq = Column(BigInteger)
 
     aquarium = relationship("Aquarium", back_populates="water_parameters")
+
+
+# Місячні секції створює services/water_parameter_partitions.py, сюди потрапляє все, що поза ними
+event.listen(
+    WaterParameter.__table__,
+    "after_create",
+    DDL("CREATE TABLE IF NOT EXISTS water_parameters_default PARTITION OF water_parameters DEFAULT")
+    .execute_if(dialect="postgresql")
+)
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, DateTime, LargeBinary, ForeignKey, Index
+from sqlalchemy.orm import relationship
+from data.session import Base
+
+
+class WaterParameterArchive(Base):
+    __tablename__ = 'water_parameter_archives'
+    __table_args__ = (
+        Index('ix_water_parameter_archives_range', 'aquarium_id', 'start_at', 'end_at'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    aquarium_id = Column(Integer, ForeignKey('aquariums.id'), nullable=False)
+    start_at = Column(DateTime, nullable=False)
+    end_at = Column(DateTime, nullable=False)
+    count = Column(Integer, nullable=False)
+    data = Column(LargeBinary, nullable=False)  # стиснений блок, формат у services/water_parameter_archive.py
+
+    aquarium = relationship("Aquarium", back_populates="water_parameter_archives")
@@ -0,0 +1,38 @@
+import enum
+from sqlalchemy import Column, Integer, Float, DateTime, Enum, ForeignKey, UniqueConstraint
+from sqlalchemy.orm import relationship
+from data.session import Base
+
+
+class RollupResolution(enum.Enum):
+    MINUTE = "minute"
+    HOUR = "hour"
+    DAY = "day"
+
+
+class WaterParameterRollup(Base):
+    __tablename__ = 'water_parameter_rollups'
+    __table_args__ = (
+        UniqueConstraint('aquarium_id', 'resolution', 'bucket_start', name='uq_water_parameter_rollups_bucket'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    aquarium_id = Column(Integer, ForeignKey('aquariums.id'), nullable=False)
+    resolution = Column(Enum(RollupResolution), nullable=False)
+    bucket_start = Column(DateTime, nullable=False)
+    count = Column(Integer, nullable=False)
+
+    ph_min = Column(Float, nullable=False)
+    ph_max = Column(Float, nullable=False)
+    ph_sum = Column(Float, nullable=False)
+    temperature_min = Column(Float, nullable=False)
+    temperature_max = Column(Float, nullable=False)
+    temperature_sum = Column(Float, nullable=False)
+    salinity_min = Column(Float, nullable=False)
+    salinity_max = Column(Float, nullable=False)
+    salinity_sum = Column(Float, nullable=False)
+    oxygen_level_min = Column(Float, nullable=False)
+    oxygen_level_max = Column(Float, nullable=False)
+    oxygen_level_sum = Column(Float, nullable=False)
+
+    aquarium = relationship("Aquarium", back_populates="water_parameter_rollups")
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, UniqueConstraint
+from sqlalchemy.orm import relationship
+from data.session import Base
+
+
+class WaterQualityThreshold(Base):
+    __tablename__ = 'water_quality_thresholds'
+    __table_args__ = (
+        UniqueConstraint('aquarium_id', 'parameter', name='uq_water_quality_thresholds_parameter'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    aquarium_id = Column(Integer, ForeignKey('aquariums.id'), nullable=False)
+    parameter = Column(String, nullable=False)  # ph, temperature, salinity, oxygen_level
+    min_value = Column(Float)
+    max_value = Column(Float)
+    max_rate = Column(Float)  # допустима швидкість зміни за хвилину
+    max_z_score = Column(Float)  # допустиме відхилення від середнього в стандартних відхиленнях
+    hysteresis = Column(Float, nullable=False, default=0)
+
+    aquarium = relationship("Aquarium", back_populates="water_quality_thresholds")
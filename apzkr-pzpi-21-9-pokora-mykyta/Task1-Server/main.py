@@ -6,8 +6,6 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 from fastapi.requests import Request
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.triggers.interval import IntervalTrigger
 
 from api.endpoints.aquarium_feeding import aquarium_feeding_router
 from api.endpoints.auth import auth_router
@@ -15,12 +13,21 @@ from api.endpoints.company import company_router
 from api.endpoints.device import device_router
 from api.endpoints.feeding_schedule import feeding_schedule_router
 from api.endpoints.fish import fish_router
+from api.endpoints.live_telemetry import live_telemetry_router
 from api.endpoints.role import role_router
+from api.endpoints.telemetry import telemetry_router
 from api.endpoints.ws_router import ws_router
 from core.config import settings
-from data.session import setup_database, teardown_database
-from services.connection_manager import ConnectionManager
+from data.session import setup_database, teardown_database, DatabaseSession
+from scheduler import start_scheduling, stop_scheduling
+from services.connection_singleton import get_connection_manager
+from services.device_commands import get_device_command_tracker
 from services.device_feeding_service import DeviceFeedingService
+from services.device_presence import get_presence_index
+from services.live_telemetry import get_live_telemetry_hub
+from services.pagination import NEXT_CURSOR_HEADER
+from services.telemetry_buffer import get_telemetry_buffer
+from services.water_quality_alerts import get_water_quality_alerts
 from data.session import db_session
 from sqlalchemy.orm import Session
 
@@ -37,22 +44,40 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
-connection_manager = ConnectionManager()
-scheduler = AsyncIOScheduler()
+connection_manager = get_connection_manager()
 
 
 @app.on_event("startup")
 async def startup():
     setup_database()
-    scheduler.start()
+    with DatabaseSession() as db:
+        get_presence_index().load(db)
+    await connection_manager.start()
+    # Команди, які процес до перезапуску не встиг завершити, інакше лишаються незавершеними назавжди
+    with DatabaseSession() as db:
+        await get_device_command_tracker().recover_orphaned(db)
+    get_live_telemetry_hub().start()
+    get_telemetry_buffer().start()
+    get_water_quality_alerts().start()
+    # Годування і обслуговування бази виконує лише один процес - або обраний серед процесів API,
+    # або окремий python scheduler.py
+    if settings.SCHEDULER_EMBEDDED:
+        start_scheduling()
 
 
 @app.on_event("shutdown")
 async def shutdown():
-    await teardown_database()
-    scheduler.shutdown()
+    if settings.SCHEDULER_EMBEDDED:
+        await stop_scheduling()
+    # Дописуємо залишок телеметрії до закриття пулу з'єднань
+    await get_telemetry_buffer().stop()
+    await get_water_quality_alerts().stop()
+    await get_live_telemetry_hub().stop()
+    await connection_manager.stop()
+    teardown_database()
 
 
 api_router = APIRouter()
@@ -64,6 +89,8 @@ app.include_router(fish_router, prefix=settings.API_STR, tags=["Риби"])
 app.include_router(device_router, prefix=settings.API_STR, tags=["Пристрої"])
 app.include_router(feeding_schedule_router, prefix=settings.API_STR, tags=["Розклади годування"])
 app.include_router(aquarium_feeding_router, prefix=settings.API_STR, tags=["Годування акваріумів"])
+app.include_router(telemetry_router, prefix=settings.API_STR, tags=["Телеметрія"])
+app.include_router(live_telemetry_router, prefix=settings.API_STR, tags=["Телеметрія наживо"])
 app.include_router(ws_router, tags=["WebSocket"])
 
 
@@ -91,21 +118,5 @@ def get_device_feeding_service(db: Session = Depends(db_session)) -> DeviceFeedi
     return DeviceFeedingService(db, connection_manager)
 
 
-async def scheduled_auto_feed():
-    db = next(db_session())
-    try:
-        feeding_service = DeviceFeedingService(db, connection_manager)
-        await feeding_service.auto_feed()
-    finally:
-        db.close()
-
-
-scheduler.add_job(
-    scheduled_auto_feed,
-    trigger=IntervalTrigger(minutes=1),
-    id='auto_feed_job',
-    replace_existing=True
-)
-
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
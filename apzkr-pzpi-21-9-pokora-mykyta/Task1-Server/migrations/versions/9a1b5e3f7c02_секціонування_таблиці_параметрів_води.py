@@ -0,0 +1,104 @@
+"""Секціонування таблиці параметрів води за місяцями
+
+Revision ID: 9a1b5e3f7c02
+Revises: 4f6a2c8e1d57
+Create Date: 2026-10-18 15:07:33.918240
+
+"""
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a1b5e3f7c02'
+down_revision: Union[str, None] = '4f6a2c8e1d57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PARTITIONS_AHEAD = 3
+
+
+def next_month(month: date) -> date:
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def upgrade() -> None:
+    op.execute("ALTER TABLE water_parameters RENAME TO water_parameters_old")
+    op.execute("ALTER TABLE water_parameters_old RENAME CONSTRAINT water_parameters_pkey TO water_parameters_old_pkey")
+    op.execute("DROP INDEX IF EXISTS ix_water_parameters_aquarium_measured_at")
+    op.execute("ALTER SEQUENCE water_parameters_id_seq OWNED BY NONE")
+
+    # Ключ секціонування має входити до первинного ключа
+    op.execute("""
+        CREATE TABLE water_parameters (
+            id INTEGER NOT NULL DEFAULT nextval('water_parameters_id_seq'),
+            ph DOUBLE PRECISION NOT NULL,
+            temperature DOUBLE PRECISION NOT NULL,
+            salinity DOUBLE PRECISION NOT NULL,
+            oxygen_level DOUBLE PRECISION NOT NULL,
+            measured_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            aquarium_id INTEGER NOT NULL REFERENCES aquariums (id),
+            CONSTRAINT water_parameters_pkey PRIMARY KEY (id, measured_at)
+        ) PARTITION BY RANGE (measured_at)
+    """)
+    op.execute("ALTER SEQUENCE water_parameters_id_seq OWNED BY water_parameters.id")
+    op.execute("CREATE TABLE water_parameters_default PARTITION OF water_parameters DEFAULT")
+
+    oldest = op.get_bind().execute(sa.text("SELECT min(measured_at) FROM water_parameters_old")).scalar()
+    today = date.today()
+    month = date(oldest.year, oldest.month, 1) if oldest else date(today.year, today.month, 1)
+    last = date(today.year, today.month, 1)
+    for _ in range(PARTITIONS_AHEAD):
+        last = next_month(last)
+    while month <= last:
+        op.execute(
+            f"CREATE TABLE water_parameters_{month:%Y_%m} PARTITION OF water_parameters "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month(month).isoformat()}')"
+        )
+        month = next_month(month)
+
+    op.execute("""
+        INSERT INTO water_parameters (id, ph, temperature, salinity, oxygen_level, measured_at, aquarium_id)
+        SELECT id, ph, temperature, salinity, oxygen_level, measured_at, aquarium_id FROM water_parameters_old
+    """)
+    op.execute("DROP TABLE water_parameters_old")
+
+    op.create_index('ix_water_parameters_aquarium_measured_at', 'water_parameters',
+                    ['aquarium_id', 'measured_at', 'id'], unique=False)
+    op.create_index('ix_water_parameters_measured_at_brin', 'water_parameters', ['measured_at'],
+                    unique=False, postgresql_using='brin')
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE water_parameters RENAME TO water_parameters_partitioned")
+    op.execute("ALTER TABLE water_parameters_partitioned "
+               "RENAME CONSTRAINT water_parameters_pkey TO water_parameters_partitioned_pkey")
+    op.execute("DROP INDEX IF EXISTS ix_water_parameters_aquarium_measured_at")
+    op.execute("DROP INDEX IF EXISTS ix_water_parameters_measured_at_brin")
+    op.execute("ALTER SEQUENCE water_parameters_id_seq OWNED BY NONE")
+
+    op.execute("""
+        CREATE TABLE water_parameters (
+            id INTEGER NOT NULL DEFAULT nextval('water_parameters_id_seq'),
+            ph DOUBLE PRECISION NOT NULL,
+            temperature DOUBLE PRECISION NOT NULL,
+            salinity DOUBLE PRECISION NOT NULL,
+            oxygen_level DOUBLE PRECISION NOT NULL,
+            measured_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            aquarium_id INTEGER NOT NULL REFERENCES aquariums (id),
+            CONSTRAINT water_parameters_pkey PRIMARY KEY (id)
+        )
+    """)
+    op.execute("ALTER SEQUENCE water_parameters_id_seq OWNED BY water_parameters.id")
+    op.execute("""
+        INSERT INTO water_parameters (id, ph, temperature, salinity, oxygen_level, measured_at, aquarium_id)
+        SELECT id, ph, temperature, salinity, oxygen_level, measured_at, aquarium_id FROM water_parameters_partitioned
+    """)
+    # Секції видаляються разом із батьківською таблицею
+    op.execute("DROP TABLE water_parameters_partitioned")
+
+    op.create_index('ix_water_parameters_aquarium_measured_at', 'water_parameters',
+                    ['aquarium_id', 'measured_at', 'id'], unique=False)
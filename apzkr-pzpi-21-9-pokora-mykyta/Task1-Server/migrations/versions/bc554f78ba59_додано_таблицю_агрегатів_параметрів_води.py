@@ -0,0 +1,67 @@
+"""Додано таблицю агрегатів параметрів води
+
+Revision ID: bc554f78ba59
+Revises: fabe7f7d3432
+Create Date: 2026-10-18 10:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'bc554f78ba59'
+down_revision: Union[str, None] = 'fabe7f7d3432'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('water_parameter_rollups',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('aquarium_id', sa.Integer(), nullable=False),
+    sa.Column('resolution', sa.Enum('MINUTE', 'HOUR', 'DAY', name='rollupresolution'), nullable=False),
+    sa.Column('bucket_start', sa.DateTime(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('ph_min', sa.Float(), nullable=False),
+    sa.Column('ph_max', sa.Float(), nullable=False),
+    sa.Column('ph_sum', sa.Float(), nullable=False),
+    sa.Column('temperature_min', sa.Float(), nullable=False),
+    sa.Column('temperature_max', sa.Float(), nullable=False),
+    sa.Column('temperature_sum', sa.Float(), nullable=False),
+    sa.Column('salinity_min', sa.Float(), nullable=False),
+    sa.Column('salinity_max', sa.Float(), nullable=False),
+    sa.Column('salinity_sum', sa.Float(), nullable=False),
+    sa.Column('oxygen_level_min', sa.Float(), nullable=False),
+    sa.Column('oxygen_level_max', sa.Float(), nullable=False),
+    sa.Column('oxygen_level_sum', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['aquarium_id'], ['aquariums.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('aquarium_id', 'resolution', 'bucket_start', name='uq_water_parameter_rollups_bucket')
+    )
+
+    # Заповнюємо агрегати з уже накопичених показників
+    for resolution, unit in (('MINUTE', 'minute'), ('HOUR', 'hour'), ('DAY', 'day')):
+        op.execute(f"""
+            INSERT INTO water_parameter_rollups (
+                aquarium_id, resolution, bucket_start, count,
+                ph_min, ph_max, ph_sum,
+                temperature_min, temperature_max, temperature_sum,
+                salinity_min, salinity_max, salinity_sum,
+                oxygen_level_min, oxygen_level_max, oxygen_level_sum
+            )
+            SELECT aquarium_id, '{resolution}', date_trunc('{unit}', measured_at), count(*),
+                   min(ph), max(ph), sum(ph),
+                   min(temperature), max(temperature), sum(temperature),
+                   min(salinity), max(salinity), sum(salinity),
+                   min(oxygen_level), max(oxygen_level), sum(oxygen_level)
+            FROM water_parameters
+            GROUP BY aquarium_id, date_trunc('{unit}', measured_at)
+        """)
+
+
+def downgrade() -> None:
+    op.drop_table('water_parameter_rollups')
+    sa.Enum(name='rollupresolution').drop(op.get_bind(), checkfirst=True)
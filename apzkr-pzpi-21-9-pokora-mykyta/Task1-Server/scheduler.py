@@ -0,0 +1,169 @@
+import asyncio
+import logging
+import signal
+from datetime import datetime, timedelta
+from typing import List
+
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.interval import IntervalTrigger
+
+from core.config import settings
+from data.session import setup_database, teardown_database, DatabaseSession, db_session
+from services.connection_singleton import get_connection_manager
+from services.device_commands import DeviceCommandTracker, get_device_command_tracker
+from services.device_feeding_service import DeviceFeedingService
+from services.device_presence import get_presence_index
+from services.feeding_schedule_index import DueFeeding, get_feeding_schedule_index
+from services.scheduler_leader import get_scheduler_leader
+from services.water_parameter_archive import archive_water_parameters
+from services.water_parameter_partitions import maintain_partitions
+
+logger = logging.getLogger(__name__)
+
+connection_manager = get_connection_manager()
+scheduler = AsyncIOScheduler()
+
+
+async def scheduled_auto_feed(schedules: List[DueFeeding]):
+    db = next(db_session())
+    try:
+        feeding_service = DeviceFeedingService(db, connection_manager)
+        await feeding_service.auto_feed(schedules)
+    finally:
+        db.close()
+
+
+def run_water_parameter_archive():
+    older_than = datetime.now() - timedelta(days=settings.WATER_PARAMETER_ARCHIVE_AFTER_DAYS)
+    with DatabaseSession() as db:
+        archive_water_parameters(db, older_than, settings.WATER_PARAMETER_ARCHIVE_MAX_CHUNKS)
+
+
+async def scheduled_water_parameter_archive():
+    await asyncio.to_thread(run_water_parameter_archive)
+
+
+scheduler.add_job(
+    scheduled_water_parameter_archive,
+    trigger=IntervalTrigger(hours=1),
+    id='water_parameter_archive_job',
+    replace_existing=True
+)
+
+
+def run_water_parameter_partitions():
+    expire_before = datetime.now() - timedelta(days=settings.WATER_PARAMETER_ARCHIVE_AFTER_DAYS)
+    with DatabaseSession() as db:
+        maintain_partitions(db, settings.WATER_PARAMETER_PARTITIONS_AHEAD, expire_before)
+
+
+async def scheduled_water_parameter_partitions():
+    await asyncio.to_thread(run_water_parameter_partitions)
+
+
+scheduler.add_job(
+    scheduled_water_parameter_partitions,
+    trigger=IntervalTrigger(days=1),
+    id='water_parameter_partitions_job',
+    next_run_time=datetime.now(),
+    replace_existing=True
+)
+
+
+def run_device_command_expiry():
+    with DatabaseSession() as db:
+        DeviceCommandTracker.expire_queued(db)
+
+
+async def scheduled_device_command_expiry():
+    await asyncio.to_thread(run_device_command_expiry)
+    # Процес міг упасти, поки інші працюють, тож його команди завершуються без очікування перезапуску,
+    # а годування, чиї команди він так і не надіслав, повертаються до індексу
+    with DatabaseSession() as db:
+        await get_device_command_tracker().recover_orphaned(db)
+        get_feeding_schedule_index().load_unsent(db)
+
+
+scheduler.add_job(
+    scheduled_device_command_expiry,
+    trigger=IntervalTrigger(hours=1),
+    id='device_command_expiry_job',
+    replace_existing=True
+)
+
+
+def run_feeding_event_expiry():
+    with DatabaseSession() as db:
+        get_feeding_schedule_index().expire_unsent(db)
+
+
+async def scheduled_feeding_event_expiry():
+    await asyncio.to_thread(run_feeding_event_expiry)
+
+
+scheduler.add_job(
+    scheduled_feeding_event_expiry,
+    trigger=IntervalTrigger(hours=1),
+    id='feeding_event_expiry_job',
+    replace_existing=True
+)
+
+
+async def on_elected():
+    # Поки процес не був лідером, зміни розкладів могли пройти повз нього, тож індекс перечитується;
+    # годування, пропущені під час зміни лідера, наздоганяються в межах FEEDING_GRACE_PERIOD. Перед цим
+    # присутність пристроїв береться з реєстру шини, інакше наздоганяння відклало б годування всіх пристроїв,
+    # чиї процеси ще не надіслали знімок
+    await connection_manager.sync_presence()
+    with DatabaseSession() as db:
+        # Команди колишнього лідера, який упав до їх надсилання, повертають його годування в журнал
+        await get_device_command_tracker().recover_orphaned(db)
+        get_feeding_schedule_index().load(db)
+    get_feeding_schedule_index().start(scheduled_auto_feed)
+    scheduler.resume()
+
+
+async def on_demoted():
+    scheduler.pause()
+    await get_feeding_schedule_index().stop()
+
+
+def start_scheduling():
+    """Запускає вибори лідера; годування та обслуговування бази виконуються лише на обраному процесі."""
+    scheduler.start(paused=True)
+    leader = get_scheduler_leader()
+    leader.on_elected(on_elected)
+    leader.on_demoted(on_demoted)
+    leader.start()
+
+
+async def stop_scheduling():
+    await get_scheduler_leader().stop()
+    scheduler.shutdown()
+
+
+async def main():
+    setup_database()
+    with DatabaseSession() as db:
+        get_presence_index().load(db)
+    # Шина потрібна, щоб отримувати зміни розкладів і стан пристроїв від процесів API та надсилати їм команди
+    await connection_manager.start()
+    with DatabaseSession() as db:
+        await get_device_command_tracker().recover_orphaned(db)
+    start_scheduling()
+    logger.info("Планувальник запущено без HTTP-застосунку")
+
+    stopped = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopped.set)
+    await stopped.wait()
+
+    await stop_scheduling()
+    await connection_manager.stop()
+    teardown_database()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
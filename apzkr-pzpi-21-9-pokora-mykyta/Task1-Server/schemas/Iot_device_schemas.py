@@ -22,3 +22,13 @@ class IoTDeviceResponse(IoTDeviceBase):
 
     class Config:
         from_attributes = True
+
+
+class DevicePresenceResponse(BaseModel):
+    unique_address: str = Field(..., description="Унікальна адреса IoT пристрою")
+    aquarium_id: Optional[int] = Field(None, description="ID акваріума")
+    online: bool = Field(..., description="Чи підключений пристрій")
+    connected_at: Optional[datetime] = Field(None, description="Час останнього підключення")
+    last_seen: Optional[datetime] = Field(None, description="Час останнього повідомлення від пристрою")
+    rtt_ms: Optional[float] = Field(None, description="Затримка відповіді на heartbeat, мс")
+    firmware: Optional[str] = Field(None, description="Версія прошивки")
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import datetime
 
 
@@ -13,6 +13,8 @@ class WaterParameterBase(BaseModel):
 
 class WaterParameterCreate(WaterParameterBase):
     aquarium_id: int = Field(..., description="ID акваріума")
+    boot_id: Optional[int] = Field(None, description="Ідентифікатор старту пристрою")
+    seq: Optional[int] = Field(None, description="Номер кадру в межах старту пристрою")
 
 
 class WaterParameterUpdate(BaseModel):
@@ -24,8 +26,58 @@ class WaterParameterUpdate(BaseModel):
 
 
 class WaterParameterResponse(WaterParameterBase):
-    id: int = Field(..., description="ID параметра води")
+    id: Optional[int] = Field(None, description="ID параметра води (відсутній для ще не записаних показників)")
     aquarium_id: int = Field(..., description="ID акваріума")
 
     class Config:
         from_attributes = True
+
+
+class WaterParameterRollupResponse(BaseModel):
+    aquarium_id: int = Field(..., description="ID акваріума")
+    resolution: str = Field(..., description="Роздільність агрегації (minute, hour, day)")
+    measured_at: datetime = Field(..., description="Початок інтервалу агрегації")
+    count: int = Field(..., description="Кількість вимірювань в інтервалі")
+    ph: float = Field(..., description="Середній рівень pH")
+    ph_min: float = Field(..., description="Мінімальний рівень pH")
+    ph_max: float = Field(..., description="Максимальний рівень pH")
+    temperature: float = Field(..., description="Середня температура води")
+    temperature_min: float = Field(..., description="Мінімальна температура води")
+    temperature_max: float = Field(..., description="Максимальна температура води")
+    salinity: float = Field(..., description="Середній рівень солоності")
+    salinity_min: float = Field(..., description="Мінімальний рівень солоності")
+    salinity_max: float = Field(..., description="Максимальний рівень солоності")
+    oxygen_level: float = Field(..., description="Середній рівень кисню")
+    oxygen_level_min: float = Field(..., description="Мінімальний рівень кисню")
+    oxygen_level_max: float = Field(..., description="Максимальний рівень кисню")
+
+
+class MetricStatistics(BaseModel):
+    mean: float = Field(..., description="Середнє значення")
+    min: float = Field(..., description="Мінімальне значення")
+    max: float = Field(..., description="Максимальне значення")
+    stddev: Optional[float] = Field(None, description="Стандартне відхилення (відсутнє для одного вимірювання)")
+    p5: float = Field(..., description="5-й перцентиль")
+    p50: float = Field(..., description="Медіана")
+    p95: float = Field(..., description="95-й перцентиль")
+
+
+class WaterParameterStatsResponse(BaseModel):
+    bucket_start: datetime = Field(..., description="Початок інтервалу")
+    count: int = Field(..., description="Кількість вимірювань в інтервалі")
+    ph: MetricStatistics = Field(..., description="Статистика рівня pH")
+    temperature: MetricStatistics = Field(..., description="Статистика температури води")
+    salinity: MetricStatistics = Field(..., description="Статистика рівня солоності")
+    oxygen_level: MetricStatistics = Field(..., description="Статистика рівня кисню")
+
+
+class WaterParameterSeries(BaseModel):
+    timestamps: List[int] = Field(..., description="Час вимірювань у мілісекундах від епохи Unix")
+    values: List[float] = Field(..., description="Значення показника")
+
+
+class WaterParameterChartResponse(BaseModel):
+    aquarium_id: int = Field(..., description="ID акваріума")
+    method: str = Field(..., description="Метод проріджування (lttb, minmax)")
+    raw_count: int = Field(..., description="Кількість сирих вимірювань у діапазоні")
+    series: Dict[str, WaterParameterSeries] = Field(..., description="Проріджений ряд для кожного показника")
@@ -0,0 +1,24 @@
+from pydantic import BaseModel, Field
+from typing import Literal, Optional
+
+
+class WaterQualityThresholdBase(BaseModel):
+    parameter: Literal["ph", "temperature", "salinity", "oxygen_level"] = Field(..., description="Параметр води")
+    min_value: Optional[float] = Field(None, description="Мінімальне допустиме значення")
+    max_value: Optional[float] = Field(None, description="Максимальне допустиме значення")
+    max_rate: Optional[float] = Field(None, gt=0, description="Допустима швидкість зміни за хвилину")
+    max_z_score: Optional[float] = Field(None, gt=0,
+                                         description="Допустиме відхилення від середнього в стандартних відхиленнях")
+    hysteresis: float = Field(0, ge=0, description="Запас повернення в норму для зняття тривоги")
+
+
+class WaterQualityThresholdCreate(WaterQualityThresholdBase):
+    pass
+
+
+class WaterQualityThresholdResponse(WaterQualityThresholdBase):
+    id: int = Field(..., description="ID порогу")
+    aquarium_id: int = Field(..., description="ID акваріума")
+
+    class Config:
+        from_attributes = True
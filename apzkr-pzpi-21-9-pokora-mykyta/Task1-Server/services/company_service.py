@@ -14,13 +14,16 @@ from fastapi import Depends
 
 
 from sqlalchemy.exc import IntegrityError
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 from data.session import db_session
 from data.models.company import Company
 from data.models.user import User, user_companies
 from schemas.company_schemas import CompanyCreate, CompanyUpdate
+from services.feeding_schedule_index import get_feeding_schedule_index
+from services.pagination import Page, paginate
 from services.role_manager import RoleManager, get_role_manager
+from services.water_quality_alerts import get_water_quality_alerts
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import func
 from fastapi import Depends
@@ -92,6 +95,7 @@ class CompanyService:
         company = self.get_user_company(company_id, firebase_uid)
         self.db.delete(company)
         self.db.commit()
+        get_water_quality_alerts().invalidate_company(company_id)
         return {"message": "Компанію успішно видалено"}
 
     def get_company_users(self, company_id: int, firebase_uid: str):
@@ -100,21 +104,17 @@ class CompanyService:
             user_companies.c.company_id == company_id
         ).all()
 
-    def get_all_company_users(self, company_id: int):
+    def get_all_company_users(self, company_id: int, page: Optional[Page] = None) -> Tuple[List[User], Optional[str]]:
         company = self.db.query(Company).filter(Company.id == company_id).first()
         if not company:
             raise ValueError(f"Компанія з ID {company_id} не знайдена")
 
-        users_with_roles = self.db.query(User).join(user_companies).options(
+        query = self.db.query(User).join(user_companies).options(
             joinedload(User.companies).joinedload(Company.roles)
         ).filter(
             user_companies.c.company_id == company_id
-        ).all()
-
-        if not users_with_roles:
-            return []
-
-        return users_with_roles
+        )
+        return paginate(query, (User.id,), page)
 
     def add_user_to_company(self, company_id: int, email: str, role_id: int):
         user = self.db.query(User).filter(User.email == email).first()
@@ -131,6 +131,7 @@ class CompanyService:
 
         try:
             self.role_manager.assign_role(user.id, role_id, company_id)
+            get_water_quality_alerts().invalidate_company(company_id)
             return {"message": "Користувача успішно додано до компанії"}
         except ValueError as e:
             raise ValueError(str(e))
@@ -145,6 +146,7 @@ class CompanyService:
             user_companies.c.user_id == user.id
         ).delete()
         self.db.commit()
+        get_water_quality_alerts().invalidate_company(company_id)
         if result:
             return {"message": "Користувача успішно видалено з компанії"}
         else:
@@ -177,19 +179,21 @@ class CompanyService:
             self.db.rollback()
             raise ValueError(f"Помилка при створенні акваріума: {str(e)}")
 
-    def get_company_aquariums(self, company_id: int, firebase_uid: str) -> List[Aquarium]:
+    def get_company_aquariums(self, company_id: int, firebase_uid: str,
+                              page: Optional[Page] = None) -> Tuple[List[Aquarium], Optional[str]]:
         try:
             company = self.get_user_company(company_id, firebase_uid)
         except ValueError as e:
             raise ValueError(f"Помилка при отриманні компанії: {str(e)}")
 
-        return self.db.query(Aquarium).options(
+        query = self.db.query(Aquarium).options(
             joinedload(Aquarium.company),
             joinedload(Aquarium.feeding_schedules),
             joinedload(Aquarium.water_parameters),
             joinedload(Aquarium.fish),
             joinedload(Aquarium.iot_device)
-        ).filter(Aquarium.company_id == company.id).all()
+        ).filter(Aquarium.company_id == company.id)
+        return paginate(query, (Aquarium.id,), page)
 
     def get_company_aquarium(self, company_id: int, aquarium_id: int, firebase_uid: str) -> Aquarium:
         try:
@@ -239,6 +243,8 @@ class CompanyService:
         try:
             self.db.delete(aquarium)
             self.db.commit()
+            get_feeding_schedule_index().remove_aquariums([aquarium_id])
+            get_water_quality_alerts().invalidate(aquarium_id)
             return {"message": "Акваріум успішно видалено"}
         except Exception as e:
             self.db.rollback()
@@ -264,13 +270,14 @@ class CompanyService:
             self.db.refresh(new_fish)
             return new_fish
 
-    def get_aquarium_fish(self, company_id: int, aquarium_id: int, firebase_uid: str) -> List[Fish]:
+    def get_aquarium_fish(self, company_id: int, aquarium_id: int, firebase_uid: str,
+                          page: Optional[Page] = None) -> Tuple[List[Fish], Optional[str]]:
         aquarium = self.db.query(Aquarium).filter(Aquarium.id == aquarium_id).first()
         if not aquarium:
             raise ValueError("Акваріум не знайдено")
 
         self.get_user_company(aquarium.company_id, firebase_uid)
-        return self.db.query(Fish).filter(Fish.aquarium_id == aquarium.id).all()
+        return paginate(self.db.query(Fish).filter(Fish.aquarium_id == aquarium.id), (Fish.id,), page)
 
     def get_fish(self, company_id: int, aquarium_id: int, fish_id: int, firebase_uid: str) -> Fish:
         aquarium = self.db.query(Aquarium).filter(Aquarium.id == aquarium_id).first()
@@ -1,31 +1,320 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Depends
-from typing import Dict
+from collections import Counter
+from typing import Awaitable, Callable, Dict, List, Optional, Union
 import asyncio
+import logging
+import time
+
+from services.device_presence import PresenceEntry, PresenceIndex
+from services.device_protocol import negotiate_codec, accepted_subprotocol, encode_message, send_payload
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ("disconnect", "drop_oldest", "drop_new")
+# Код закриття WebSocket "Try Again Later" для виключених повільних пристроїв
+EVICTION_CLOSE_CODE = 1013
+# Записів присутності в одному повідомленні шини, щоб не перевищити ліміт NOTIFY у 8000 байт
+PRESENCE_CHUNK = 40
+
+
+def heartbeat_clock() -> int:
+    # Мілісекунди монотонного годинника в межах uint32, які прошивка повертає без змін
+    return int(time.monotonic() * 1000) & 0xFFFFFFFF
+
+
+class DeviceInfo:
+    """Поля пристрою, потрібні циклу читання WebSocket, щоб не звертатися до бази на кожен кадр."""
+
+    __slots__ = ("id", "aquarium_id", "is_active")
+
+    def __init__(self, id: int, aquarium_id: int, is_active: bool):
+        self.id = id
+        self.aquarium_id = aquarium_id
+        self.is_active = is_active
+
+
+class DeviceConnection:
+    """WebSocket пристрою з обмеженою чергою вихідних повідомлень, яку розбирає власне завдання запису."""
+
+    def __init__(self, unique_address: str, websocket: WebSocket, codec: str, queue_size: int):
+        self.unique_address = unique_address
+        self.websocket = websocket
+        self.codec = codec
+        self.queue: "asyncio.Queue[Union[bytes, str]]" = asyncio.Queue(maxsize=queue_size)
+        self.evicted = False
+        self.writer: asyncio.Task = None
+        self.last_seen = time.monotonic()
+        self.device: Optional[DeviceInfo] = None
 
 
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Dict[str, WebSocket] = {}
-        self.device_statuses: Dict[str, bool] = {}
+    def __init__(self, bus, presence: PresenceIndex, queue_size: int, send_timeout: float, overflow_policy: str,
+                 heartbeat_interval: float, heartbeat_timeout: float):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Невідома політика переповнення черги {overflow_policy}, "
+                             f"доступні: {', '.join(OVERFLOW_POLICIES)}")
+        self.active_connections: Dict[str, DeviceConnection] = {}
+        self.presence = presence
         self.lock = asyncio.Lock()
+        # Реєстр присутності та канал команд до пристроїв, підключених до інших процесів
+        self.bus = bus
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.overflow_policy = overflow_policy
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.heartbeat_task: Optional[asyncio.Task] = None
+        self.counters = Counter()
+        self.bus_handlers: Dict[str, Callable[[dict], Awaitable[None]]] = {
+            "device_command": self._deliver,
+            "presence": self._on_presence,
+        }
+
+    @property
+    def worker_id(self) -> str:
+        return self.bus.worker_id
+
+    def on_bus_message(self, kind: str, handler: Callable[[dict], Awaitable[None]]):
+        self.bus_handlers[kind] = handler
+
+    async def publish(self, worker_id: str, kind: str, body: dict):
+        await self.bus.publish(worker_id, {"kind": kind, **body})
+
+    async def publish_all(self, kind: str, body: dict):
+        # Отримувач відкидає власні повідомлення за полем origin
+        await self.bus.broadcast({"kind": kind, "origin": self.worker_id, **body})
+
+    async def start(self):
+        await self.bus.start(self._on_bus_message)
+        self.heartbeat_task = asyncio.create_task(self._heartbeat())
+
+    async def stop(self):
+        if self.heartbeat_task is not None:
+            self.heartbeat_task.cancel()
+        for connection in list(self.active_connections.values()):
+            connection.writer.cancel()
+        await self.bus.stop()
 
     async def connect(self, websocket: WebSocket, unique_address: str):
-        await websocket.accept()
+        codec = negotiate_codec(websocket)
+        await websocket.accept(subprotocol=accepted_subprotocol(websocket))
+        connection = DeviceConnection(unique_address, websocket, codec, self.queue_size)
+        connection.writer = asyncio.create_task(self._write(connection))
         async with self.lock:
-            self.active_connections[unique_address] = websocket
+            previous = self.active_connections.get(unique_address)
+            self.active_connections[unique_address] = connection
+        if previous is not None:
+            previous.writer.cancel()
+        await self.bus.register(unique_address)
+        await self._replicate([self.presence.mark_online(unique_address, self.worker_id)])
         print(f"Пристрій {unique_address} підключився")
 
-    async def disconnect(self, unique_address: str):
+    async def disconnect(self, unique_address: str, websocket: Optional[WebSocket] = None) -> bool:
+        """Повертає False, якщо з'єднання вже замінене новим з'єднанням того самого пристрою."""
         async with self.lock:
-            self.active_connections.pop(unique_address, None)
+            connection = self.active_connections.get(unique_address)
+            # Старий цикл читання не повинен прибрати нове з'єднання того самого пристрою
+            if connection is None or (websocket is not None and connection.websocket is not websocket):
+                return False
+            del self.active_connections[unique_address]
+        connection.writer.cancel()
+        await self.bus.unregister(unique_address)
+        entry = self.presence.mark_offline(unique_address, self.worker_id)
+        if entry is not None:
+            await self._replicate([entry])
         print(f"Пристрій {unique_address} відключився")
+        return True
+
+    def cache_device(self, unique_address: str, device) -> DeviceInfo:
+        info = DeviceInfo(device.id, device.aquarium_id, device.is_active)
+        connection = self.active_connections.get(unique_address)
+        if connection is not None:
+            connection.device = info
+        return info
+
+    def cached_device(self, unique_address: str) -> Optional[DeviceInfo]:
+        connection = self.active_connections.get(unique_address)
+        return connection.device if connection is not None else None
+
+    @staticmethod
+    def _track_status(connection: DeviceConnection, message: dict):
+        # Статус змінюється лише разом із командою пристрою, тож кеш оновлюється процесом, що її доставляє
+        if connection.device is None:
+            return
+        if message.get("action") in ("activate", "deactivate"):
+            connection.device.is_active = message["action"] == "activate"
+        elif message.get("action") == "status_update":
+            connection.device.is_active = message["is_active"]
 
-    async def send_command(self, unique_address: str, message: dict):
+    def touch(self, unique_address: str):
+        connection = self.active_connections.get(unique_address)
+        if connection is not None:
+            connection.last_seen = time.monotonic()
+        self.presence.entry(unique_address).last_seen = time.time()
+
+    def record_pong(self, unique_address: str, sent_at: int):
+        self.presence.entry(unique_address).rtt_ms = (heartbeat_clock() - sent_at) & 0xFFFFFFFF
+
+    async def is_connected(self, unique_address: str) -> bool:
         if unique_address in self.active_connections:
-            await self.active_connections[unique_address].send_json(message)
-        else:
+            return True
+        return await self.bus.locate(unique_address) is not None
+
+    async def send_command(self, unique_address: str, message: dict, worker_id: Optional[str] = None):
+        # worker_id із індексу присутності дозволяє не шукати власника з'єднання через шину
+        connection = self.active_connections.get(unique_address)
+        if connection is not None:
+            if connection.evicted:
+                raise ValueError(f"Пристрій {unique_address} не встигає приймати повідомлення і відключається")
+            self._track_status(connection, message)
+            self._enqueue(connection, encode_message(message, connection.codec))
+            return
+
+        if worker_id is None or worker_id == self.worker_id:
+            worker_id = await self.bus.locate(unique_address)
+        if worker_id is None:
             raise ValueError(f"Пристрій {unique_address} не підключений")
+        await self.publish(worker_id, "device_command", {"unique_address": unique_address, "message": message})
+
+    async def _on_bus_message(self, envelope: dict):
+        handler = self.bus_handlers.get(envelope.get("kind"))
+        if handler is None:
+            logger.warning(f"Невідоме повідомлення шини пристроїв: {envelope.get('kind')}")
+            return
+        await handler(envelope)
+
+    async def _deliver(self, envelope: dict):
+        # Команда від іншого процесу для пристрою, чий WebSocket тримає цей процес
+        unique_address, message = envelope["unique_address"], envelope["message"]
+        connection = self.active_connections.get(unique_address)
+        if connection is None or connection.evicted:
+            logger.warning(f"Команду для пристрою {unique_address} отримано, але він уже відключився")
+            return
+        self._track_status(connection, message)
+        self._enqueue(connection, encode_message(message, connection.codec))
 
     async def broadcast(self, message: dict):
-        for connection in self.active_connections.values():
-            await connection.send_json(message)
+        # Повідомлення кодується один раз на кодек і лише ставиться в черги, тож повільний
+        # пристрій не затримує решту
+        payloads = {}
+        for connection in list(self.active_connections.values()):
+            if connection.evicted:
+                continue
+            payload = payloads.get(connection.codec)
+            if payload is None:
+                payload = payloads[connection.codec] = encode_message(message, connection.codec)
+            self._enqueue(connection, payload)
+
+    def _enqueue(self, connection: DeviceConnection, payload: Union[bytes, str]):
+        try:
+            connection.queue.put_nowait(payload)
+            self.counters["queued"] += 1
+            return
+        except asyncio.QueueFull:
+            pass
+
+        if self.overflow_policy == "drop_new":
+            self.counters["dropped"] += 1
+        elif self.overflow_policy == "drop_oldest":
+            connection.queue.get_nowait()
+            connection.queue.put_nowait(payload)
+            self.counters["dropped"] += 1
+        else:
+            self._evict(connection, "черга вихідних повідомлень переповнена")
+
+    async def _write(self, connection: DeviceConnection):
+        while True:
+            payload = await connection.queue.get()
+            try:
+                await asyncio.wait_for(send_payload(connection.websocket, payload), self.send_timeout)
+                self.counters["sent"] += 1
+            except asyncio.TimeoutError:
+                self._evict(connection, f"надсилання триває довше {self.send_timeout} с")
+                return
+            except Exception as e:
+                logger.warning(f"Не вдалося надіслати повідомлення пристрою {connection.unique_address}: {str(e)}")
+                self.counters["failed"] += 1
+
+    def _evict(self, connection: DeviceConnection, reason: str):
+        if connection.evicted:
+            return
+        connection.evicted = True
+        self.counters["evicted"] += 1
+        logger.warning(f"Пристрій {connection.unique_address} відключено як повільний: {reason}")
+        # Решту прибирає обробник відключення в циклі читання WebSocket
+        asyncio.create_task(self._close(connection))
+
+    @staticmethod
+    async def _close(connection: DeviceConnection):
+        connection.writer.cancel()
+        try:
+            await connection.websocket.close(code=EVICTION_CLOSE_CODE)
+        except Exception:
+            pass
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.exception(f"Помилка при перевірці з'єднань пристроїв: {str(e)}")
+
+    async def sweep(self):
+        """
+        Відключає пристрої, від яких нічого не надходило довше heartbeat_timeout (напіввідкриті
+        TCP-з'єднання), решті надсилає ping і ділиться станом своїх пристроїв з іншими процесами.
+        """
+        now = time.monotonic()
+        ping = {"action": "ping", "ts": heartbeat_clock()}
+        for connection in list(self.active_connections.values()):
+            if connection.evicted:
+                continue
+            if now - connection.last_seen > self.heartbeat_timeout:
+                self.counters["heartbeat_timeouts"] += 1
+                self._evict(connection, f"немає відповіді довше {self.heartbeat_timeout} с")
+                # Цикл читання напіввідкритого з'єднання може не дізнатися про закриття, тож прибираємо тут
+                await self.disconnect(connection.unique_address, connection.websocket)
+                continue
+            self._enqueue(connection, encode_message(ping, connection.codec))
+
+        self.presence.expire(self.worker_id)
+        await self._replicate(self.presence.local(self.worker_id))
+
+    async def _replicate(self, entries: List[PresenceEntry]):
+        for i in range(0, len(entries), PRESENCE_CHUNK):
+            try:
+                await self.publish_all("presence", {
+                    "entries": [entry.to_dict() for entry in entries[i:i + PRESENCE_CHUNK]]
+                })
+            except Exception as e:
+                logger.warning(f"Не вдалося розіслати стан присутності пристроїв: {str(e)}")
+                return
+
+    async def sync_presence(self) -> int:
+        """
+        Позначає підключеними пристрої з реєстру шини, про які індекс присутності ще не знає. Знімки інших
+        процесів надходять лише раз на heartbeat_interval, тож без цього щойно запущений процес вважав би
+        їхні пристрої відключеними.
+        """
+        synced = 0
+        for unique_address, worker_id in (await self.bus.online_devices()).items():
+            entry = self.presence.entries.get(unique_address)
+            if entry is None or not entry.online or entry.worker_id != worker_id:
+                self.presence.mark_online(unique_address, worker_id)
+                synced += 1
+        return synced
+
+    async def _on_presence(self, envelope: dict):
+        if envelope.get("origin") != self.worker_id:
+            self.presence.apply(envelope["entries"])
+
+    def stats(self) -> dict:
+        return {
+            "connections": len(self.active_connections),
+            "overflow_policy": self.overflow_policy,
+            "queue_size": self.queue_size,
+            "queued_now": sum(connection.queue.qsize() for connection in self.active_connections.values()),
+            **{name: self.counters[name]
+               for name in ("queued", "sent", "dropped", "failed", "evicted", "heartbeat_timeouts")},
+        }
@@ -1,6 +1,17 @@
+from core.config import settings
 from services.connection_manager import ConnectionManager
+from services.device_bus import create_device_bus
+from services.device_presence import get_presence_index
 
-connection_manager = ConnectionManager()
+connection_manager = ConnectionManager(
+    create_device_bus(settings.DEVICE_BUS_BACKEND),
+    get_presence_index(),
+    queue_size=settings.DEVICE_SEND_QUEUE_SIZE,
+    send_timeout=settings.DEVICE_SEND_TIMEOUT,
+    overflow_policy=settings.DEVICE_SEND_OVERFLOW_POLICY,
+    heartbeat_interval=settings.DEVICE_HEARTBEAT_INTERVAL,
+    heartbeat_timeout=settings.DEVICE_HEARTBEAT_TIMEOUT
+)
 
 
 def get_connection_manager():
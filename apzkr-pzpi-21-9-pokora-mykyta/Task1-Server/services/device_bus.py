@@ -0,0 +1,249 @@
+import asyncio
+import json
+import logging
+import uuid
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+import psycopg2
+from sqlalchemy import exists, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from data.models import DevicePresence
+from data.session import DatabaseSession, connection_string
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("postgres", "local")
+CHANNEL_PREFIX = "device_bus_"
+# Спільний канал для повідомлень усім процесам
+BROADCAST_CHANNEL = "device_bus_all"
+RECONNECT_DELAY = 5.0
+
+EnvelopeHandler = Callable[[dict], Awaitable[None]]
+
+
+def new_worker_id() -> str:
+    return f"{CHANNEL_PREFIX}{uuid.uuid4().hex[:16]}"
+
+
+class LocalDeviceBus:
+    """
+    Маршрутизація в межах одного процесу: реєстр присутності та підписники спільні для всіх
+    екземплярів. Замінює Postgres для розробки та запуску з одним процесом.
+    """
+
+    presence: Dict[str, str] = {}
+    subscribers: Dict[str, EnvelopeHandler] = {}
+
+    def __init__(self):
+        self.worker_id = new_worker_id()
+
+    async def start(self, handler: EnvelopeHandler):
+        self.subscribers[self.worker_id] = handler
+
+    async def stop(self):
+        self.subscribers.pop(self.worker_id, None)
+        for unique_address, worker_id in list(self.presence.items()):
+            if worker_id == self.worker_id:
+                del self.presence[unique_address]
+
+    async def register(self, unique_address: str):
+        self.presence[unique_address] = self.worker_id
+
+    async def unregister(self, unique_address: str):
+        if self.presence.get(unique_address) == self.worker_id:
+            del self.presence[unique_address]
+
+    async def locate(self, unique_address: str) -> Optional[str]:
+        worker_id = self.presence.get(unique_address)
+        return worker_id if worker_id in self.subscribers else None
+
+    async def live_workers(self) -> Set[str]:
+        return set(self.subscribers)
+
+    async def online_devices(self) -> Dict[str, str]:
+        return {unique_address: worker_id for unique_address, worker_id in self.presence.items()
+                if worker_id in self.subscribers}
+
+    async def publish(self, worker_id: str, envelope: dict):
+        handler = self.subscribers.get(worker_id)
+        if handler is None:
+            raise ValueError(f"Процес {worker_id} не працює")
+        asyncio.create_task(handler(envelope))
+
+    async def broadcast(self, envelope: dict):
+        for worker_id, handler in list(self.subscribers.items()):
+            if worker_id != self.worker_id:
+                asyncio.create_task(handler(envelope))
+
+
+class PostgresDeviceBus:
+    """
+    Маршрутизація між процесами API через Postgres.
+
+    Кожен процес слухає власний канал LISTEN, названий його worker_id, і записує в device_presence
+    пристрої, чиї WebSocket він тримає. Команду для чужого пристрою процес надсилає через NOTIFY
+    у канал власника; так само процес, що чекає результату команди, отримує його від власника.
+    Слухаюче з'єднання має application_name = worker_id, тож записи процесу, що впав разом зі
+    своїм з'єднанням, вважаються недійсними за pg_stat_activity.
+    """
+
+    def __init__(self, dsn: str):
+        self.dsn = dsn
+        self.worker_id = new_worker_id()
+        self.connection = None
+        self.handler: Optional[EnvelopeHandler] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.reconnect_task: Optional[asyncio.Task] = None
+
+    async def start(self, handler: EnvelopeHandler):
+        self.handler = handler
+        self.loop = asyncio.get_running_loop()
+        await asyncio.to_thread(self._purge_stale)
+        await self._listen()
+
+    async def stop(self):
+        if self.reconnect_task is not None:
+            self.reconnect_task.cancel()
+        self._close()
+        await asyncio.to_thread(self._unregister_all)
+
+    async def _listen(self):
+        self.connection = await asyncio.to_thread(psycopg2.connect, self.dsn, application_name=self.worker_id)
+        self.connection.autocommit = True
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {self.worker_id}")
+            cursor.execute(f"LISTEN {BROADCAST_CHANNEL}")
+        self.loop.add_reader(self.connection.fileno(), self._on_notify)
+        logger.info(f"Процес {self.worker_id} слухає команди для своїх пристроїв")
+
+    def _close(self):
+        if self.connection is None:
+            return
+        try:
+            self.loop.remove_reader(self.connection.fileno())
+        except Exception:
+            pass
+        self.connection.close()
+        self.connection = None
+
+    def _on_notify(self):
+        try:
+            self.connection.poll()
+        except psycopg2.Error as e:
+            logger.error(f"Втрачено з'єднання шини пристроїв: {str(e)}")
+            self._close()
+            self.reconnect_task = self.loop.create_task(self._reconnect())
+            return
+
+        while self.connection.notifies:
+            notify = self.connection.notifies.pop(0)
+            try:
+                self.loop.create_task(self.handler(json.loads(notify.payload)))
+            except ValueError as e:
+                logger.warning(f"Некоректне повідомлення шини пристроїв: {str(e)}")
+
+    async def _reconnect(self):
+        while True:
+            await asyncio.sleep(RECONNECT_DELAY)
+            try:
+                await self._listen()
+                return
+            except psycopg2.Error as e:
+                logger.warning(f"Не вдалося відновити з'єднання шини пристроїв: {str(e)}")
+
+    async def register(self, unique_address: str):
+        await asyncio.to_thread(self._register, unique_address)
+
+    async def unregister(self, unique_address: str):
+        await asyncio.to_thread(self._unregister, unique_address)
+
+    async def locate(self, unique_address: str) -> Optional[str]:
+        return await asyncio.to_thread(self._locate, unique_address)
+
+    async def live_workers(self) -> Set[str]:
+        return await asyncio.to_thread(self._live_workers)
+
+    async def online_devices(self) -> Dict[str, str]:
+        return await asyncio.to_thread(self._online_devices)
+
+    async def publish(self, worker_id: str, envelope: dict):
+        await asyncio.to_thread(self._notify, worker_id, json.dumps(envelope))
+
+    async def broadcast(self, envelope: dict):
+        # Власні повідомлення зі спільного каналу отримувач відкидає за полем origin
+        await asyncio.to_thread(self._notify, BROADCAST_CHANNEL, json.dumps(envelope))
+
+    def _register(self, unique_address: str):
+        with DatabaseSession() as db:
+            stmt = pg_insert(DevicePresence).values(unique_address=unique_address, worker_id=self.worker_id)
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=[DevicePresence.unique_address],
+                set_={"worker_id": stmt.excluded.worker_id, "connected_at": stmt.excluded.connected_at}
+            ))
+            db.commit()
+
+    def _unregister(self, unique_address: str):
+        # Пристрій міг уже перепідключитися до іншого процесу, тож видаляється лише власний запис
+        with DatabaseSession() as db:
+            db.query(DevicePresence).filter(
+                DevicePresence.unique_address == unique_address,
+                DevicePresence.worker_id == self.worker_id
+            ).delete(synchronize_session=False)
+            db.commit()
+
+    def _unregister_all(self):
+        with DatabaseSession() as db:
+            db.query(DevicePresence).filter(DevicePresence.worker_id == self.worker_id).delete(
+                synchronize_session=False)
+            db.commit()
+
+    def _locate(self, unique_address: str) -> Optional[str]:
+        with DatabaseSession() as db:
+            return db.execute(
+                select(DevicePresence.worker_id).where(
+                    DevicePresence.unique_address == unique_address,
+                    self._worker_alive()
+                )
+            ).scalar()
+
+    def _online_devices(self) -> Dict[str, str]:
+        with DatabaseSession() as db:
+            return dict(db.execute(
+                select(DevicePresence.unique_address, DevicePresence.worker_id).where(self._worker_alive())
+            ).all())
+
+    @staticmethod
+    def _live_workers() -> Set[str]:
+        with DatabaseSession() as db:
+            rows = db.execute(text("SELECT application_name FROM pg_stat_activity WHERE application_name LIKE :prefix"),
+                              {"prefix": f"{CHANNEL_PREFIX}%"}).scalars()
+            return set(rows)
+
+    def _purge_stale(self):
+        with DatabaseSession() as db:
+            removed = db.query(DevicePresence).filter(~self._worker_alive()).delete(synchronize_session=False)
+            db.commit()
+        if removed:
+            logger.info(f"Видалено {removed} записів присутності пристроїв від зупинених процесів")
+
+    @staticmethod
+    def _worker_alive():
+        return exists(
+            select(1).select_from(text("pg_stat_activity"))
+            .where(text("pg_stat_activity.application_name = device_presence.worker_id"))
+        )
+
+    @staticmethod
+    def _notify(channel: str, payload: str):
+        with DatabaseSession() as db:
+            db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": channel, "payload": payload})
+            db.commit()
+
+
+def create_device_bus(backend: str):
+    if backend == "postgres":
+        return PostgresDeviceBus(connection_string)
+    if backend == "local":
+        return LocalDeviceBus()
+    raise ValueError(f"Невідома шина пристроїв {backend}, доступні: {', '.join(BACKENDS)}")
@@ -0,0 +1,362 @@
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import or_, update
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from data.models import DeviceCommand, DeviceCommandStatus, FeedingEvent, FeedingEventStatus, FoodPatch, IoTDevice
+from data.session import DatabaseSession
+from services.connection_manager import ConnectionManager
+from services.connection_singleton import get_connection_manager
+
+logger = logging.getLogger(__name__)
+
+FINAL_STATUSES = (DeviceCommandStatus.ACKNOWLEDGED, DeviceCommandStatus.FAILED, DeviceCommandStatus.TIMED_OUT,
+                  DeviceCommandStatus.EXPIRED, DeviceCommandStatus.SUPERSEDED)
+# Команди однієї групи в черзі скасовують одна одну: пристрій має отримати лише останню
+COALESCED_ACTIONS = {
+    "activate": "status",
+    "deactivate": "status",
+    "slow_down": "slow_down",
+}
+
+
+class DeviceCommandTracker:
+    """
+    Команди пристроям з ідентифікатором кореляції.
+
+    Кожна команда зберігається в device_commands до надсилання, а її id передається пристрою і
+    повертається в результаті. Без підтвердження за timeout команда надсилається повторно з тим самим
+    id (прошивка не виконує повтор удруге), після retries повторів вона вважається непідтвердженою.
+    Результат, що надійшов на інший процес API, повертається процесу-відправнику через шину пристроїв.
+
+    Команди з queue_ttl для відключеного пристрою чекають у тій самій таблиці зі статусом queued і
+    надсилаються всі разом, по порядку, коли пристрій підключиться.
+    """
+
+    def __init__(self, connection_manager: ConnectionManager, timeout: float, retries: int):
+        self.connection_manager = connection_manager
+        self.timeout = timeout
+        self.retries = retries
+        self.results: Dict[int, asyncio.Future] = {}
+        self.counters = Counter()
+        connection_manager.on_bus_message("command_result", self._on_remote_result)
+        connection_manager.on_bus_message("command_flush", self._on_flush)
+
+    @property
+    def deadline(self) -> float:
+        return self.timeout * (self.retries + 1)
+
+    async def submit(self, db: Session, device: IoTDevice, action: str, payload: Optional[dict] = None,
+                     food_patch_id: Optional[int] = None, queue_ttl: Optional[float] = None) -> DeviceCommand:
+        if queue_ttl is not None and not await self.connection_manager.is_connected(device.unique_address):
+            return await self._queue(db, device, action, payload, queue_ttl)
+
+        # Разом із командою фіксуються й незбережені зміни сесії, наприклад списання корму
+        command = DeviceCommand(
+            device_id=device.id,
+            action=action,
+            payload=payload,
+            food_patch_id=food_patch_id,
+            worker_id=self.connection_manager.worker_id
+        )
+        db.add(command)
+        db.commit()
+        db.refresh(command)
+
+        self.results[command.id] = asyncio.get_running_loop().create_future()
+        self.counters["submitted"] += 1
+        message = {"action": action, "command_id": command.id, **(payload or {})}
+        asyncio.create_task(self._deliver(command.id, device.unique_address, message))
+        return command
+
+    async def _queue(self, db: Session, device: IoTDevice, action: str, payload: Optional[dict],
+                     queue_ttl: float) -> DeviceCommand:
+        now = datetime.now()
+        group = COALESCED_ACTIONS.get(action)
+        if group is not None:
+            superseded = db.query(DeviceCommand).filter(
+                DeviceCommand.device_id == device.id,
+                DeviceCommand.status == DeviceCommandStatus.QUEUED,
+                DeviceCommand.action.in_([name for name, value in COALESCED_ACTIONS.items() if value == group])
+            ).update({DeviceCommand.status: DeviceCommandStatus.SUPERSEDED, DeviceCommand.completed_at: now},
+                     synchronize_session=False)
+            self.counters[DeviceCommandStatus.SUPERSEDED.value] += superseded
+
+        command = DeviceCommand(
+            device_id=device.id,
+            action=action,
+            payload=payload,
+            status=DeviceCommandStatus.QUEUED,
+            expires_at=now + timedelta(seconds=queue_ttl)
+        )
+        db.add(command)
+        db.commit()
+        db.refresh(command)
+        self.counters["queued"] += 1
+        logger.info(f"Пристрій {device.unique_address} не підключений, команду {action} поставлено в чергу")
+
+        # Пристрій міг підключитися, поки команда записувалася, і вже пропустити вибірку своєї черги
+        worker_id = await self.connection_manager.bus.locate(device.unique_address)
+        if worker_id == self.connection_manager.worker_id:
+            await self.flush(db, device.id, device.unique_address)
+        elif worker_id is not None:
+            await self.connection_manager.publish(worker_id, "command_flush", {
+                "device_id": device.id,
+                "unique_address": device.unique_address
+            })
+        return command
+
+    async def flush(self, db: Session, device_id: int, unique_address: str) -> int:
+        """
+        Надсилає чергу пристрою, що підключився до цього процесу: прострочені команди позначаються
+        двома запитами на всю чергу, а решта ставиться у вихідну чергу WebSocket по порядку.
+        """
+        now = datetime.now()
+        queued = (DeviceCommand.device_id == device_id, DeviceCommand.status == DeviceCommandStatus.QUEUED)
+        expired = db.execute(update(DeviceCommand).where(*queued, DeviceCommand.expires_at < now).values(
+            status=DeviceCommandStatus.EXPIRED, completed_at=now, error="Пристрій не підключився вчасно")).rowcount
+        # Оновлення з поверненням рядків забирає кожну команду лише одним процесом
+        rows = db.execute(update(DeviceCommand).where(*queued).values(
+            status=DeviceCommandStatus.PENDING, worker_id=self.connection_manager.worker_id
+        ).returning(DeviceCommand.id, DeviceCommand.action, DeviceCommand.payload)).all()
+        db.commit()
+        self.counters[DeviceCommandStatus.EXPIRED.value] += expired
+
+        sent = []
+        for command_id, action, payload in sorted(rows):
+            if await self._send_claimed(command_id, unique_address,
+                                        {"action": action, "command_id": command_id, **(payload or {})}):
+                sent.append(command_id)
+        self._mark_sent(db, sent)
+        if rows:
+            self.counters["flushed"] += len(rows)
+            logger.info(f"Пристрою {unique_address} надіслано {len(rows)} команд з черги")
+        return len(rows)
+
+    async def dispatch(self, commands: List[Tuple[int, str, dict, Optional[str]]], concurrency: int):
+        """
+        Надсилає пакет команд, уже збережених зі статусом pending, не більше ніж concurrency одночасно.
+        Кожна команда - (id, адреса пристрою, повідомлення, процес, що тримає його з'єднання).
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def send(command_id: int, unique_address: str, message: dict, worker_id: Optional[str]) -> bool:
+            async with semaphore:
+                return await self._send_claimed(command_id, unique_address, message, worker_id)
+
+        self.counters["submitted"] += len(commands)
+        sent = await asyncio.gather(*(send(*command) for command in commands))
+        with DatabaseSession() as db:
+            self._mark_sent(db, [command[0] for command, delivered in zip(commands, sent) if delivered])
+
+    async def _send_claimed(self, command_id: int, unique_address: str, message: dict,
+                            worker_id: Optional[str] = None) -> bool:
+        # Команда вже збережена, тож тут лише надсилання і подальше очікування
+        self.results[command_id] = asyncio.get_running_loop().create_future()
+        try:
+            await self.connection_manager.send_command(unique_address, message, worker_id)
+            sent = True
+        except ValueError:
+            sent = False
+        asyncio.create_task(self._deliver(command_id, unique_address, message, sent))
+        return sent
+
+    @staticmethod
+    def _mark_sent(db: Session, command_ids: List[int]):
+        # Перша спроба пакета фіксується одним запитом після надсилання; до того команда лишається
+        # pending, тож після падіння процесу відомо, що пристрій її не отримав
+        if not command_ids:
+            return
+        db.execute(update(DeviceCommand).where(
+            DeviceCommand.id.in_(command_ids), DeviceCommand.status == DeviceCommandStatus.PENDING
+        ).values(status=DeviceCommandStatus.SENT, attempts=1))
+        db.commit()
+
+    async def _on_flush(self, envelope: dict):
+        with DatabaseSession() as db:
+            await self.flush(db, envelope["device_id"], envelope["unique_address"])
+
+    @staticmethod
+    def expire_queued(db: Session) -> int:
+        now = datetime.now()
+        expired = db.query(DeviceCommand).filter(
+            DeviceCommand.status == DeviceCommandStatus.QUEUED,
+            DeviceCommand.expires_at < now
+        ).update({DeviceCommand.status: DeviceCommandStatus.EXPIRED, DeviceCommand.completed_at: now,
+                  DeviceCommand.error: "Пристрій не підключився вчасно"}, synchronize_session=False)
+        db.commit()
+        return expired
+
+    async def recover_orphaned(self, db: Session) -> int:
+        """
+        Завершує команди процесів, що зупинилися до результату: повторів і тайм-ауту для них уже ніхто не
+        виконає. Ненадіслані (pending) команди вважаються невдалими з поверненням корму, надіслані (sent) -
+        непідтвердженими, бо пристрій міг їх виконати.
+        """
+        live_workers = await self.connection_manager.bus.live_workers()
+        unresolved = (DeviceCommand.status.in_((DeviceCommandStatus.PENDING, DeviceCommandStatus.SENT)),)
+        command_ids = [row.id for row in db.query(DeviceCommand.id).filter(
+            *unresolved,
+            or_(DeviceCommand.worker_id.is_(None), DeviceCommand.worker_id.notin_(live_workers))
+        ).order_by(DeviceCommand.id)]
+
+        recovered = 0
+        for command_id in command_ids:
+            # Процеси можуть запускатися одночасно, тож кожну команду завершує лише той, хто її заблокував
+            command = db.query(DeviceCommand).filter(DeviceCommand.id == command_id, *unresolved).with_for_update(
+                skip_locked=True).first()
+            if command is None:
+                db.rollback()
+                continue
+            if command.status == DeviceCommandStatus.SENT:
+                self._complete(db, command, DeviceCommandStatus.TIMED_OUT, "Процес зупинився до підтвердження команди")
+            else:
+                # Годування за розкладом, команду якого так і не надіслали, знову чекає на надсилання
+                db.query(FeedingEvent).filter(FeedingEvent.command_id == command.id).update(
+                    {FeedingEvent.status: FeedingEventStatus.CLAIMED, FeedingEvent.command_id: None},
+                    synchronize_session=False)
+                self._complete(db, command, DeviceCommandStatus.FAILED, "Процес зупинився до надсилання команди")
+            recovered += 1
+        if recovered:
+            logger.warning(f"Завершено {recovered} команд пристроям, залишених зупиненими процесами")
+        return recovered
+
+    async def wait(self, db: Session, command: DeviceCommand, timeout: float) -> DeviceCommandStatus:
+        future = self.results.get(command.id)
+        if future is not None and timeout > 0:
+            try:
+                await asyncio.wait_for(asyncio.shield(future), timeout)
+            except asyncio.TimeoutError:
+                pass
+        db.refresh(command)
+        return command.status
+
+    async def _deliver(self, command_id: int, unique_address: str, message: dict, sent: bool = False):
+        future = self.results[command_id]
+        delivered = sent
+        error = None
+        try:
+            for attempt in range(1, self.retries + 2):
+                if attempt > 1 or not sent:
+                    try:
+                        await self.connection_manager.send_command(unique_address, message)
+                        delivered = True
+                        self._record_attempt(command_id, attempt, DeviceCommandStatus.SENT, None)
+                    except ValueError as e:
+                        error = str(e)
+                        self._record_attempt(command_id, attempt, None, error)
+
+                try:
+                    await asyncio.wait_for(asyncio.shield(future), self.timeout)
+                    return
+                except asyncio.TimeoutError:
+                    if attempt <= self.retries:
+                        self.counters["resent"] += 1
+                        logger.warning(f"Пристрій {unique_address} не підтвердив команду {command_id}, "
+                                       f"повтор {attempt} з {self.retries}")
+
+            # Недоставлену команду пристрій точно не виконав, а доставлену без підтвердження - невідомо
+            status = DeviceCommandStatus.TIMED_OUT if delivered else DeviceCommandStatus.FAILED
+            with DatabaseSession() as db:
+                command = db.get(DeviceCommand, command_id)
+                if command is not None and command.status not in FINAL_STATUSES:
+                    self._complete(db, command, status, error or "Пристрій не підтвердив команду")
+            if not future.done():
+                future.set_result(status)
+        except Exception as e:
+            logger.exception(f"Помилка при надсиланні команди {command_id} пристрою {unique_address}: {str(e)}")
+        finally:
+            self.results.pop(command_id, None)
+
+    @staticmethod
+    def _record_attempt(command_id: int, attempt: int, status: Optional[DeviceCommandStatus], error: Optional[str]):
+        with DatabaseSession() as db:
+            command = db.get(DeviceCommand, command_id)
+            if command is None or command.status in FINAL_STATUSES:
+                return
+            command.attempts = attempt
+            if status is not None:
+                command.status = status
+            command.error = error
+            db.commit()
+
+    def _complete(self, db: Session, command: DeviceCommand, status: DeviceCommandStatus, error: Optional[str]):
+        if status == DeviceCommandStatus.FAILED and command.status != DeviceCommandStatus.FAILED \
+                and command.food_patch_id is not None:
+            quantity = (command.payload or {}).get("quantity", 0)
+            db.query(FoodPatch).filter(FoodPatch.id == command.food_patch_id).update(
+                {FoodPatch.quantity: FoodPatch.quantity + quantity}, synchronize_session=False)
+            logger.info(f"Корм повернуто до порції {command.food_patch_id} після невдалої команди {command.id}")
+        command.status = status
+        command.error = error
+        command.completed_at = datetime.now()
+        db.commit()
+        self.counters[status.value] += 1
+
+    async def resolve(self, db: Session, command_id: int, success: bool, error: Optional[str] = None):
+        command = db.get(DeviceCommand, command_id)
+        if command is None:
+            logger.warning(f"Отримано результат невідомої команди {command_id}")
+            return
+        if command.status == DeviceCommandStatus.ACKNOWLEDGED or \
+                (command.status == DeviceCommandStatus.FAILED and not success):
+            # Повторне підтвердження команди, надісланої кілька разів
+            return
+
+        status = DeviceCommandStatus.ACKNOWLEDGED if success else DeviceCommandStatus.FAILED
+        self._complete(db, command, status, error)
+
+        future = self.results.get(command_id)
+        if future is not None:
+            if not future.done():
+                future.set_result(status)
+        elif command.worker_id and command.worker_id != self.connection_manager.worker_id:
+            try:
+                await self.connection_manager.publish(command.worker_id, "command_result", {
+                    "command_id": command_id,
+                    "status": status.value
+                })
+            except Exception as e:
+                logger.warning(f"Не вдалося передати результат команди {command_id} процесу "
+                               f"{command.worker_id}: {str(e)}")
+
+    async def oldest_unresolved(self, db: Session, device_id: int, action: str) -> Optional[DeviceCommand]:
+        # Старі прошивки надсилають результат без id, тож він належить найстарішій незавершеній команді.
+        # Команди зупинених процесів ще не завершені відновленням, але результат їм уже не належить
+        live_workers = await self.connection_manager.bus.live_workers()
+        return db.query(DeviceCommand).filter(
+            DeviceCommand.device_id == device_id,
+            DeviceCommand.action == action,
+            DeviceCommand.status.in_((DeviceCommandStatus.PENDING, DeviceCommandStatus.SENT)),
+            DeviceCommand.worker_id.in_(live_workers)
+        ).order_by(DeviceCommand.id).first()
+
+    async def _on_remote_result(self, envelope: dict):
+        future = self.results.get(envelope["command_id"])
+        if future is not None and not future.done():
+            future.set_result(DeviceCommandStatus(envelope["status"]))
+
+    def stats(self) -> dict:
+        return {
+            "timeout": self.timeout,
+            "retries": self.retries,
+            "in_flight": len(self.results),
+            **{name: self.counters[name] for name in ("submitted", "resent", "queued", "flushed")},
+            **{status.value: self.counters[status.value] for status in FINAL_STATUSES},
+        }
+
+
+device_command_tracker = DeviceCommandTracker(
+    get_connection_manager(),
+    timeout=settings.DEVICE_COMMAND_TIMEOUT,
+    retries=settings.DEVICE_COMMAND_RETRIES
+)
+
+
+def get_device_command_tracker() -> DeviceCommandTracker:
+    return device_command_tracker
@@ -1,10 +1,18 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import ARRAY, Float, Integer, and_, bindparam, column, func, insert, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+from collections import Counter, defaultdict
 from datetime import datetime, timedelta
+import math
 
+import numpy as np
+
+from core.config import settings
 from data import db_session, WaterParameter
-from data.models import IoTDevice, FoodPatch, FeedingSchedule, Aquarium
-from typing import List
+from data.models import IoTDevice, FoodPatch, FeedingSchedule, Aquarium, WaterQualityThreshold, DeviceCommand, \
+    DeviceCommandStatus, FeedingEvent, FeedingEventStatus
+from typing import Iterator, List, Optional, Tuple, Union
 
 from schemas.Iot_device_schemas import IoTDeviceCreate, IoTDeviceUpdate
 from schemas.feeding_schemas import FeedingScheduleCreate, FeedingScheduleUpdate
@@ -12,15 +20,40 @@ from schemas.feeding_schemas import FeedingScheduleCreate, FeedingScheduleUpdate
 import logging
 
 from schemas.food_patch_schemas import FoodPatchCreate
-from schemas.water_parameter_schemas import WaterParameterCreate, WaterParameterResponse
-from services.connection_manager import ConnectionManager
+from schemas.water_parameter_schemas import (
+    WaterParameterCreate, WaterParameterResponse, WaterParameterRollupResponse, WaterParameterStatsResponse,
+    WaterParameterChartResponse
+)
+from schemas.water_quality_schemas import WaterQualityThresholdCreate
+from services import water_parameter_archive, water_parameter_statistics
+from services.connection_manager import ConnectionManager, DeviceInfo
 from fastapi import Depends
 
 from services.connection_singleton import get_connection_manager
+from services.device_commands import get_device_command_tracker
+from services.feeding_schedule_index import DueFeeding, get_feeding_schedule_index
+from services.live_telemetry import get_live_telemetry_hub
+from services.pagination import Page, cursor_values, encode_cursor
+from services.recent_readings import get_recent_readings
+from services.telemetry_buffer import get_telemetry_buffer
+from services.telemetry_dedup import FrameSequence, get_telemetry_deduplicator
+from services.water_parameter_downsampling import downsample_columns, reduce_columns
+from services.water_parameter_rollups import count_points, select_resolution, get_rollups
+from services.water_quality_alerts import get_water_quality_alerts
 
 logger = logging.getLogger(__name__)
 
 
+def unnest_rows(name: str, **columns):
+    """
+    Рядки для UPDATE ... FROM як unnest масивів, по параметру на стовпець. На відміну від VALUES, запит не
+    залежить від кількості рядків, тож не компілюється щоразу заново.
+    """
+    arrays = [bindparam(f"{name}_{key}", items, type_=ARRAY(type_)) for key, (items, type_) in columns.items()]
+    return func.unnest(*arrays).table_valued(
+        *(column(key, type_) for key, (_, type_) in columns.items())).render_derived(name=name)
+
+
 class DeviceFeedingService:
     def __init__(self, db: Session, connection_manager: ConnectionManager):
         self.db = db
@@ -49,6 +82,7 @@ class DeviceFeedingService:
         self.db.add(new_device)
         self.db.commit()
         self.db.refresh(new_device)
+        self.connection_manager.presence.register(new_device.unique_address, aquarium_id, aquarium.company_id)
 
         logger.info(f"Новий пристрій успішно встановлено для акваріума {aquarium_id}")
         return new_device
@@ -92,11 +126,11 @@ class DeviceFeedingService:
         try:
             device.is_active = True
             self.db.commit()
+            get_live_telemetry_hub().publish_status(device.aquarium_id, is_active=True)
 
-            if device.unique_address in self.connection_manager.active_connections:
-                await self.connection_manager.send_command(device.unique_address, {"action": "activate"})
-            else:
-                logger.warning(f"Пристрій {device.unique_address} не підключений по WebSocket")
+            # Відключений пристрій отримає команду з черги, щойно підключиться
+            await get_device_command_tracker().submit(self.db, device, "activate",
+                                                      queue_ttl=settings.DEVICE_COMMAND_QUEUE_TTL)
         except Exception as e:
             logger.exception(f"Помилка при активації пристрою {device_id}: {str(e)}")
             self.db.rollback()
@@ -112,11 +146,11 @@ class DeviceFeedingService:
         try:
             device.is_active = False
             self.db.commit()
+            get_live_telemetry_hub().publish_status(device.aquarium_id, is_active=False)
 
-            if device.unique_address in self.connection_manager.active_connections:
-                await self.connection_manager.send_command(device.unique_address, {"action": "deactivate"})
-            else:
-                logger.warning(f"Пристрій {device.unique_address} не підключений по WebSocket")
+            # Відключений пристрій отримає команду з черги, щойно підключиться
+            await get_device_command_tracker().submit(self.db, device, "deactivate",
+                                                      queue_ttl=settings.DEVICE_COMMAND_QUEUE_TTL)
         except Exception as e:
             logger.exception(f"Помилка при деактивації пристрою {device_id}: {str(e)}")
             self.db.rollback()
@@ -125,15 +159,23 @@ class DeviceFeedingService:
         return device
 
     async def sync_device_status(self, unique_address: str):
-        device = self.get_device_by_address(unique_address)
+        device = self.db.query(IoTDevice).filter(IoTDevice.unique_address == unique_address).first()
         if device:
+            self.connection_manager.cache_device(unique_address, device)
+            self.connection_manager.presence.register(unique_address, device.aquarium_id, device.aquarium.company_id)
             action = "activate" if device.is_active else "deactivate"
             await self.connection_manager.send_command(unique_address, {"action": action})
+            await get_device_command_tracker().flush(self.db, device.id, unique_address)
         else:
             logger.warning(f"Пристрій {unique_address} не знайдено при спробі синхронізації статусу")
 
-    async def handle_device_identification(self, unique_address: str):
-        device = self.get_device_by_address(unique_address)
+    async def handle_device_identification(self, unique_address: str, firmware: Optional[str] = None):
+        try:
+            device = self.get_device_info(unique_address)
+        except ValueError:
+            device = None
+        if firmware is not None:
+            self.connection_manager.presence.entry(unique_address).firmware = firmware
         if device:
             await self.connection_manager.send_command(unique_address, {
                 "action": "status_update",
@@ -153,6 +195,7 @@ class DeviceFeedingService:
         self.db.add(new_schedule)
         self.db.commit()
         self.db.refresh(new_schedule)
+        get_feeding_schedule_index().upsert(new_schedule)
         return new_schedule
 
     def get_aquarium_feeding_schedules(self, aquarium_id: int) -> List[FeedingSchedule]:
@@ -171,29 +214,45 @@ class DeviceFeedingService:
             setattr(schedule, key, value)
         self.db.commit()
         self.db.refresh(schedule)
+        get_feeding_schedule_index().upsert(schedule)
         return schedule
 
     def delete_feeding_schedule(self, schedule_id: int):
         schedule = self.get_feeding_schedule(schedule_id)
         self.db.delete(schedule)
         self.db.commit()
+        get_feeding_schedule_index().remove(schedule_id)
 
-    async def send_feed_command(self, device_address: str, food_type: str, quantity: int):
+    async def send_feed_command(self, device: IoTDevice, food_patch: FoodPatch, quantity: int) -> DeviceCommand:
         try:
-            await self.connection_manager.send_command(device_address, {
-                "action": "feed",
-                "food_type": food_type,
+            # Корм списується разом зі збереженням команди і повертається саме до цієї порції, якщо
+            # пристрій повідомить про невдачу. Умова в самому UPDATE не дає паралельним годуванням
+            # списати більше, ніж лишилося
+            updated = self.db.execute(update(FoodPatch).where(
+                FoodPatch.id == food_patch.id, FoodPatch.quantity >= quantity
+            ).values(quantity=FoodPatch.quantity - quantity)).rowcount
+            if not updated:
+                raise ValueError(f"У порції {food_patch.id} не вистачає корму")
+            return await get_device_command_tracker().submit(self.db, device, "feed", {
+                "food_type": food_patch.food_type,
                 "quantity": quantity,
                 "duration": 1.0  # Тривалість годування в секундах сервоприводу
-            })
+            }, food_patch_id=food_patch.id)
         except Exception as e:
+            self.db.rollback()
             logger.error(f"Помилка при відправці команди на годування: {str(e)}")
             raise
 
-    async def feed_now(self, aquarium_id: int) -> dict:
+    async def feed_now(self, aquarium_id: int, timeout: Optional[float] = None) -> dict:
+        """
+        Надсилає команду годування і чекає результату від пристрою не довше timeout секунд
+        (за замовчуванням - усі спроби надсилання). Якщо результату ще немає, повертається статус pending.
+        """
         device = self.get_aquarium_device(aquarium_id)
         if not device.is_active:
             return {"status": "error", "message": "Пристрій деактивовано"}
+        if not await self.connection_manager.is_connected(device.unique_address):
+            return {"status": "error", "message": "Пристрій не підключений"}
 
         food_patch = self.db.query(FoodPatch).filter(
             FoodPatch.iot_device_id == device.id, FoodPatch.quantity > 0
@@ -202,55 +261,187 @@ class DeviceFeedingService:
             return {"status": "error", "message": "Порцію корму не знайдено або він закінчився"}
 
         try:
-            await self.send_feed_command(device.unique_address, food_patch.food_type, 1)
-
-            # Зменшуємо кількість корму в патчі тільки якщо команда відправлена успішно
-            food_patch.quantity -= 1
-            self.db.commit()
-
-            return {"status": "success", "message": "Команда на годування відправлена"}
+            command = await self.send_feed_command(device, food_patch, 1)
         except Exception as e:
             return {"status": "error", "message": f"Помилка при відправці команди на годування: {str(e)}"}
 
-    async def auto_feed(self):
-        current_time = datetime.now().time()
-        one_minute_ago = (datetime.now() - timedelta(minutes=1)).time()
-        schedules = self.db.query(FeedingSchedule).filter(
-            and_(
-                FeedingSchedule.scheduled_time >= one_minute_ago,
-                FeedingSchedule.scheduled_time <= current_time
-            )
-        ).all()
-
-        for schedule in schedules:
-            result = await self.feed_now(schedule.aquarium_id)
-            if result["status"] == "error":
-                logger.warning(
-                    f"Помилка при автоматичному годуванні для акваріума {schedule.aquarium_id}: {result['message']}")
+        tracker = get_device_command_tracker()
+        status = await tracker.wait(self.db, command, tracker.deadline if timeout is None else timeout)
+        result = {"command_id": command.id}
+        if status == DeviceCommandStatus.ACKNOWLEDGED:
+            return {**result, "status": "success", "message": "Годування виконано"}
+        if status == DeviceCommandStatus.FAILED:
+            return {**result, "status": "error",
+                    "message": f"Пристрій не виконав годування, корм повернуто: {command.error or 'невідома помилка'}"}
+        if status == DeviceCommandStatus.TIMED_OUT:
+            return {**result, "status": "error", "message": "Пристрій не підтвердив годування"}
+        return {**result, "status": "pending", "message": "Команда на годування відправлена, результат очікується"}
+
+    def claim_feedings(self, schedules: List[DueFeeding]) -> Tuple[List[Tuple[int, str, dict, Optional[str]]], int,
+                                                                   List[DueFeeding]]:
+        """
+        Готує пакет автоматичних годувань однією транзакцією: записує спрацювання в журнал, списує корм і
+        зберігає команди. Повертає команди для надсилання, кількість годувань, уже виконаних раніше, та
+        годування відключених пристроїв, які треба повторити після їх підключення.
+        """
+        due = {schedule.schedule_id: schedule for schedule in schedules}
+        devices = select(IoTDevice.id).where(
+            IoTDevice.aquarium_id.in_({schedule.aquarium_id for schedule in schedules}))
+        patches = select(FoodPatch.iot_device_id, func.min(FoodPatch.id).label("food_patch_id")).where(
+            FoodPatch.iot_device_id.in_(devices), FoodPatch.quantity > 0
+        ).group_by(FoodPatch.iot_device_id).subquery()
+        # Розклад -> пристрій -> перша непорожня порція корму одним запитом на весь пакет
+        rows = self.db.query(
+            FeedingSchedule.id, FeedingSchedule.aquarium_id, IoTDevice.id, IoTDevice.unique_address,
+            IoTDevice.is_active, FoodPatch.id, FoodPatch.food_type, FoodPatch.quantity
+        ).outerjoin(IoTDevice, IoTDevice.aquarium_id == FeedingSchedule.aquarium_id).outerjoin(
+            patches, patches.c.iot_device_id == IoTDevice.id
+        ).outerjoin(FoodPatch, FoodPatch.id == patches.c.food_patch_id).filter(FeedingSchedule.id.in_(due)).all()
+
+        now = datetime.now()
+        events = []
+        feedings = {}
+        offline = []
+        # Кілька розкладів одного акваріума можуть настати разом, тож корм порції розподіляється між ними
+        allotted = Counter()
+        for (schedule_id, aquarium_id, device_id, unique_address, is_active, food_patch_id, food_type,
+             quantity) in rows:
+            # Стан підключення береться з індексу присутності, а не з шини для кожного пристрою
+            presence = self.connection_manager.presence.entries.get(unique_address)
+            if device_id is None:
+                error = f"IoT пристрій не знайдено для акваріума {aquarium_id}"
+            elif not is_active:
+                error = "Пристрій деактивовано"
+            elif presence is None or not presence.online:
+                error = "Пристрій не підключений"
+                offline.append(schedule_id)
+            elif food_patch_id is None:
+                error = "Порцію корму не знайдено або він закінчився"
+            elif allotted[food_patch_id] + 1 > quantity:
+                error = "Корму не вистачає"
             else:
-                logger.info(f"Команда на автоматичне годування відправлена для акваріума {schedule.aquarium_id}")
-
-            # Обновляем время последнего кормления независимо от результата
-            schedule.last_feed_time = datetime.now().time()
+                error = None
+                allotted[food_patch_id] += 1
+                feedings[schedule_id] = (device_id, unique_address, food_patch_id, food_type, presence.worker_id)
+            if error is not None:
+                logger.warning(f"Помилка при автоматичному годуванні для акваріума {aquarium_id}: {error}")
+            events.append({
+                "schedule_id": schedule_id,
+                "fire_date": due[schedule_id].fire_at.date(),
+                "scheduled_at": due[schedule_id].fire_at,
+                # Відключений пристрій ще може підключитися, тож годування лишається взятим без команди
+                "status": FeedingEventStatus.FAILED if error and schedule_id not in offline
+                else FeedingEventStatus.CLAIMED,
+                "error": error,
+                "created_at": now
+            })
+        if not events:
+            return [], 0, []
+
+        # Інший процес, повторне спрацювання чи наздоганяння після перезапуску натрапляють на унікальний
+        # ключ журналу і не годують удруге; запис без команди можна взяти повторно. Блокування рядка
+        # конфлікту змушує паралельну спробу дочекатися першої і побачити вже надіслане годування. Рядки
+        # передаються параметрами, тож скомпільований запит береться з кешу, а пакетні INSERT складає SQLAlchemy
+        stmt = pg_insert(FeedingEvent)
+        claimed = dict(self.db.execute(stmt.on_conflict_do_update(
+            constraint="uq_feeding_events_schedule_fire_date",
+            set_={"status": stmt.excluded.status, "error": stmt.excluded.error, "created_at": stmt.excluded.created_at},
+            where=and_(FeedingEvent.status == FeedingEventStatus.CLAIMED, FeedingEvent.command_id.is_(None))
+        ).returning(FeedingEvent.schedule_id, FeedingEvent.id), events).all())
+        deferred = [due[schedule_id] for schedule_id in offline if schedule_id in claimed]
+        feedings = {schedule_id: feeding for schedule_id, feeding in feedings.items() if schedule_id in claimed}
+        if not feedings:
             self.db.commit()
+            return [], len(events) - len(claimed), deferred
+
+        quantities = Counter(food_patch_id for _, _, food_patch_id, _, _ in feedings.values())
+        amounts = unnest_rows("amounts", id=(list(quantities), Integer), quantity=(list(quantities.values()), Float))
+        food_patches = FoodPatch.__table__
+        # Порцію могли спорожнити між вибіркою та списанням, тож корм списується лише там, де його ще вистачає
+        # на всі годування пакета; інакше годування цієї порції не виконуються
+        supplied = set(self.db.execute(food_patches.update().where(
+            food_patches.c.id == amounts.c.id, food_patches.c.quantity >= amounts.c.quantity
+        ).values(quantity=food_patches.c.quantity - amounts.c.quantity).returning(food_patches.c.id)).scalars())
+        shortfall = [schedule_id for schedule_id, feeding in feedings.items() if feeding[2] not in supplied]
+        if shortfall:
+            logger.warning(f"Автоматичне годування: корму не вистачає для {len(shortfall)} розкладів")
+            self.db.execute(update(FeedingEvent), [
+                {"id": claimed[schedule_id], "status": FeedingEventStatus.FAILED, "error": "Корму не вистачає"}
+                for schedule_id in shortfall
+            ])
+            feedings = {schedule_id: feeding for schedule_id, feeding in feedings.items() if feeding[2] in supplied}
+            if not feedings:
+                self.db.commit()
+                return [], len(events) - len(claimed), deferred
+
+        # Порядок рядків RETURNING при пакетній вставці не гарантований, тож команди зіставляються з
+        # розкладами за пристроєм; команди одного пристрою в пакеті однакові
+        inserted = self.db.execute(insert(DeviceCommand).returning(DeviceCommand.id, DeviceCommand.device_id), [{
+            "device_id": device_id,
+            "action": "feed",
+            "payload": {"food_type": food_type, "quantity": 1, "duration": 1.0},
+            "food_patch_id": food_patch_id,
+            "status": DeviceCommandStatus.PENDING,
+            "worker_id": self.connection_manager.worker_id,
+            "created_at": now
+        } for device_id, _, food_patch_id, food_type, _ in feedings.values()]).all()
+        device_commands = defaultdict(list)
+        for command_id, device_id in inserted:
+            device_commands[device_id].append(command_id)
+        command_ids = {schedule_id: device_commands[feeding[0]].pop() for schedule_id, feeding in feedings.items()}
+
+        # Одним запитом, а не executemany, який надсилає по запиту на рядок
+        links = unnest_rows("links", id=([claimed[schedule_id] for schedule_id in command_ids], Integer),
+                            command_id=(list(command_ids.values()), Integer))
+        self.db.execute(update(FeedingEvent).where(FeedingEvent.id == links.c.id).values(
+            status=FeedingEventStatus.SENT, command_id=links.c.command_id))
+        self.db.commit()
 
-    async def handle_feed_result(self, device_id: str, success: bool):
-        device = self.db.query(IoTDevice).filter(IoTDevice.unique_address == device_id).first()
-        if not device:
+        commands = [(command_id, feedings[schedule_id][1], {
+            "action": "feed",
+            "command_id": command_id,
+            "food_type": feedings[schedule_id][3],
+            "quantity": 1,
+            "duration": 1.0
+        }, feedings[schedule_id][4]) for schedule_id, command_id in command_ids.items()]
+        return commands, len(events) - len(claimed), deferred
+
+    async def auto_feed(self, schedules: List[DueFeeding]):
+        # Розклади, що настали, визначає індекс розкладів у пам'яті, тож база тут не переглядається
+        try:
+            commands, duplicates, deferred = self.claim_feedings(schedules)
+        except IntegrityError:
+            # Розклад видалили між вибіркою та записом у журнал; повторна вибірка його вже не знайде
+            self.db.rollback()
+            commands, duplicates, deferred = self.claim_feedings(schedules)
+
+        get_feeding_schedule_index().defer(deferred)
+        await get_device_command_tracker().dispatch(commands, settings.FEEDING_DISPATCH_CONCURRENCY)
+        logger.info(f"Автоматичне годування: надіслано {len(commands)} команд, "
+                    f"відкладено до підключення {len(deferred)}, "
+                    f"вже виконано раніше {duplicates} з {len(schedules)} розкладів")
+
+    async def handle_command_result(self, device_id: str, success: bool, command_id: Optional[int] = None,
+                                    error: Optional[str] = None):
+        try:
+            device = self.get_device_info(device_id)
+        except ValueError:
             logger.error(f"Пристрій {device_id} не знайдено")
             return
 
+        tracker = get_device_command_tracker()
+        if command_id is None:
+            command = await tracker.oldest_unresolved(self.db, device.id, "feed")
+            if command is None:
+                logger.warning(f"Результат годування від пристрою {device_id} не відповідає жодній команді")
+                return
+            command_id = command.id
+
         if success:
-            logger.info(f"Годування успішно виконано пристроєм {device_id}")
-            # На майбутнє можливо додам логіку для оновлення стану прострою або запису результату годування
+            logger.info(f"Команду {command_id} успішно виконано пристроєм {device_id}")
         else:
-            logger.error(f"Помилка при годуванні пристроєм {device_id}")
-            # На майбутнє можливу додам логіку для обрабки помилок, наприклад, повернення корму в патч
-            food_patch = self.db.query(FoodPatch).filter(FoodPatch.iot_device_id == device.id).first()
-            if food_patch:
-                food_patch.quantity += 1
-                self.db.commit()
-                logger.info(f"Кількість корму повернуто для пристрою {device_id}")
+            logger.error(f"Пристрій {device_id} не виконав команду {command_id}: {error}")
+        await tracker.resolve(self.db, command_id, success, error)
 
     def get_device_by_address(self, unique_address: str) -> IoTDevice:
         device = self.db.query(IoTDevice).filter(IoTDevice.unique_address == unique_address).first()
@@ -258,23 +449,70 @@ class DeviceFeedingService:
             raise ValueError(f"Пристрій з адресою {unique_address} не знайдено")
         return device
 
-    async def save_water_parameters(self, aquarium_id: int, params: dict):
+    def get_device_info(self, unique_address: str) -> DeviceInfo:
+        device = self.connection_manager.cached_device(unique_address)
+        if device is None:
+            device = self.connection_manager.cache_device(unique_address, self.get_device_by_address(unique_address))
+        return device
+
+    async def save_water_parameters(self, aquarium_id: int, params: dict, sequence: Optional[FrameSequence] = None):
         try:
+            frame_fields = {}
+            deduplicator = get_telemetry_deduplicator()
+            if sequence is not None:
+                if deduplicator.is_duplicate(sequence):
+                    logger.debug(f"Повторний кадр {sequence.seq} пристрою {sequence.device_id} відкинуто")
+                    return
+                frame_fields = {
+                    "boot_id": sequence.boot_id,
+                    "seq": sequence.seq,
+                    "measured_at": await deduplicator.measured_at(sequence)
+                }
+
             water_params = WaterParameterCreate(
                 ph=params['ph'],
                 temperature=params['temperature'],
                 salinity=params['salinity'],
                 oxygen_level=params['oxygen_level'],
-                aquarium_id=aquarium_id
+                aquarium_id=aquarium_id,
+                **frame_fields
             )
-            water_param = WaterParameter(**water_params.dict())
-            self.db.add(water_param)
-            self.db.commit()
+            # Запис у базу відбувається пакетами у фоновому буфері телеметрії
+            row = water_params.dict()
+            # Кадр вважається отриманим, лише коли рядок потрапляє в буфер, інакше повтор пристрою було б відкинуто
+            if sequence is not None and not deduplicator.accept(sequence):
+                logger.debug(f"Повторний кадр {sequence.seq} пристрою {sequence.device_id} відкинуто")
+                return
+            get_telemetry_buffer().add(row)
+            get_recent_readings().append(aquarium_id, water_params.measured_at, row)
+            get_water_quality_alerts().observe(aquarium_id, water_params.measured_at, row)
+            get_live_telemetry_hub().publish_reading(aquarium_id, row)
         except Exception as e:
-            self.db.rollback()
             logger.error(f"Помилка при збереженні параметрів води для акваріума {aquarium_id}: {str(e)}")
             raise
 
+    def get_water_quality_thresholds(self, aquarium_id: int) -> List[WaterQualityThreshold]:
+        return self.db.query(WaterQualityThreshold).filter(WaterQualityThreshold.aquarium_id == aquarium_id).all()
+
+    def set_water_quality_thresholds(self, aquarium_id: int,
+                                     thresholds: List[WaterQualityThresholdCreate]) -> List[WaterQualityThreshold]:
+        self.get_aquarium(aquarium_id)
+        parameters = [threshold.parameter for threshold in thresholds]
+        if len(parameters) != len(set(parameters)):
+            raise ValueError("Кожен параметр води можна вказати лише один раз")
+
+        try:
+            self.db.query(WaterQualityThreshold).filter(WaterQualityThreshold.aquarium_id == aquarium_id).delete()
+            for threshold in thresholds:
+                self.db.add(WaterQualityThreshold(**threshold.dict(), aquarium_id=aquarium_id))
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            raise ValueError(f"Помилка при збереженні порогів якості води: {str(e)}")
+
+        get_water_quality_alerts().invalidate(aquarium_id)
+        return self.get_water_quality_thresholds(aquarium_id)
+
     def fill_food_patch(self, aquarium_id: int, food_patch_data: FoodPatchCreate) -> FoodPatch:
         device = self.get_aquarium_device(aquarium_id)
         if not device:
@@ -305,14 +543,218 @@ class DeviceFeedingService:
         logger.info(f"Порція для акваріума {aquarium_id} успішно видалена")
 
     def get_water_parameters(self, aquarium_id: int, start_date: datetime, end_date: datetime) -> List[WaterParameterResponse]:
+        recent = get_recent_readings()
+        covered_since = recent.covered_since(aquarium_id)
+
+        # Недавній період віддаємо з буфера в пам'яті, у базу йдемо лише за старішою частиною діапазону
+        recent_parameters = []
+        db_end_date, db_end_exclusive = end_date, False
+        if covered_since is not None and end_date.timestamp() >= covered_since.timestamp():
+            recent_parameters = [
+                WaterParameterResponse.model_construct(id=None, **row)
+                for row in recent.rows(aquarium_id, start_date, end_date)
+            ]
+            if start_date.timestamp() >= covered_since.timestamp():
+                return recent_parameters
+            db_end_date, db_end_exclusive = covered_since, True
+
         water_parameters = self.db.query(WaterParameter).filter(
             and_(
                 WaterParameter.aquarium_id == aquarium_id,
                 WaterParameter.measured_at >= start_date,
-                WaterParameter.measured_at <= end_date
+                WaterParameter.measured_at < db_end_date if db_end_exclusive
+                else WaterParameter.measured_at <= db_end_date
             )
         ).order_by(WaterParameter.measured_at.desc()).all()
-        return [WaterParameterResponse.from_orm(param) for param in water_parameters]
+        db_parameters = [WaterParameterResponse.from_orm(param) for param in water_parameters]
+
+        # Старі показники лежать у стиснених блоках архіву, їх ідентифікатори не зберігаються
+        archived_parameters = [
+            WaterParameterResponse.model_construct(id=None, **row)
+            for row in water_parameter_archive.archived_rows(
+                self.db, aquarium_id, start_date, db_end_date, end_exclusive=db_end_exclusive)
+        ]
+        if archived_parameters:
+            db_parameters = sorted(db_parameters + archived_parameters,
+                                   key=lambda param: param.measured_at, reverse=True)
+        return recent_parameters + db_parameters
+
+    def get_water_parameters_page(self, aquarium_id: int, start_date: datetime, end_date: datetime,
+                                  page: Page) -> Tuple[List[WaterParameterResponse], Optional[str]]:
+        fetch = page.limit + 1
+        after_date, after_id = None, None
+        end_exclusive = False
+        if page.after is not None:
+            after_date, after_id = cursor_values((WaterParameter.measured_at, WaterParameter.id), page.after)
+            if after_date.timestamp() <= end_date.timestamp():
+                end_date, end_exclusive = after_date, True
+
+        # Кожне джерело віддає не більше limit + 1 найновіших рядків до курсора, далі вони зливаються
+        recent = get_recent_readings()
+        covered_since = recent.covered_since(aquarium_id)
+        parameters = []
+        db_end_filter = WaterParameter.measured_at <= end_date
+        archive_end_date, archive_end_exclusive = end_date, end_exclusive
+        if covered_since is not None and end_date.timestamp() >= covered_since.timestamp():
+            rows = recent.rows(aquarium_id, start_date, end_date)
+            if end_exclusive:
+                rows = [row for row in rows if row["measured_at"] < end_date]
+            parameters = [WaterParameterResponse.model_construct(id=None, **row) for row in rows[:fetch]]
+            if len(parameters) == fetch or start_date.timestamp() >= covered_since.timestamp():
+                return self._water_parameters_page(parameters, page.limit)
+            db_end_filter = WaterParameter.measured_at < covered_since
+            archive_end_date, archive_end_exclusive = covered_since, True
+
+        query = self.db.query(WaterParameter).filter(
+            WaterParameter.aquarium_id == aquarium_id,
+            WaterParameter.measured_at >= start_date,
+            db_end_filter
+        )
+        if after_date is not None:
+            query = query.filter(
+                tuple_(WaterParameter.measured_at, WaterParameter.id) < tuple_(after_date, after_id or 0))
+        water_parameters = query.order_by(
+            WaterParameter.measured_at.desc(), WaterParameter.id.desc()).limit(fetch).all()
+        parameters += [WaterParameterResponse.from_orm(param) for param in water_parameters]
+
+        parameters += [
+            WaterParameterResponse.model_construct(id=None, **row)
+            for row in water_parameter_archive.archived_rows(
+                self.db, aquarium_id, start_date, archive_end_date,
+                end_exclusive=archive_end_exclusive, limit=fetch)
+        ]
+        parameters.sort(key=lambda param: (param.measured_at, param.id or 0), reverse=True)
+        return self._water_parameters_page(parameters, page.limit)
+
+    @staticmethod
+    def _water_parameters_page(parameters: List[WaterParameterResponse],
+                               limit: int) -> Tuple[List[WaterParameterResponse], Optional[str]]:
+        if len(parameters) <= limit:
+            return parameters, None
+        parameters = parameters[:limit]
+        return parameters, encode_cursor([parameters[-1].measured_at, parameters[-1].id])
+
+    def get_water_parameter_history(self, aquarium_id: int, start_date: datetime, end_date: datetime,
+                                    max_points: int) -> List[Union[WaterParameterResponse, WaterParameterRollupResponse]]:
+        raw_count, buckets = count_points(self.db, aquarium_id, start_date, end_date)
+        resolution = select_resolution(raw_count, buckets, max_points)
+        if resolution is None:
+            return self.get_water_parameters(aquarium_id, start_date, end_date)
+        return get_rollups(self.db, aquarium_id, resolution, start_date, end_date)
+
+    def get_water_parameter_columns(self, aquarium_id: int, start_date: datetime, end_date: datetime,
+                                    end_exclusive: bool = False) -> np.ndarray:
+        """Стовпці [час (epoch), ph, temperature, salinity, oxygen_level] з архіву, бази та буфера в пам'яті."""
+        recent = get_recent_readings()
+        covered_since = recent.covered_since(aquarium_id)
+        if covered_since is not None and covered_since.timestamp() > end_date.timestamp():
+            covered_since = None
+
+        hot_end = covered_since or end_date
+        hot_end_exclusive = covered_since is not None or end_exclusive
+        columns = [
+            water_parameter_archive.archived_columns(
+                self.db, aquarium_id, start_date, hot_end, end_exclusive=hot_end_exclusive),
+            water_parameter_statistics.fetch_columns(
+                self.db, aquarium_id, start_date, hot_end, end_exclusive=hot_end_exclusive)
+        ]
+        if covered_since is not None:
+            window = recent.window(aquarium_id, start_date, end_date)
+            columns.append(window[:, window[0] < end_date.timestamp()] if end_exclusive else window)
+        return np.concatenate(columns, axis=1)
+
+    @staticmethod
+    def _archive_windows(start_date: datetime, end_date: datetime, archived_until: datetime,
+                         step_seconds: int) -> Iterator[Tuple[datetime, datetime, bool]]:
+        """Вікна по step_seconds від start_date, доки вони перетинаються з архівом; останнє обрізається по end_date."""
+        window_start = start_date
+        while window_start.timestamp() <= archived_until.timestamp():
+            window_end = window_start + timedelta(seconds=step_seconds)
+            if window_end.timestamp() > end_date.timestamp():
+                yield window_start, end_date, False
+                return
+            yield window_start, window_end, True
+            window_start = window_end
+
+    def get_water_parameter_chart(self, aquarium_id: int, start_date: datetime, end_date: datetime,
+                                  max_points: int, method: str) -> WaterParameterChartResponse:
+        if end_date.timestamp() < start_date.timestamp():
+            raise ValueError("Кінцева дата не може бути раніше початкової")
+
+        parts, raw_count = [], 0
+        rest_start = start_date
+        archived_until = water_parameter_archive.archived_until(self.db, aquarium_id, start_date, end_date)
+        if archived_until is not None:
+            # Архів розпаковується вікнами розміром з блок, і кожне вікно одразу проріджується до частки
+            # бюджету точок, пропорційної його тривалості; остаточне проріджування йде над відібраними точками
+            step = water_parameter_archive.CHUNK_SECONDS
+            span = max(end_date.timestamp() - start_date.timestamp(), 1.0)
+            budget = max(4, math.ceil(2 * max_points * step / span))
+            for window_start, window_end, end_exclusive in self._archive_windows(
+                    start_date, end_date, archived_until, step):
+                columns = self.get_water_parameter_columns(aquarium_id, window_start, window_end, end_exclusive)
+                raw_count += columns.shape[1]
+                parts.append(reduce_columns(columns, budget, method))
+                rest_start = window_end if end_exclusive else None
+
+        if rest_start is not None:
+            columns = self.get_water_parameter_columns(aquarium_id, rest_start, end_date)
+            raw_count += columns.shape[1]
+            parts.append(columns)
+        return WaterParameterChartResponse(
+            aquarium_id=aquarium_id,
+            method=method,
+            raw_count=raw_count,
+            series=downsample_columns(np.concatenate(parts, axis=1), max_points, method)
+        )
+
+    def get_water_parameter_statistics(self, aquarium_id: int, start_date: datetime, end_date: datetime,
+                                       bucket_seconds: int) -> List[WaterParameterStatsResponse]:
+        span = end_date.timestamp() - start_date.timestamp()
+        if span < 0:
+            raise ValueError("Кінцева дата не може бути раніше початкової")
+        if span / bucket_seconds > water_parameter_statistics.MAX_BUCKETS:
+            raise ValueError(f"Забагато інтервалів, максимум {water_parameter_statistics.MAX_BUCKETS}")
+
+        recent = get_recent_readings()
+        covered_since = recent.covered_since(aquarium_id)
+        if covered_since is not None and covered_since.timestamp() > end_date.timestamp():
+            covered_since = None
+
+        buckets = []
+        archived_until = water_parameter_archive.archived_until(self.db, aquarium_id, start_date, end_date)
+        if archived_until is not None:
+            # Архівні блоки розпаковуються лише в NumPy; щоб не тримати в пам'яті весь діапазон,
+            # архівна частина рахується вікнами з цілих інтервалів приблизно по блоку архіву
+            step = bucket_seconds * max(1, water_parameter_archive.CHUNK_SECONDS // bucket_seconds)
+            for window_start, window_end, end_exclusive in self._archive_windows(
+                    start_date, end_date, archived_until, step):
+                buckets += water_parameter_statistics.numpy_bucket_statistics(
+                    self.get_water_parameter_columns(aquarium_id, window_start, window_end, end_exclusive),
+                    start_date, bucket_seconds)
+                if not end_exclusive:
+                    return [WaterParameterStatsResponse(**bucket) for bucket in buckets]
+                # Вікна вирівняні по інтервалах, тож решта діапазону рахується з нового початку
+                start_date = window_end
+
+        if covered_since is None:
+            buckets += water_parameter_statistics.sql_bucket_statistics(
+                self.db, aquarium_id, start_date, end_date, bucket_seconds)
+            return [WaterParameterStatsResponse(**bucket) for bucket in buckets]
+
+        # Повні інтервали до початку буфера агрегує база, а інтервали, що перетинаються з даними в пам'яті,
+        # рахуються в NumPy над стовпцями з бази та буфера
+        boundary = max(0, math.floor((covered_since.timestamp() - start_date.timestamp()) / bucket_seconds))
+        split_date = water_parameter_statistics.bucket_start(start_date, bucket_seconds, boundary)
+        if boundary > 0:
+            buckets += water_parameter_statistics.sql_bucket_statistics(
+                self.db, aquarium_id, start_date, split_date, bucket_seconds, end_exclusive=True)
+        columns = np.concatenate((
+            water_parameter_statistics.fetch_columns(self.db, aquarium_id, split_date, covered_since),
+            recent.window(aquarium_id, split_date, end_date)
+        ), axis=1)
+        buckets += water_parameter_statistics.numpy_bucket_statistics(columns, start_date, bucket_seconds)
+        return [WaterParameterStatsResponse(**bucket) for bucket in buckets]
 
 
 def get_device_feeding_service(
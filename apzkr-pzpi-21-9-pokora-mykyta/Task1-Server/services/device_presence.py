@@ -0,0 +1,146 @@
+import logging
+import time
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from data.models import Aquarium, IoTDevice
+
+logger = logging.getLogger(__name__)
+
+
+class PresenceEntry:
+    __slots__ = ("unique_address", "aquarium_id", "company_id", "online", "worker_id",
+                 "connected_at", "last_seen", "rtt_ms", "firmware")
+
+    def __init__(self, unique_address: str, aquarium_id: Optional[int] = None, company_id: Optional[int] = None):
+        self.unique_address = unique_address
+        self.aquarium_id = aquarium_id
+        self.company_id = company_id
+        self.online = False
+        self.worker_id: Optional[str] = None
+        self.connected_at: Optional[float] = None
+        self.last_seen: Optional[float] = None
+        self.rtt_ms: Optional[float] = None
+        self.firmware: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class PresenceIndex:
+    """
+    Присутність пристроїв у пам'яті: чи підключений, коли востаннє надсилав дані, затримка
+    heartbeat та версія прошивки, з індексом за компанією.
+
+    Записи власних пристроїв оновлює ConnectionManager цього процесу, записи пристроїв інших
+    процесів надходять знімками через шину. Знімок, що не оновлювався довше stale_after, означає
+    зупинений процес, і його пристрої вважаються відключеними.
+    """
+
+    def __init__(self, stale_after: float):
+        self.stale_after = stale_after
+        self.entries: Dict[str, PresenceEntry] = {}
+        self.companies: Dict[int, Set[str]] = defaultdict(set)
+        self.aquariums: Dict[int, str] = {}
+        self.listeners: List[Callable[[PresenceEntry], None]] = []
+
+    def on_change(self, listener: Callable[[PresenceEntry], None]):
+        # Викликається, коли пристрій підключається або відключається, у тому числі на іншому процесі
+        self.listeners.append(listener)
+
+    def _changed(self, entry: PresenceEntry):
+        for listener in self.listeners:
+            try:
+                listener(entry)
+            except Exception as e:
+                logger.warning(f"Помилка обробника присутності пристрою {entry.unique_address}: {str(e)}")
+
+    def load(self, db: Session):
+        rows = db.query(IoTDevice.unique_address, IoTDevice.aquarium_id, Aquarium.company_id).join(
+            Aquarium, Aquarium.id == IoTDevice.aquarium_id).all()
+        for unique_address, aquarium_id, company_id in rows:
+            self.register(unique_address, aquarium_id, company_id)
+        logger.info(f"Індекс присутності заповнено: {len(rows)} пристроїв")
+
+    def entry(self, unique_address: str) -> PresenceEntry:
+        entry = self.entries.get(unique_address)
+        if entry is None:
+            entry = self.entries[unique_address] = PresenceEntry(unique_address)
+        return entry
+
+    def register(self, unique_address: str, aquarium_id: int, company_id: int) -> PresenceEntry:
+        entry = self.entry(unique_address)
+        if entry.company_id != company_id:
+            if entry.company_id is not None:
+                self.companies[entry.company_id].discard(unique_address)
+            self.companies[company_id].add(unique_address)
+        moved = entry.aquarium_id != aquarium_id
+        if moved:
+            if self.aquariums.get(entry.aquarium_id) == unique_address:
+                del self.aquariums[entry.aquarium_id]
+            self.aquariums[aquarium_id] = unique_address
+        entry.aquarium_id = aquarium_id
+        entry.company_id = company_id
+        if moved and entry.online:
+            self._changed(entry)
+        return entry
+
+    def mark_online(self, unique_address: str, worker_id: str) -> PresenceEntry:
+        entry = self.entry(unique_address)
+        now = time.time()
+        entry.online = True
+        entry.worker_id = worker_id
+        entry.connected_at = now
+        entry.last_seen = now
+        entry.rtt_ms = None
+        self._changed(entry)
+        return entry
+
+    def mark_offline(self, unique_address: str, worker_id: str) -> Optional[PresenceEntry]:
+        # Пристрій міг уже перепідключитися до іншого процесу
+        entry = self.entries.get(unique_address)
+        if entry is None or entry.worker_id != worker_id:
+            return None
+        entry.online = False
+        self._changed(entry)
+        return entry
+
+    def apply(self, snapshot: Iterable[dict]):
+        for data in snapshot:
+            if data.get("company_id") is not None:
+                self.register(data["unique_address"], data["aquarium_id"], data["company_id"])
+            entry = self.entry(data["unique_address"])
+            if not data["online"] and entry.worker_id != data["worker_id"]:
+                continue
+            changed = entry.online != data["online"] or entry.worker_id != data["worker_id"]
+            for name in ("online", "worker_id", "connected_at", "last_seen", "rtt_ms", "firmware"):
+                setattr(entry, name, data[name])
+            if changed:
+                self._changed(entry)
+
+    def local(self, worker_id: str) -> List[PresenceEntry]:
+        return [entry for entry in self.entries.values() if entry.worker_id == worker_id and entry.online]
+
+    def expire(self, worker_id: str):
+        deadline = time.time() - self.stale_after
+        for entry in self.entries.values():
+            if entry.online and entry.worker_id != worker_id and (entry.last_seen or 0) < deadline:
+                entry.online = False
+                self._changed(entry)
+
+    def aquarium(self, aquarium_id: int) -> Optional[PresenceEntry]:
+        unique_address = self.aquariums.get(aquarium_id)
+        return self.entries.get(unique_address) if unique_address is not None else None
+
+    def company(self, company_id: int) -> List[PresenceEntry]:
+        return [self.entries[unique_address] for unique_address in sorted(self.companies.get(company_id, ()))]
+
+
+presence_index = PresenceIndex(stale_after=settings.DEVICE_HEARTBEAT_TIMEOUT * 2)
+
+
+def get_presence_index() -> PresenceIndex:
+    return presence_index
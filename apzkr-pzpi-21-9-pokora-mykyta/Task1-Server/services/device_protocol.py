@@ -0,0 +1,116 @@
+import json
+from typing import Optional, Union
+
+import msgpack
+from fastapi import WebSocket, WebSocketDisconnect
+
+JSON_CODEC = "json"
+MSGPACK_CODEC = "msgpack"
+MSGPACK_SUBPROTOCOL = "finfare.msgpack"
+
+WATER_PARAMETERS = ("ph", "temperature", "salinity", "oxygen_level")
+
+# Короткі ключі та коди дій бінарного протоколу; невідомі ключі передаються без змін
+FIELD_KEYS = {
+    "action": "a",
+    "unique_address": "u",
+    "parameters": "p",
+    "success": "ok",
+    "is_active": "ia",
+    "food_type": "ft",
+    "quantity": "q",
+    "duration": "du",
+    "interval": "iv",
+    "boot_id": "b",
+    "seq": "n",
+    "device_ts": "t",
+    "command_id": "c",
+    "error": "e",
+    "firmware": "fw",
+}
+ACTION_CODES = {
+    "identify": "i",
+    "water_parameters": "w",
+    "feed_result": "r",
+    "activate": "a",
+    "deactivate": "d",
+    "feed": "f",
+    "status_update": "s",
+    "slow_down": "sd",
+    "command_result": "cr",
+    "ping": "pi",
+    "pong": "po",
+}
+FIELD_NAMES = {short: name for name, short in FIELD_KEYS.items()}
+ACTION_NAMES = {short: name for name, short in ACTION_CODES.items()}
+
+
+def negotiate_codec(websocket: WebSocket) -> str:
+    if MSGPACK_SUBPROTOCOL in websocket.scope.get("subprotocols", []):
+        return MSGPACK_CODEC
+    if websocket.query_params.get("codec") == MSGPACK_CODEC:
+        return MSGPACK_CODEC
+    return JSON_CODEC
+
+
+def accepted_subprotocol(websocket: WebSocket) -> Optional[str]:
+    if MSGPACK_SUBPROTOCOL in websocket.scope.get("subprotocols", []):
+        return MSGPACK_SUBPROTOCOL
+    return None
+
+
+def shorten(message: dict) -> dict:
+    frame = {}
+    for key, value in message.items():
+        if key == "action":
+            value = ACTION_CODES.get(value, value)
+        elif key == "parameters" and isinstance(value, dict):
+            # Параметри води передаються масивом у фіксованому порядку
+            value = [value[name] for name in WATER_PARAMETERS]
+        frame[FIELD_KEYS.get(key, key)] = value
+    return frame
+
+
+def expand(frame: dict) -> dict:
+    message = {}
+    for key, value in frame.items():
+        name = FIELD_NAMES.get(key, key)
+        if name == "action":
+            value = ACTION_NAMES.get(value, value)
+        elif name == "parameters" and isinstance(value, (list, tuple)):
+            value = dict(zip(WATER_PARAMETERS, value))
+        message[name] = value
+    return message
+
+
+def encode_message(message: dict, codec: str) -> Union[bytes, str]:
+    if codec == MSGPACK_CODEC:
+        return msgpack.packb(shorten(message))
+    return json.dumps(message, separators=(",", ":"))
+
+
+def decode_message(payload: Union[bytes, str]) -> dict:
+    if isinstance(payload, (bytes, bytearray)):
+        return expand(msgpack.unpackb(payload))
+    return json.loads(payload)
+
+
+async def receive_message(websocket: WebSocket) -> dict:
+    # Старі прошивки надсилають JSON текстом, нові - MessagePack бінарними кадрами
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    if message.get("bytes") is not None:
+        return decode_message(message["bytes"])
+    return decode_message(message["text"])
+
+
+async def send_payload(websocket: WebSocket, payload: Union[bytes, str]):
+    if isinstance(payload, bytes):
+        await websocket.send_bytes(payload)
+    else:
+        await websocket.send_text(payload)
+
+
+async def send_message(websocket: WebSocket, message: dict, codec: str):
+    await send_payload(websocket, encode_message(message, codec))
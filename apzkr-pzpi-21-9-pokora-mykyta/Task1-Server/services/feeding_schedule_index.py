@@ -0,0 +1,273 @@
+import asyncio
+import heapq
+import itertools
+import logging
+from datetime import datetime, time, timedelta
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from data.models import FeedingEvent, FeedingEventStatus, FeedingSchedule
+from services.device_presence import PresenceEntry
+from services.connection_manager import ConnectionManager
+from services.connection_singleton import get_connection_manager
+
+logger = logging.getLogger(__name__)
+
+# Найдовший сон циклу: після переведення годинника наступне годування перераховується не пізніше ніж за хвилину
+MAX_SLEEP = 60.0
+
+
+class ScheduledFeeding(NamedTuple):
+    schedule_id: int
+    aquarium_id: int
+    scheduled_time: time
+
+
+class DueFeeding(NamedTuple):
+    schedule_id: int
+    aquarium_id: int
+    fire_at: datetime  # запланований момент; за його датою годування записується в журнал
+
+
+FireHandler = Callable[[List[DueFeeding]], Awaitable[None]]
+
+
+def next_fire(scheduled_time: time, after: datetime) -> datetime:
+    fire_at = datetime.combine(after.date(), scheduled_time)
+    return fire_at if fire_at > after else fire_at + timedelta(days=1)
+
+
+class FeedingScheduleIndex:
+    """
+    Розклади годування в пам'яті з купою найближчих спрацювань.
+
+    Розклади завантажуються з бази один раз під час запуску, а далі індекс оновлюють ендпоінти
+    розкладів: на своєму процесі напряму, на інших - через шину пристроїв. Цикл спить рівно до
+    найближчого годування, тож база не опитується щохвилини, а годування стається з точністю до секунди.
+    Змінений чи видалений розклад не видаляється з купи, а пропускається за застарілою версією, коли до
+    нього дійде черга.
+
+    Спрацювання, що настали не пізніше ніж grace_period тому, вважаються ще актуальними: після запуску
+    вони виконуються одразу, а старіші пропускаються. Повторне виконання відсіює журнал feeding_events.
+    Годування відключеного пристрою лишається в журналі взятим, але не надісланим, і повторюється, щойно
+    пристрій підключиться, поки не мине grace_period.
+    """
+
+    def __init__(self, connection_manager: ConnectionManager, grace_period: float):
+        self.connection_manager = connection_manager
+        self.grace_period = timedelta(seconds=grace_period)
+        self.schedules: Dict[int, ScheduledFeeding] = {}
+        self.versions: Dict[int, int] = {}
+        self.heap: List[Tuple[datetime, int, int]] = []
+        self.version_ids = itertools.count()
+        self.changed = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.fire: Optional[FireHandler] = None
+        # Не надіслані годування за акваріумом, по одному на розклад
+        self.pending: Dict[int, Dict[int, DueFeeding]] = {}
+        self.fired = 0
+        self.missed = 0
+        self.retried = 0
+        connection_manager.on_bus_message("feeding_schedule", self._on_remote_change)
+        connection_manager.presence.on_change(self._on_presence)
+
+    def load(self, db: Session):
+        rows = db.query(FeedingSchedule.id, FeedingSchedule.aquarium_id, FeedingSchedule.scheduled_time).all()
+        # Відлік від початку вікна, тож годування, пропущені під час перезапуску, потрапляють у купу першими
+        since = datetime.now() - self.grace_period
+        self.schedules.clear()
+        self.versions.clear()
+        self.heap.clear()
+        for row in rows:
+            self._add(ScheduledFeeding(*row), since)
+
+        self.pending.clear()
+        unsent = self.load_unsent(db)
+        logger.info(f"Індекс розкладів годування заповнено: {len(rows)} розкладів, "
+                    f"{unsent} не надісланих годувань")
+
+    def load_unsent(self, db: Session) -> int:
+        """
+        Годування, взяті в журнал, але не надіслані: пристрій був відключений або процес зупинився до
+        надсилання команди. Виконуються одразу для підключених пристроїв, решта - після підключення.
+        """
+        unsent = db.query(FeedingEvent.schedule_id, FeedingSchedule.aquarium_id, FeedingEvent.scheduled_at).join(
+            FeedingSchedule, FeedingSchedule.id == FeedingEvent.schedule_id
+        ).filter(
+            FeedingEvent.status == FeedingEventStatus.CLAIMED,
+            FeedingEvent.command_id.is_(None),
+            FeedingEvent.scheduled_at >= datetime.now() - self.grace_period
+        ).all()
+        feedings = [DueFeeding(*row) for row in unsent]
+        self.defer(feedings)
+        self._retry(list({feeding.aquarium_id for feeding in feedings}))
+        return len(feedings)
+
+    def start(self, fire: FireHandler):
+        self.fire = fire
+        self.task = asyncio.create_task(self._run(fire))
+        self._retry(list(self.pending))
+
+    async def stop(self):
+        self.fire = None
+        if self.task is not None:
+            self.task.cancel()
+
+    def defer(self, feedings: List[DueFeeding]):
+        for feeding in feedings:
+            self.pending.setdefault(feeding.aquarium_id, {})[feeding.schedule_id] = feeding
+
+    def _on_presence(self, entry: PresenceEntry):
+        if entry.online and entry.aquarium_id in self.pending:
+            self._retry([entry.aquarium_id])
+
+    def _retry(self, aquarium_ids: List[int]):
+        # Повторюються лише на процесі, що виконує розклад
+        if self.fire is None:
+            return
+        now = datetime.now()
+        due = []
+        for aquarium_id in aquarium_ids:
+            entry = self.connection_manager.presence.aquarium(aquarium_id)
+            if entry is None or not entry.online:
+                continue
+            due += [feeding for feeding in self.pending.pop(aquarium_id).values()
+                    if now - feeding.fire_at <= self.grace_period]
+        if due:
+            self.retried += len(due)
+            asyncio.create_task(self._fire(self.fire, due))
+
+    def expire_unsent(self, db: Session) -> int:
+        """Позначає невдалими годування, пристрій яких не підключився до кінця вікна."""
+        now = datetime.now()
+        expired = db.execute(update(FeedingEvent).where(
+            FeedingEvent.status == FeedingEventStatus.CLAIMED,
+            FeedingEvent.command_id.is_(None),
+            FeedingEvent.scheduled_at < now - self.grace_period
+        ).values(status=FeedingEventStatus.FAILED, error="Пристрій не підключився вчасно")).rowcount
+        db.commit()
+        for aquarium_id, feedings in list(self.pending.items()):
+            for schedule_id, feeding in list(feedings.items()):
+                if now - feeding.fire_at > self.grace_period:
+                    del feedings[schedule_id]
+            if not feedings:
+                del self.pending[aquarium_id]
+        if expired:
+            logger.warning(f"{expired} годувань не виконано: пристрої не підключилися вчасно")
+        return expired
+
+    def upsert(self, schedule: FeedingSchedule):
+        entry = ScheduledFeeding(schedule.id, schedule.aquarium_id, schedule.scheduled_time)
+        self._apply(entry.schedule_id, entry)
+        self._broadcast({"schedule_id": entry.schedule_id, "aquarium_id": entry.aquarium_id,
+                         "scheduled_time": entry.scheduled_time.isoformat()})
+
+    def remove(self, schedule_id: int):
+        self._apply(schedule_id, None)
+        self._broadcast({"schedule_id": schedule_id})
+
+    def remove_aquariums(self, aquarium_ids: List[int]):
+        # Розклади видаляються каскадом разом з акваріумом, без виклику remove
+        for entry in [entry for entry in self.schedules.values() if entry.aquarium_id in aquarium_ids]:
+            self.remove(entry.schedule_id)
+
+    def next_due(self) -> Optional[datetime]:
+        self._discard_stale()
+        return self.heap[0][0] if self.heap else None
+
+    def _add(self, entry: ScheduledFeeding, after: datetime):
+        version = next(self.version_ids)
+        self.schedules[entry.schedule_id] = entry
+        self.versions[entry.schedule_id] = version
+        heapq.heappush(self.heap, (next_fire(entry.scheduled_time, after), entry.schedule_id, version))
+
+    def _apply(self, schedule_id: int, entry: Optional[ScheduledFeeding]):
+        if entry is None:
+            self.schedules.pop(schedule_id, None)
+            self.versions.pop(schedule_id, None)
+        elif self.schedules.get(schedule_id) != entry:
+            self._add(entry, datetime.now())
+        self.changed.set()
+
+    def _discard_stale(self):
+        while self.heap and self.versions.get(self.heap[0][1]) != self.heap[0][2]:
+            heapq.heappop(self.heap)
+
+    def _broadcast(self, body: dict):
+        asyncio.create_task(self._publish(body))
+
+    async def _publish(self, body: dict):
+        try:
+            await self.connection_manager.publish_all("feeding_schedule", body)
+        except Exception as e:
+            logger.warning(f"Не вдалося розіслати зміну розкладу годування {body['schedule_id']}: {str(e)}")
+
+    async def _on_remote_change(self, envelope: dict):
+        if envelope.get("origin") == self.connection_manager.worker_id:
+            return
+        if "scheduled_time" in envelope:
+            self._apply(envelope["schedule_id"], ScheduledFeeding(
+                envelope["schedule_id"], envelope["aquarium_id"], time.fromisoformat(envelope["scheduled_time"])))
+        else:
+            self._apply(envelope["schedule_id"], None)
+
+    def pop_due(self, now: datetime) -> List[DueFeeding]:
+        due = []
+        self._discard_stale()
+        while self.heap and self.heap[0][0] <= now:
+            fire_at, schedule_id, version = heapq.heappop(self.heap)
+            entry = self.schedules[schedule_id]
+            if now - fire_at <= self.grace_period:
+                due.append(DueFeeding(schedule_id, entry.aquarium_id, fire_at))
+            else:
+                # Процес стояв довше за вікно, наприклад сервер був призупинений
+                self.missed += 1
+                logger.warning(f"Пропущено годування за розкладом {schedule_id} о {fire_at}")
+            heapq.heappush(self.heap, (next_fire(entry.scheduled_time, now), schedule_id, version))
+            self._discard_stale()
+        return due
+
+    async def _run(self, fire: FireHandler):
+        while True:
+            self.changed.clear()
+            due = self.pop_due(datetime.now())
+            if due:
+                self.fired += len(due)
+                # Годування виконується окремим завданням, щоб повільна база не зсувала наступні спрацювання
+                asyncio.create_task(self._fire(fire, due))
+
+            next_due = self.next_due()
+            delay = MAX_SLEEP if next_due is None else (next_due - datetime.now()).total_seconds()
+            try:
+                await asyncio.wait_for(self.changed.wait(), max(0.0, min(delay, MAX_SLEEP)))
+            except asyncio.TimeoutError:
+                pass
+
+    @staticmethod
+    async def _fire(fire: FireHandler, due: List[DueFeeding]):
+        try:
+            await fire(due)
+        except Exception as e:
+            logger.exception(f"Помилка при автоматичному годуванні за розкладом: {str(e)}")
+
+    def stats(self) -> dict:
+        next_due = self.next_due()
+        return {
+            "schedules": len(self.schedules),
+            "heap_size": len(self.heap),
+            "next_due": next_due.isoformat() if next_due else None,
+            "fired": self.fired,
+            "missed": self.missed,
+            "pending": sum(len(feedings) for feedings in self.pending.values()),
+            "retried": self.retried,
+        }
+
+
+feeding_schedule_index = FeedingScheduleIndex(get_connection_manager(), settings.FEEDING_GRACE_PERIOD)
+
+
+def get_feeding_schedule_index() -> FeedingScheduleIndex:
+    return feeding_schedule_index
@@ -0,0 +1,240 @@
+import asyncio
+import itertools
+import logging
+import time
+from collections import Counter, OrderedDict, defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from fastapi import WebSocket
+from fastapi.encoders import jsonable_encoder
+
+from core.config import settings
+from services.connection_manager import ConnectionManager
+from services.connection_singleton import get_connection_manager
+from services.device_presence import PresenceEntry
+
+logger = logging.getLogger(__name__)
+
+# Ідентифікаторів акваріумів в одному повідомленні шини, щоб не перевищити ліміт NOTIFY
+INTEREST_CHUNK = 500
+
+
+class LiveSubscriber:
+    """
+    WebSocket веб-клієнта. Непередані повідомлення зберігаються по одному на акваріум і тип, тож
+    клієнт, що не встигає, отримує найсвіжіший показник замість черги застарілих.
+    """
+
+    def __init__(self, websocket: WebSocket, user_id: str):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.aquarium_ids: Set[int] = set()
+        self.pending: "OrderedDict[Tuple[str, int], dict]" = OrderedDict()
+        self.ready = asyncio.Event()
+        self.writer: Optional[asyncio.Task] = None
+
+
+class LiveTelemetryHub:
+    """
+    Надсилання нових показників води та стану пристроїв підписаним веб-клієнтам прямо з обробки
+    телеметрії, без опитування бази.
+
+    Показник надходить на процес, що тримає WebSocket пристрою, а підписник може бути на іншому.
+    Тому кожен процес розсилає через шину пристроїв список акваріумів, на які в нього є підписки, і
+    отримує показники лише цих акваріумів. Підключення та відключення пристроїв кожен процес уже знає
+    з індексу присутності.
+    """
+
+    def __init__(self, connection_manager: ConnectionManager, send_timeout: float, interest_ttl: float):
+        self.connection_manager = connection_manager
+        self.send_timeout = send_timeout
+        self.interest_ttl = interest_ttl
+        self.subscribers: Dict[int, Set[LiveSubscriber]] = defaultdict(set)
+        # Акваріум -> процеси з підписками на нього та час останнього підтвердження
+        self.remote: Dict[int, Dict[str, float]] = defaultdict(dict)
+        self.refresh_task: Optional[asyncio.Task] = None
+        self.reply_ids = itertools.count()
+        self.counters = Counter()
+        connection_manager.on_bus_message("live_interest", self._on_interest)
+        connection_manager.on_bus_message("live_telemetry", self._on_forwarded)
+        connection_manager.presence.on_change(self._on_presence)
+
+    def start(self):
+        self.refresh_task = asyncio.create_task(self._refresh())
+
+    async def stop(self):
+        if self.refresh_task is not None:
+            self.refresh_task.cancel()
+
+    async def connect(self, websocket: WebSocket, user_id: str) -> LiveSubscriber:
+        await websocket.accept()
+        subscriber = LiveSubscriber(websocket, user_id)
+        subscriber.writer = asyncio.create_task(self._write(subscriber))
+        return subscriber
+
+    async def disconnect(self, subscriber: LiveSubscriber):
+        subscriber.writer.cancel()
+        await self.unsubscribe(subscriber, list(subscriber.aquarium_ids))
+
+    async def subscribe(self, subscriber: LiveSubscriber, aquarium_ids: Iterable[int]):
+        added = []
+        for aquarium_id in aquarium_ids:
+            if aquarium_id in subscriber.aquarium_ids:
+                continue
+            subscriber.aquarium_ids.add(aquarium_id)
+            if not self.subscribers[aquarium_id]:
+                added.append(aquarium_id)
+            self.subscribers[aquarium_id].add(subscriber)
+            self._offer_status(subscriber, aquarium_id)
+        await self._announce(added, [])
+
+    async def unsubscribe(self, subscriber: LiveSubscriber, aquarium_ids: Iterable[int]):
+        removed = []
+        for aquarium_id in aquarium_ids:
+            subscriber.aquarium_ids.discard(aquarium_id)
+            local = self.subscribers.get(aquarium_id)
+            if local is None:
+                continue
+            local.discard(subscriber)
+            if not local:
+                del self.subscribers[aquarium_id]
+                removed.append(aquarium_id)
+        await self._announce([], removed)
+
+    def reply(self, subscriber: LiveSubscriber, message: dict):
+        # Відповіді йдуть через ту саму чергу, щоб не надсилати в WebSocket одночасно із завданням запису
+        self._offer(subscriber, ("reply", next(self.reply_ids)), message)
+
+    def publish_reading(self, aquarium_id: int, row: dict):
+        if aquarium_id not in self.subscribers and not self.remote.get(aquarium_id):
+            return
+        self.publish(aquarium_id, "reading", {
+            "type": "reading",
+            "aquarium_id": aquarium_id,
+            "data": jsonable_encoder({key: value for key, value in row.items() if key not in ("boot_id", "seq")})
+        })
+
+    def publish_status(self, aquarium_id: int, **fields):
+        self.publish(aquarium_id, "status", {"type": "status", "aquarium_id": aquarium_id, **fields})
+
+    def publish(self, aquarium_id: int, kind: str, message: dict, forward: bool = True):
+        for subscriber in self.subscribers.get(aquarium_id, ()):
+            self._offer(subscriber, (kind, aquarium_id), message)
+        if not forward:
+            return
+
+        deadline = time.monotonic() - self.interest_ttl
+        for worker_id, refreshed in list(self.remote.get(aquarium_id, {}).items()):
+            if refreshed < deadline:
+                del self.remote[aquarium_id][worker_id]
+                continue
+            asyncio.create_task(self._forward(worker_id, aquarium_id, kind, message))
+
+    def _offer(self, subscriber: LiveSubscriber, key: Tuple[str, int], message: dict):
+        pending = subscriber.pending.get(key)
+        if pending is not None:
+            self.counters["coalesced"] += 1
+            # Зміни стану доповнюють одна одну, показник замінює попередній
+            message = {**pending, **message} if key[0] == "status" else message
+        subscriber.pending[key] = message
+        subscriber.ready.set()
+
+    def _offer_status(self, subscriber: LiveSubscriber, aquarium_id: int):
+        entry = self.connection_manager.presence.aquarium(aquarium_id)
+        if entry is not None:
+            self._offer(subscriber, ("status", aquarium_id), self._status(entry))
+
+    @staticmethod
+    def _status(entry: PresenceEntry) -> dict:
+        last_seen = datetime.fromtimestamp(entry.last_seen).isoformat() if entry.last_seen else None
+        return {"type": "status", "aquarium_id": entry.aquarium_id, "online": entry.online, "last_seen": last_seen}
+
+    def _on_presence(self, entry: PresenceEntry):
+        # Стан присутності вже є на кожному процесі, тож пересилати його не потрібно
+        if entry.aquarium_id in self.subscribers:
+            self.publish(entry.aquarium_id, "status", self._status(entry), forward=False)
+
+    async def _write(self, subscriber: LiveSubscriber):
+        while True:
+            await subscriber.ready.wait()
+            subscriber.ready.clear()
+            while subscriber.pending:
+                _, message = subscriber.pending.popitem(last=False)
+                try:
+                    await asyncio.wait_for(subscriber.websocket.send_json(message), self.send_timeout)
+                    self.counters["sent"] += 1
+                except asyncio.TimeoutError:
+                    logger.warning(f"Веб-клієнт користувача {subscriber.user_id} не приймає повідомлення, "
+                                   f"з'єднання закрито")
+                    self.counters["evicted"] += 1
+                    asyncio.create_task(subscriber.websocket.close(code=1013))
+                    return
+                except Exception as e:
+                    logger.warning(f"Не вдалося надіслати повідомлення веб-клієнту: {str(e)}")
+                    return
+
+    async def _forward(self, worker_id: str, aquarium_id: int, kind: str, message: dict):
+        try:
+            await self.connection_manager.publish(worker_id, "live_telemetry", {
+                "aquarium_id": aquarium_id,
+                "type": kind,
+                "message": message
+            })
+            self.counters["forwarded"] += 1
+        except Exception as e:
+            # Процес зупинився, а його підписки ще не застаріли
+            self.remote.get(aquarium_id, {}).pop(worker_id, None)
+            logger.debug(f"Не вдалося переслати показник процесу {worker_id}: {str(e)}")
+
+    async def _on_forwarded(self, envelope: dict):
+        self.publish(envelope["aquarium_id"], envelope["type"], envelope["message"], forward=False)
+
+    async def _announce(self, added: list, removed: list):
+        for i in range(0, max(len(added), len(removed)), INTEREST_CHUNK):
+            try:
+                await self.connection_manager.publish_all("live_interest", {
+                    "add": added[i:i + INTEREST_CHUNK],
+                    "remove": removed[i:i + INTEREST_CHUNK]
+                })
+            except Exception as e:
+                logger.warning(f"Не вдалося розіслати підписки веб-клієнтів: {str(e)}")
+                return
+
+    async def _on_interest(self, envelope: dict):
+        if envelope.get("origin") == self.connection_manager.worker_id:
+            return
+        now = time.monotonic()
+        for aquarium_id in envelope["add"]:
+            self.remote[aquarium_id][envelope["origin"]] = now
+        for aquarium_id in envelope["remove"]:
+            workers = self.remote.get(aquarium_id)
+            if workers is not None:
+                workers.pop(envelope["origin"], None)
+                if not workers:
+                    del self.remote[aquarium_id]
+
+    async def _refresh(self):
+        # Повторне оголошення підписок: нові процеси дізнаються про них, а підписки зупинених застарівають
+        while True:
+            await asyncio.sleep(self.interest_ttl / 3)
+            await self._announce(list(self.subscribers), [])
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len({subscriber for local in self.subscribers.values() for subscriber in local}),
+            "aquariums": len(self.subscribers),
+            "remote_aquariums": sum(1 for workers in self.remote.values() if workers),
+            **{name: self.counters[name] for name in ("sent", "coalesced", "forwarded", "evicted")},
+        }
+
+
+live_telemetry_hub = LiveTelemetryHub(
+    get_connection_manager(),
+    send_timeout=settings.LIVE_TELEMETRY_SEND_TIMEOUT,
+    interest_ttl=settings.DEVICE_HEARTBEAT_INTERVAL * 3
+)
+
+
+def get_live_telemetry_hub() -> LiveTelemetryHub:
+    return live_telemetry_hub
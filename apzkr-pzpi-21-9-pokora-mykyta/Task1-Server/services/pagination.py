@@ -0,0 +1,65 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import DateTime, tuple_
+from sqlalchemy.orm import Query
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class Page(NamedTuple):
+    limit: int
+    after: Optional[list]  # значення ключа сортування останнього рядка попередньої сторінки
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    payload = json.dumps([value.isoformat() if isinstance(value, datetime) else value for value in values],
+                         separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise ValueError("Некоректний курсор сторінки")
+    if not isinstance(values, list) or not values:
+        raise ValueError("Некоректний курсор сторінки")
+    return values
+
+
+def cursor_values(columns: Sequence, after: list) -> list:
+    if len(after) != len(columns):
+        raise ValueError("Курсор не відповідає цьому списку")
+    try:
+        return [
+            datetime.fromisoformat(value) if isinstance(column.type, DateTime) and value is not None else value
+            for column, value in zip(columns, after)
+        ]
+    except (TypeError, ValueError):
+        raise ValueError("Некоректний курсор сторінки")
+
+
+def paginate(query: Query, columns: Sequence, page: Optional[Page],
+             descending: bool = False) -> Tuple[List, Optional[str]]:
+    """
+    Сторінка за ключем (keyset): наступна сторінка продовжує після останнього рядка попередньої
+    через порівняння кортежів, тож глибокі сторінки читають індекс так само, як перша.
+    """
+    query = query.order_by(*(column.desc() if descending else column for column in columns))
+    if page is None:
+        return query.all(), None
+
+    if page.after is not None:
+        key, after = tuple_(*columns), tuple_(*cursor_values(columns, page.after))
+        query = query.filter(key < after if descending else key > after)
+
+    items = query.limit(page.limit + 1).all()
+    if len(items) <= page.limit:
+        return items, None
+    items = items[:page.limit]
+    return items, encode_cursor([getattr(items[-1], column.key) for column in columns])
@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import math
+import time
+from collections import Counter
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from core.config import settings
+from services.connection_singleton import get_connection_manager
+
+logger = logging.getLogger(__name__)
+
+POLICIES = ("drop", "coalesce", "slow_down")
+# Не частіше одного прохання сповільнитися на пристрій за цей час
+SLOW_DOWN_NOTICE_SECONDS = 10.0
+
+FrameHandler = Callable[[dict], Awaitable[None]]
+
+
+def validate_limits(rate: float, burst: int):
+    # Нульова швидкість означала б ділення на нуль при розрахунку очікування та інтервалу для пристрою
+    if not rate > 0:
+        raise ValueError(f"Ліміт частоти кадрів має бути більшим за нуль, отримано {rate}")
+    if burst < 1:
+        raise ValueError(f"Запас кадрів має бути не менше одного, отримано {burst}")
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: int):
+        validate_limits(rate, burst)
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def consume(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def wait_time(self) -> float:
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+
+class DeviceRateLimiter:
+    """
+    Обмеження частоти кадрів телеметрії від кожного пристрою маркерним відром.
+
+    Понад ліміт кадр відкидається (drop), замінює собою попередній відкладений кадр і
+    обробляється, щойно з'явиться маркер (coalesce), або відкидається з проханням до пристрою
+    надсилати рідше (slow_down).
+    """
+
+    def __init__(self, rate: float, burst: int, policy: str):
+        if policy not in POLICIES:
+            raise ValueError(f"Невідома політика обмеження {policy}, доступні: {', '.join(POLICIES)}")
+        validate_limits(rate, burst)
+        self.rate = rate
+        self.burst = burst
+        self.policy = policy
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.pending: Dict[str, Tuple[dict, FrameHandler]] = {}
+        self.flush_tasks: Dict[str, asyncio.Task] = {}
+        self.last_notice: Dict[str, float] = {}
+        self.device_counters: Dict[str, Counter] = {}
+        self.counters = Counter()
+
+    async def submit(self, unique_address: str, frame: dict, handler: FrameHandler):
+        bucket = self.buckets.get(unique_address)
+        if bucket is None:
+            bucket = self.buckets[unique_address] = TokenBucket(self.rate, self.burst)
+
+        # Поки є відкладений кадр, нові лише замінюють його, щоб не обігнати його в порядку обробки
+        if unique_address not in self.pending and bucket.consume():
+            self._count(unique_address, "accepted")
+            await handler(frame)
+            return
+
+        if self.policy == "coalesce":
+            self._count(unique_address, "coalesced")
+            self.pending[unique_address] = (frame, handler)
+            if unique_address not in self.flush_tasks:
+                self.flush_tasks[unique_address] = asyncio.create_task(self._flush_later(unique_address))
+            return
+
+        self._count(unique_address, "dropped")
+        if self.policy == "slow_down":
+            await self._ask_to_slow_down(unique_address)
+
+    async def _flush_later(self, unique_address: str):
+        try:
+            bucket = self.buckets[unique_address]
+            while not bucket.consume():
+                await asyncio.sleep(bucket.wait_time())
+            frame, handler = self.pending.pop(unique_address)
+            self._count(unique_address, "accepted")
+            await handler(frame)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.exception(f"Помилка при обробці відкладеного кадру пристрою {unique_address}: {str(e)}")
+        finally:
+            self.flush_tasks.pop(unique_address, None)
+
+    async def _ask_to_slow_down(self, unique_address: str):
+        now = time.monotonic()
+        if now - self.last_notice.get(unique_address, -SLOW_DOWN_NOTICE_SECONDS) < SLOW_DOWN_NOTICE_SECONDS:
+            return
+        self.last_notice[unique_address] = now
+        self._count(unique_address, "slow_down_sent")
+        try:
+            await get_connection_manager().send_command(unique_address, {
+                "action": "slow_down",
+                "interval": math.ceil(1000 / self.rate)
+            })
+        except Exception as e:
+            logger.warning(f"Не вдалося надіслати пристрою {unique_address} прохання сповільнитися: {str(e)}")
+
+    def _count(self, unique_address: str, name: str):
+        self.counters[name] += 1
+        counters = self.device_counters.get(unique_address)
+        if counters is None:
+            counters = self.device_counters[unique_address] = Counter()
+        counters[name] += 1
+
+    def forget(self, unique_address: str):
+        task = self.flush_tasks.pop(unique_address, None)
+        if task is not None:
+            task.cancel()
+        self.pending.pop(unique_address, None)
+        self.buckets.pop(unique_address, None)
+        self.last_notice.pop(unique_address, None)
+        self.device_counters.pop(unique_address, None)
+
+    def stats(self, unique_addresses: Optional[Set[str]] = None) -> dict:
+        """Пристрої в noisiest_devices обмежуються unique_addresses, якщо їх задано."""
+        noisy = sorted(
+            (item for item in self.device_counters.items()
+             if unique_addresses is None or item[0] in unique_addresses),
+            key=lambda item: item[1]["dropped"] + item[1]["coalesced"],
+            reverse=True
+        )[:10]
+        return {
+            "policy": self.policy,
+            "rate": self.rate,
+            "burst": self.burst,
+            "pending": len(self.pending),
+            **{name: self.counters[name] for name in ("accepted", "dropped", "coalesced", "slow_down_sent")},
+            "noisiest_devices": {
+                unique_address: dict(counters) for unique_address, counters in noisy
+                if counters["dropped"] + counters["coalesced"] > 0
+            },
+        }
+
+
+device_rate_limiter = DeviceRateLimiter(
+    rate=settings.DEVICE_RATE_LIMIT,
+    burst=settings.DEVICE_RATE_BURST,
+    policy=settings.DEVICE_RATE_POLICY
+)
+
+
+def get_device_rate_limiter() -> DeviceRateLimiter:
+    return device_rate_limiter
@@ -0,0 +1,125 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from core.config import settings
+
+METRICS = ("ph", "temperature", "salinity", "oxygen_level")
+
+
+class ReadingRing:
+    """Кільцевий буфер фіксованого розміру: рядок 0 - час вимірювання (epoch), далі - по рядку на показник."""
+
+    def __init__(self, capacity: int, covered_since: float):
+        self.capacity = capacity
+        self.columns = np.empty((len(METRICS) + 1, capacity), dtype=np.float64)
+        self.size = 0
+        self.head = 0
+        self.covered_since = covered_since
+
+    def append(self, timestamp: float, values: Tuple[float, ...]):
+        self.columns[0, self.head] = timestamp
+        self.columns[1:, self.head] = values
+        self.head = (self.head + 1) % self.capacity
+        if self.size < self.capacity:
+            self.size += 1
+
+    def ordered(self) -> np.ndarray:
+        if self.size < self.capacity:
+            return self.columns[:, :self.size]
+        return np.concatenate((self.columns[:, self.head:], self.columns[:, :self.head]), axis=1)
+
+    def coverage_start(self) -> float:
+        # Після перезапису найстаріших записів буфер покриває лише період від найстарішого збереженого
+        if self.size < self.capacity:
+            return self.covered_since
+        return max(self.covered_since, float(self.columns[0, self.head]))
+
+    def window(self, start: float, end: float) -> np.ndarray:
+        columns = self.ordered()
+        mask = (columns[0] >= start) & (columns[0] <= end)
+        return columns[:, mask]
+
+
+class RecentReadings:
+    """
+    Останні показники по кожному акваріуму, що надходять через WebSocket цього процесу.
+
+    Пам'ять обмежена: capacity вимірювань на акваріум і не більше max_aquariums буферів
+    (найдавніше оновлені витісняються).
+    """
+
+    def __init__(self, capacity: int, max_aquariums: int):
+        self.capacity = capacity
+        self.max_aquariums = max_aquariums
+        self.rings: "OrderedDict[int, ReadingRing]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def append(self, aquarium_id: int, measured_at: datetime, params: dict):
+        timestamp = measured_at.timestamp()
+        values = tuple(params[metric] for metric in METRICS)
+        with self.lock:
+            ring = self.rings.get(aquarium_id)
+            if ring is None:
+                ring = ReadingRing(self.capacity, covered_since=timestamp)
+                self.rings[aquarium_id] = ring
+                if len(self.rings) > self.max_aquariums:
+                    self.rings.popitem(last=False)
+            else:
+                self.rings.move_to_end(aquarium_id)
+            ring.append(timestamp, values)
+
+    def discard(self, aquarium_id: int):
+        with self.lock:
+            self.rings.pop(aquarium_id, None)
+
+    def covered_since(self, aquarium_id: int) -> Optional[datetime]:
+        with self.lock:
+            ring = self.rings.get(aquarium_id)
+            if ring is None:
+                return None
+            return datetime.fromtimestamp(ring.coverage_start())
+
+    def window(self, aquarium_id: int, start_date: datetime, end_date: datetime) -> np.ndarray:
+        with self.lock:
+            ring = self.rings.get(aquarium_id)
+            if ring is None:
+                return np.empty((len(METRICS) + 1, 0), dtype=np.float64)
+            start = max(start_date.timestamp(), ring.coverage_start())
+            return ring.window(start, end_date.timestamp())
+
+    def rows(self, aquarium_id: int, start_date: datetime, end_date: datetime) -> List[dict]:
+        columns = self.window(aquarium_id, start_date, end_date)
+        order = np.argsort(columns[0], kind="stable")[::-1]
+        columns = columns[:, order]
+        measured_at = [datetime.fromtimestamp(ts) for ts in columns[0].tolist()]
+        values = columns[1:].tolist()
+        return [
+            {"measured_at": measured_at[i], "aquarium_id": aquarium_id,
+             **{metric: values[m][i] for m, metric in enumerate(METRICS)}}
+            for i in range(len(measured_at))
+        ]
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "aquariums": len(self.rings),
+                "max_aquariums": self.max_aquariums,
+                "capacity": self.capacity,
+                "samples": sum(ring.size for ring in self.rings.values()),
+                "memory_bytes": sum(ring.columns.nbytes for ring in self.rings.values()),
+                "max_memory_bytes": self.max_aquariums * self.capacity * (len(METRICS) + 1) * 8,
+            }
+
+
+recent_readings = RecentReadings(
+    capacity=settings.RECENT_READINGS_CAPACITY,
+    max_aquariums=settings.RECENT_READINGS_MAX_AQUARIUMS
+)
+
+
+def get_recent_readings() -> RecentReadings:
+    return recent_readings
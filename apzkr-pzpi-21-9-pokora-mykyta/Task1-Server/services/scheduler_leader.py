@@ -0,0 +1,154 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, List, Optional
+
+import psycopg2
+
+from core.config import settings
+from data.session import connection_string
+
+logger = logging.getLogger(__name__)
+
+LeadershipHandler = Callable[[], Awaitable[None]]
+
+
+class PostgresLeaderLock:
+    """
+    Сесійний advisory lock Postgres на окремому з'єднанні. Блокування живе, поки живе з'єднання, тож
+    після падіння процесу Postgres звільняє його одразу, а не після закінчення оренди.
+    """
+
+    def __init__(self, dsn: str, lock_id: int, keepalive: float):
+        self.dsn = dsn
+        self.lock_id = lock_id
+        self.keepalive = keepalive
+        self.connection = None
+
+    def acquire(self) -> bool:
+        if self.connection is None:
+            # keepalive з обох боків: після розриву мережі Postgres звільняє блокування, а колишній лідер
+            # дізнається про втрату з'єднання приблизно за три періоди, а не за дві години за замовчуванням
+            period = max(1, int(self.keepalive))
+            self.connection = psycopg2.connect(
+                self.dsn, application_name="finfare_scheduler", connect_timeout=period,
+                keepalives=1, keepalives_idle=period, keepalives_interval=period, keepalives_count=3,
+                options=f"-c tcp_keepalives_idle={period} -c tcp_keepalives_interval={period} "
+                        f"-c tcp_keepalives_count=3")
+            self.connection.autocommit = True
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT pg_try_advisory_lock(%s)", (self.lock_id,))
+            return cursor.fetchone()[0]
+
+    def check(self) -> bool:
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        return True
+
+    def release(self):
+        if self.connection is None:
+            return
+        try:
+            self.connection.close()
+        except psycopg2.Error:
+            pass
+        self.connection = None
+
+
+class LocalLeaderLock:
+    """Один процес без Postgres завжди лідер, як і з локальною шиною пристроїв."""
+
+    def acquire(self) -> bool:
+        return True
+
+    def check(self) -> bool:
+        return True
+
+    def release(self):
+        pass
+
+
+class SchedulerLeader:
+    """
+    Вибір єдиного процесу, що виконує планувальник: годування за розкладом та обслуговування бази.
+    Решта процесів кожні retry_interval секунд пробують перехопити блокування і стають лідером,
+    щойно попередній зупиниться чи втратить з'єднання з базою.
+    """
+
+    def __init__(self, lock, retry_interval: float):
+        self.lock = lock
+        self.retry_interval = retry_interval
+        self.is_leader = False
+        self.elected_handlers: List[LeadershipHandler] = []
+        self.demoted_handlers: List[LeadershipHandler] = []
+        self.task: Optional[asyncio.Task] = None
+        self.elections = 0
+
+    def on_elected(self, handler: LeadershipHandler):
+        self.elected_handlers.append(handler)
+
+    def on_demoted(self, handler: LeadershipHandler):
+        self.demoted_handlers.append(handler)
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+        if self.is_leader:
+            await self._set_leader(False)
+        await asyncio.to_thread(self.lock.release)
+
+    async def _run(self):
+        while True:
+            try:
+                if not self.is_leader:
+                    if await asyncio.to_thread(self.lock.acquire):
+                        await self._set_leader(True)
+                else:
+                    await asyncio.to_thread(self.lock.check)
+            except psycopg2.Error as e:
+                # Разом із з'єднанням втрачено й блокування, тож його вже може тримати інший процес
+                logger.warning(f"Втрачено з'єднання блокування планувальника: {str(e)}")
+                await asyncio.to_thread(self.lock.release)
+                if self.is_leader:
+                    await self._set_leader(False)
+            await asyncio.sleep(self.retry_interval)
+
+    async def _set_leader(self, is_leader: bool):
+        self.is_leader = is_leader
+        if is_leader:
+            self.elections += 1
+            logger.info("Процес став лідером планувальника")
+        else:
+            logger.warning("Процес більше не лідер планувальника")
+        for handler in self.elected_handlers if is_leader else self.demoted_handlers:
+            try:
+                await handler()
+            except Exception as e:
+                logger.exception(f"Помилка при зміні лідера планувальника: {str(e)}")
+
+    def stats(self) -> dict:
+        return {
+            "is_leader": self.is_leader,
+            "elections": self.elections,
+            "retry_interval": self.retry_interval,
+        }
+
+
+def create_scheduler_leader(backend: str) -> SchedulerLeader:
+    if backend == "postgres":
+        lock = PostgresLeaderLock(connection_string, settings.SCHEDULER_LOCK_ID,
+                                  keepalive=settings.SCHEDULER_LEADER_RETRY_INTERVAL)
+    elif backend == "local":
+        lock = LocalLeaderLock()
+    else:
+        raise ValueError(f"Невідоме блокування планувальника {backend}, доступні: postgres, local")
+    return SchedulerLeader(lock, settings.SCHEDULER_LEADER_RETRY_INTERVAL)
+
+
+scheduler_leader = create_scheduler_leader(settings.DEVICE_BUS_BACKEND)
+
+
+def get_scheduler_leader() -> SchedulerLeader:
+    return scheduler_leader
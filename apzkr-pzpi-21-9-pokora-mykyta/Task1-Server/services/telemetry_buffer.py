@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Callable, Deque, List, Optional
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from data.models import WaterParameter
+from data.session import DatabaseSession
+from services.telemetry_dedup import get_telemetry_deduplicator
+from services.water_parameter_rollups import upsert_rollups
+
+logger = logging.getLogger(__name__)
+
+
+def write_water_parameters(db: Session, rows: List[dict]):
+    # Повторні кадри відкидає унікальний індекс, і до агрегатів потрапляють лише вставлені рядки
+    stmt = pg_insert(WaterParameter).on_conflict_do_nothing().returning(
+        WaterParameter.aquarium_id, WaterParameter.measured_at,
+        WaterParameter.ph, WaterParameter.temperature, WaterParameter.salinity, WaterParameter.oxygen_level
+    )
+    inserted = [dict(row._mapping) for row in db.execute(stmt, rows)]
+    if len(inserted) < len(rows):
+        get_telemetry_deduplicator().count("database_duplicates", len(rows) - len(inserted))
+    # Агрегати оновлюються в тій самій транзакції, що й сирі показники
+    upsert_rollups(db, inserted)
+
+
+class TelemetryBuffer:
+    """
+    Буфер відкладеного запису (write-behind), за замовчуванням - для параметрів води.
+
+    Показники з усіх WebSocket з'єднань складаються в спільну чергу і записуються
+    пакетами (багаторядковий INSERT, один commit на пакет) при досягненні розміру
+    пакета або після закінчення інтервалу.
+
+    Пакет, який не вдалося записати через з'єднання з базою, повертається в чергу. Пакет з рядком,
+    що порушує обмеження (наприклад, акваріум видалили, поки пристрій ще підключений), ділиться
+    навпіл, доки не залишаться лише такі рядки: вони відкидаються, а решта записується.
+    """
+
+    def __init__(self, flush_size: int, flush_interval: float, max_queue: int,
+                 writer: Optional[Callable[[Session, List[dict]], None]] = None, name: str = "телеметрії"):
+        self.writer = writer or write_water_parameters
+        self.name = name
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.queue: Deque[dict] = deque()
+        self.flush_lock = asyncio.Lock()
+        self.flush_requested = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+        self.rows_flushed = 0
+        self.rows_dropped = 0
+        self.rows_rejected = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.last_flush_latency = 0.0
+        self.max_flush_latency = 0.0
+        self.total_flush_latency = 0.0
+
+    def add(self, row: dict):
+        if len(self.queue) >= self.max_queue:
+            self.queue.popleft()
+            self.rows_dropped += 1
+            if self.rows_dropped % 1000 == 1:
+                logger.error(f"Черга {self.name} переповнена, відкинуто записів: {self.rows_dropped}")
+        self.queue.append(row)
+        if len(self.queue) >= self.flush_size:
+            self.flush_requested.set()
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+            logger.info(f"Буфер {self.name} запущено")
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        await self.flush()
+        logger.info(f"Буфер {self.name} зупинено, у черзі залишилось записів: {len(self.queue)}")
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.flush_requested.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.flush_requested.clear()
+            await self.flush()
+
+    async def flush(self):
+        async with self.flush_lock:
+            while self.queue:
+                batch = [self.queue.popleft() for _ in range(min(self.flush_size, len(self.queue)))]
+                if not await self._flush_batch(batch):
+                    return
+
+    async def _flush_batch(self, batch: List[dict]) -> bool:
+        parts = [batch]
+        while parts:
+            rows = parts.pop()
+            started = time.perf_counter()
+            try:
+                await asyncio.to_thread(self._write_batch, rows)
+            except (IntegrityError, DataError) as e:
+                # Такий рядок не запишеться і на наступному тіку, тож повтор пакета зупинив би запис для всіх
+                if len(rows) > 1:
+                    middle = len(rows) // 2
+                    parts += [rows[middle:], rows[:middle]]
+                else:
+                    self.rows_rejected += 1
+                    if self.rows_rejected % 1000 == 1:
+                        logger.error(f"Відхилено запис {self.name} (усього {self.rows_rejected}): {str(e.orig)}")
+                continue
+            except Exception as e:
+                # Повертаємо незаписані рядки на початок черги, щоб не втратити дані, і пробуємо на наступному тіку
+                unwritten = rows + [row for part in reversed(parts) for row in part]
+                self.queue.extendleft(reversed(unwritten))
+                self.failed_flushes += 1
+                logger.error(f"Помилка при записі пакета {self.name} ({len(unwritten)} записів): {str(e)}")
+                return False
+
+            latency = time.perf_counter() - started
+            self.flushes += 1
+            self.rows_flushed += len(rows)
+            self.last_flush_latency = latency
+            self.max_flush_latency = max(self.max_flush_latency, latency)
+            self.total_flush_latency += latency
+        return True
+
+    def _write_batch(self, rows: List[dict]):
+        with DatabaseSession() as db:
+            self.writer(db, rows)
+            db.commit()
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": len(self.queue),
+            "max_queue": self.max_queue,
+            "flush_size": self.flush_size,
+            "flush_interval": self.flush_interval,
+            "rows_flushed": self.rows_flushed,
+            "rows_dropped": self.rows_dropped,
+            "rows_rejected": self.rows_rejected,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "last_flush_latency_ms": round(self.last_flush_latency * 1000, 3),
+            "max_flush_latency_ms": round(self.max_flush_latency * 1000, 3),
+            "avg_flush_latency_ms": round(self.total_flush_latency / self.flushes * 1000, 3) if self.flushes else 0.0,
+        }
+
+
+telemetry_buffer = TelemetryBuffer(
+    flush_size=settings.TELEMETRY_FLUSH_SIZE,
+    flush_interval=settings.TELEMETRY_FLUSH_INTERVAL,
+    max_queue=settings.TELEMETRY_MAX_QUEUE
+)
+
+
+def get_telemetry_buffer() -> TelemetryBuffer:
+    return telemetry_buffer
@@ -0,0 +1,163 @@
+import asyncio
+import threading
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional, Tuple
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from core.config import settings
+from data.models import DeviceBoot
+from data.session import DatabaseSession
+
+
+class FrameSequence(NamedTuple):
+    device_id: int
+    boot_id: int
+    seq: int
+    device_ts: int  # мілісекунди від старту пристрою
+
+
+def frame_sequence(device_id: int, frame: dict) -> Optional[FrameSequence]:
+    """Нумерація кадру, якщо прошивка її надсилає; старі прошивки обробляються без відсіювання."""
+    if frame.get("boot_id") is None or frame.get("seq") is None or frame.get("device_ts") is None:
+        return None
+    return FrameSequence(device_id, int(frame["boot_id"]), int(frame["seq"]), int(frame["device_ts"]))
+
+
+class SequenceWindow:
+    """Ковзне вікно номерів кадрів одного старту пристрою: найбільший номер і бітова маска попередніх."""
+
+    __slots__ = ("boot_id", "highest", "mask")
+
+    def __init__(self, boot_id: int):
+        self.boot_id = boot_id
+        self.highest = -1
+        self.mask = 0
+
+    def check(self, seq: int, size: int) -> Optional[bool]:
+        """Як accept, але без позначення номера отриманим."""
+        if seq > self.highest:
+            return True
+        offset = self.highest - seq
+        if offset >= size:
+            return None
+        return not self.mask & (1 << offset)
+
+    def accept(self, seq: int, size: int) -> Optional[bool]:
+        """True для нового кадру, False для повтору, None якщо номер старший за вікно."""
+        if seq > self.highest:
+            shift = seq - self.highest
+            self.mask = ((self.mask << shift) | 1) & ((1 << size) - 1) if shift < size else 1
+            self.highest = seq
+            return True
+
+        offset = self.highest - seq
+        if offset >= size:
+            return None
+        bit = 1 << offset
+        if self.mask & bit:
+            return False
+        self.mask |= bit
+        return True
+
+
+class TelemetryDeduplicator:
+    """
+    Відсіювання повторних кадрів телеметрії за (старт пристрою, номер кадру).
+
+    Вікно в пам'яті відкидає повтори ще до буфера запису, кільцевого буфера та контролю якості води.
+    Номери, старші за вікно, і повтори після перезапуску сервера відсіює унікальний індекс
+    water_parameters: час вимірювання обчислюється з часу старту пристрою, збереженого в
+    device_boots, тому повторний кадр отримує той самий ключ.
+
+    Номер кадру позначається отриманим (accept) лише тоді, коли рядок уже переданий у буфер запису:
+    кадр, який не вдалося обробити, пристрій надішле повторно, і повтор не буде відкинуто.
+    """
+
+    def __init__(self, window_size: int, max_devices: int):
+        self.window_size = window_size
+        self.max_devices = max_devices
+        self.windows: "OrderedDict[int, SequenceWindow]" = OrderedDict()
+        self.boots: "OrderedDict[Tuple[int, int], datetime]" = OrderedDict()
+        self.counters = Counter()
+        self.lock = threading.Lock()
+
+    def is_duplicate(self, sequence: FrameSequence) -> bool:
+        """Перевірка до обробки кадру; вікно не змінюється."""
+        with self.lock:
+            window = self.windows.get(sequence.device_id)
+            if window is None or window.boot_id != sequence.boot_id:
+                return False
+            if window.check(sequence.seq, self.window_size) is False:
+                self.counters["duplicates"] += 1
+                return True
+            return False
+
+    def accept(self, sequence: FrameSequence) -> bool:
+        """Позначає кадр отриманим; False, якщо той самий кадр тим часом уже прийнято."""
+        with self.lock:
+            window = self.windows.get(sequence.device_id)
+            if window is None or window.boot_id != sequence.boot_id:
+                window = self.windows[sequence.device_id] = SequenceWindow(sequence.boot_id)
+            self.windows.move_to_end(sequence.device_id)
+            while len(self.windows) > self.max_devices:
+                self.windows.popitem(last=False)
+
+            accepted = window.accept(sequence.seq, self.window_size)
+            if accepted is False:
+                self.counters["duplicates"] += 1
+                return False
+            self.counters["beyond_window" if accepted is None else "accepted"] += 1
+            return True
+
+    async def measured_at(self, sequence: FrameSequence) -> datetime:
+        key = (sequence.device_id, sequence.boot_id)
+        with self.lock:
+            booted_at = self.boots.get(key)
+        if booted_at is None:
+            # Новий старт пристрою записується в базу окремим потоком, щоб не блокувати цикл подій
+            booted_at = await asyncio.to_thread(self._load_boot, sequence)
+            with self.lock:
+                self.boots[key] = booted_at
+                while len(self.boots) > self.max_devices:
+                    self.boots.popitem(last=False)
+        return booted_at + timedelta(milliseconds=sequence.device_ts)
+
+    @staticmethod
+    def _load_boot(sequence: FrameSequence) -> datetime:
+        # Перший кадр старту фіксує його час; якщо запис уже є, береться збережений
+        with DatabaseSession() as db:
+            db.execute(pg_insert(DeviceBoot).values(
+                device_id=sequence.device_id,
+                boot_id=sequence.boot_id,
+                booted_at=datetime.now() - timedelta(milliseconds=sequence.device_ts)
+            ).on_conflict_do_nothing(constraint="uq_device_boots_boot"))
+            db.commit()
+            return db.query(DeviceBoot.booted_at).filter(
+                DeviceBoot.device_id == sequence.device_id,
+                DeviceBoot.boot_id == sequence.boot_id
+            ).scalar()
+
+    def count(self, name: str, value: int = 1):
+        with self.lock:
+            self.counters[name] += value
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "devices": len(self.windows),
+                "window_size": self.window_size,
+                **{name: self.counters[name]
+                   for name in ("accepted", "duplicates", "beyond_window", "database_duplicates")},
+            }
+
+
+telemetry_deduplicator = TelemetryDeduplicator(
+    window_size=settings.TELEMETRY_DEDUP_WINDOW,
+    max_devices=settings.TELEMETRY_DEDUP_MAX_DEVICES
+)
+
+
+def get_telemetry_deduplicator() -> TelemetryDeduplicator:
+    return telemetry_deduplicator
@@ -11,6 +11,7 @@ from api.user import get_current_user
 from data import db_session
 from data.models.user import User
 from schemas.user_schemas import UserUpdateRequest
+from services.water_quality_alerts import get_water_quality_alerts
 from fastapi import Depends
 
 
@@ -62,8 +63,10 @@ class UserService:
             firebase_auth.delete_user(self.current_user['uid'])
             db_user = self.db.query(User).filter(User.firebase_uid == self.current_user['uid']).first()
             if db_user:
+                user_id = db_user.id
                 self.db.delete(db_user)
                 self.db.commit()
+                get_water_quality_alerts().invalidate_user(user_id)
             return {"message": "Користувача успішно видалено"}
         except UserNotFoundError:
             raise ValueError("Користувача не знайдено")
@@ -0,0 +1,215 @@
+import logging
+import struct
+import zlib
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import DateTime, delete, func, select
+from sqlalchemy.orm import Session
+
+from data.models import WaterParameter, WaterParameterArchive
+
+logger = logging.getLogger(__name__)
+
+METRICS = ("ph", "temperature", "salinity", "oxygen_level")
+
+# Заголовок блоку: сигнатура формату та кількість вимірювань
+CHUNK_HEADER = struct.Struct("<4sI")
+CHUNK_MAGIC = b"WPA1"
+# Блок архіву містить показники одного акваріума не більше ніж за добу
+CHUNK_SECONDS = 86400
+
+
+def encode_chunk(times: np.ndarray, values: np.ndarray) -> bytes:
+    """
+    Стискає вимірювання одного акваріума: час (datetime64) і значення у формі (4, n).
+
+    Час зберігається як дельта від дельти в мікросекундах, значення - як XOR з попереднім
+    значенням того ж показника. Обидва потоки розкладаються по байтах, тож нулі від
+    рівномірного опитування та стабільних показників ідуть підряд і добре стискаються zlib.
+    """
+    micros = times.astype("datetime64[us]").astype(np.int64)
+    stream = np.concatenate((micros[:1], np.diff(np.diff(micros), prepend=0)))
+    zigzag = ((stream << 1) ^ (stream >> 63)).view(np.uint64)
+
+    bits = np.ascontiguousarray(values, dtype=np.float64).view(np.uint64)
+    xored = bits.copy()
+    xored[:, 1:] ^= bits[:, :-1]
+
+    matrix = np.vstack((zigzag, xored)).astype("<u8")
+    count = matrix.shape[1]
+    shuffled = matrix.view(np.uint8).reshape(len(matrix), count, 8).transpose(0, 2, 1).tobytes()
+    return CHUNK_HEADER.pack(CHUNK_MAGIC, count) + zlib.compress(shuffled, 9)
+
+
+def decode_chunk(data: bytes) -> Tuple[np.ndarray, np.ndarray]:
+    magic, count = CHUNK_HEADER.unpack_from(data)
+    if magic != CHUNK_MAGIC:
+        raise ValueError("Невідомий формат архівного блоку")
+
+    rows = len(METRICS) + 1
+    raw = np.frombuffer(zlib.decompress(data[CHUNK_HEADER.size:]), dtype=np.uint8)
+    matrix = raw.reshape(rows, 8, count).transpose(0, 2, 1).copy().view("<u8").reshape(rows, count)
+
+    zigzag = matrix[0].astype(np.uint64)
+    stream = (zigzag >> np.uint64(1)).view(np.int64) ^ -(zigzag & np.uint64(1)).view(np.int64)
+    micros = stream[:1].repeat(count)
+    micros[1:] += np.cumsum(np.cumsum(stream[1:]))
+
+    values = np.bitwise_xor.accumulate(matrix[1:].astype(np.uint64), axis=1).view(np.float64)
+    return micros.astype("datetime64[us]"), values
+
+
+def iter_archived(db: Session, aquarium_id: int, start_date: datetime, end_date: datetime,
+                  end_exclusive: bool = False) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Архівні вимірювання акваріума з діапазону частинами, відсортованими за часом.
+
+    Одночасно розпаковується один блок; блоки, що перекриваються в часі (дозаписані пізніше за ту саму
+    добу), розпаковуються разом, тож кожна частина повністю передує наступній.
+    """
+    chunks = db.query(WaterParameterArchive.id, WaterParameterArchive.start_at, WaterParameterArchive.end_at).filter(
+        WaterParameterArchive.aquarium_id == aquarium_id,
+        WaterParameterArchive.start_at <= end_date,
+        WaterParameterArchive.end_at >= start_date
+    ).order_by(WaterParameterArchive.start_at).all()
+
+    start = np.datetime64(start_date, "us")
+    end = np.datetime64(end_date, "us")
+    group, group_end = [], None
+    for chunk in chunks + [None]:
+        if group and (chunk is None or chunk.start_at > group_end):
+            data = db.query(WaterParameterArchive.data).filter(
+                WaterParameterArchive.id.in_(group)).order_by(WaterParameterArchive.start_at).all()
+            decoded = [decode_chunk(row.data) for row in data]
+            times = np.concatenate([chunk_times for chunk_times, _ in decoded])
+            values = np.concatenate([chunk_values for _, chunk_values in decoded], axis=1)
+            mask = (times >= start) & ((times < end) if end_exclusive else (times <= end))
+            order = np.argsort(times[mask], kind="stable")
+            if len(order):
+                yield times[mask][order], values[:, mask][:, order]
+            group = []
+        if chunk is not None:
+            group.append(chunk.id)
+            group_end = chunk.end_at if len(group) == 1 else max(group_end, chunk.end_at)
+
+
+def load_archived(db: Session, aquarium_id: int, start_date: datetime, end_date: datetime,
+                  end_exclusive: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    """Розпаковує архівні вимірювання акваріума з діапазону, відсортовані за часом."""
+    parts = list(iter_archived(db, aquarium_id, start_date, end_date, end_exclusive))
+    if not parts:
+        return np.empty(0, dtype="datetime64[us]"), np.empty((len(METRICS), 0), dtype=np.float64)
+    return np.concatenate([times for times, _ in parts]), np.concatenate([values for _, values in parts], axis=1)
+
+
+def load_latest_archived(db: Session, aquarium_id: int, start_date: datetime, end_date: datetime,
+                         end_exclusive: bool, limit: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Останні limit архівних вимірювань діапазону; розпаковуються лише блоки, що можуть їх містити."""
+    chunks = db.query(WaterParameterArchive.id, WaterParameterArchive.start_at, WaterParameterArchive.end_at).filter(
+        WaterParameterArchive.aquarium_id == aquarium_id,
+        WaterParameterArchive.start_at <= end_date,
+        WaterParameterArchive.end_at >= start_date
+    ).order_by(WaterParameterArchive.end_at.desc()).all()
+
+    start = np.datetime64(start_date, "us")
+    end = np.datetime64(end_date, "us")
+    times_parts, values_parts = [], []
+    found, oldest_start = 0, None
+    for chunk in chunks:
+        # Блоки впорядковані за кінцем, тож коли всі наступні старші за вже знайдене, можна зупинитися
+        if found >= limit and chunk.end_at < oldest_start:
+            break
+        data = db.query(WaterParameterArchive.data).filter(WaterParameterArchive.id == chunk.id).scalar()
+        times, values = decode_chunk(data)
+        mask = (times >= start) & ((times < end) if end_exclusive else (times <= end))
+        times_parts.append(times[mask])
+        values_parts.append(values[:, mask])
+        found += int(mask.sum())
+        oldest_start = chunk.start_at if oldest_start is None else min(oldest_start, chunk.start_at)
+
+    if not times_parts:
+        return np.empty(0, dtype="datetime64[us]"), np.empty((len(METRICS), 0), dtype=np.float64)
+    times = np.concatenate(times_parts)
+    values = np.concatenate(values_parts, axis=1)
+    order = np.argsort(times, kind="stable")[-limit:]
+    return times[order], values[:, order]
+
+
+def archived_rows(db: Session, aquarium_id: int, start_date: datetime, end_date: datetime,
+                  end_exclusive: bool = False, limit: Optional[int] = None) -> List[dict]:
+    if limit is None:
+        times, values = load_archived(db, aquarium_id, start_date, end_date, end_exclusive)
+    else:
+        times, values = load_latest_archived(db, aquarium_id, start_date, end_date, end_exclusive, limit)
+    measured_at = times.tolist()
+    values = values.tolist()
+    return [
+        {"measured_at": measured_at[i], "aquarium_id": aquarium_id,
+         **{metric: values[m][i] for m, metric in enumerate(METRICS)}}
+        for i in range(len(measured_at) - 1, -1, -1)
+    ]
+
+
+def archived_columns(db: Session, aquarium_id: int, start_date: datetime, end_date: datetime,
+                     end_exclusive: bool = False) -> np.ndarray:
+    """Стовпці [час (epoch), ph, temperature, salinity, oxygen_level], як у fetch_columns."""
+    times, values = load_archived(db, aquarium_id, start_date, end_date, end_exclusive)
+    columns = np.empty((len(METRICS) + 1, len(times)), dtype=np.float64)
+    columns[0] = [measured_at.timestamp() for measured_at in times.tolist()]
+    columns[1:] = values
+    return columns
+
+
+def archived_until(db: Session, aquarium_id: int, start_date: datetime, end_date: datetime) -> Optional[datetime]:
+    """Кінець найпізнішого архівного блоку, що перетинається з діапазоном, або None, якщо таких немає."""
+    return db.query(func.max(WaterParameterArchive.end_at)).filter(
+        WaterParameterArchive.aquarium_id == aquarium_id,
+        WaterParameterArchive.start_at <= end_date,
+        WaterParameterArchive.end_at >= start_date
+    ).scalar()
+
+
+def archive_water_parameters(db: Session, older_than: datetime, max_chunks: int) -> int:
+    """Переносить показники, старші за older_than, у стиснені блоки по акваріуму за добу."""
+    day = func.date_trunc("day", WaterParameter.measured_at, type_=DateTime)
+    groups = db.query(WaterParameter.aquarium_id, day).filter(
+        WaterParameter.measured_at < older_than
+    ).group_by(WaterParameter.aquarium_id, day).order_by(day).limit(max_chunks).all()
+
+    archived = 0
+    for aquarium_id, day_start in groups:
+        day_end = min(day_start + timedelta(days=1), older_than)
+        in_range = (
+            WaterParameter.aquarium_id == aquarium_id,
+            WaterParameter.measured_at >= day_start,
+            WaterParameter.measured_at < day_end
+        )
+        rows = db.execute(
+            select(WaterParameter.id, WaterParameter.measured_at,
+                   *(getattr(WaterParameter, metric) for metric in METRICS))
+            .where(*in_range)
+            .order_by(WaterParameter.measured_at, WaterParameter.id)
+            .with_for_update()
+        ).all()
+        if not rows:
+            continue
+
+        times = np.array([row[1] for row in rows], dtype="datetime64[us]")
+        values = np.array([row[2:] for row in rows], dtype=np.float64).T
+        db.add(WaterParameterArchive(
+            aquarium_id=aquarium_id,
+            start_at=rows[0][1],
+            end_at=rows[-1][1],
+            count=len(rows),
+            data=encode_chunk(times, values)
+        ))
+        # Рядки, що з'явилися після вибірки, лишаються в гарячій таблиці до наступного запуску
+        db.execute(delete(WaterParameter).where(*in_range, WaterParameter.id <= max(row[0] for row in rows)))
+        db.commit()
+        archived += len(rows)
+
+    if archived:
+        logger.info(f"Заархівовано {archived} показників води у {len(groups)} блоках")
+    return archived
@@ -0,0 +1,86 @@
+from typing import Dict
+
+import numpy as np
+
+METRICS = ("ph", "temperature", "salinity", "oxygen_level")
+DOWNSAMPLING_METHODS = ("lttb", "minmax")
+
+
+def lttb(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Індекси точок за алгоритмом Largest-Triangle-Three-Buckets.
+
+    Перша й остання точки зберігаються, решта ділиться на max_points - 2 інтервали однакового розміру;
+    з кожного береться точка, що утворює найбільший трикутник з попередньою вибраною точкою
+    та середнім наступного інтервалу.
+    """
+    n = len(x)
+    if n <= max_points or max_points < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    counts = np.diff(edges)
+    next_x = np.append((np.add.reduceat(x[:n - 1], edges[:-1]) / counts)[1:], x[-1])
+    next_y = np.append((np.add.reduceat(y[:n - 1], edges[:-1]) / counts)[1:], y[-1])
+
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    # Вибір у кожному інтервалі залежить від попереднього, тож цикл іде по інтервалах, а не по точках
+    for i in range(max_points - 2):
+        low, high = edges[i], edges[i + 1]
+        areas = np.abs((x[a] - next_x[i]) * (y[low:high] - y[a]) - (x[a] - x[low:high]) * (next_y[i] - y[a]))
+        a = low + int(np.argmax(areas))
+        selected[i + 1] = a
+    return selected
+
+
+def minmax(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """Індекси мінімуму та максимуму кожного інтервалу, разом із першою та останньою точками."""
+    n = len(x)
+    if n <= max_points or max_points < 4:
+        return np.arange(n)
+
+    buckets = (max_points - 2) // 2
+    edges = np.arange(buckets + 1) * n // buckets
+    # Інтервали відрізняються за розміром щонайбільше на одну точку, тож складаються в матрицю з доповненням
+    indexes = edges[:-1, None] + np.arange(np.diff(edges).max())
+    padding = indexes >= edges[1:, None]
+    indexes = np.minimum(indexes, n - 1)
+    values = y[indexes]
+    lows = indexes[np.arange(buckets), np.argmin(np.where(padding, np.inf, values), axis=1)]
+    highs = indexes[np.arange(buckets), np.argmax(np.where(padding, -np.inf, values), axis=1)]
+    return np.unique(np.concatenate(([0, n - 1], lows, highs)))
+
+
+DOWNSAMPLERS = {
+    "lttb": lttb,
+    "minmax": minmax,
+}
+
+
+def downsample_columns(columns: np.ndarray, max_points: int, method: str) -> Dict[str, dict]:
+    """Окремий ряд для кожного показника зі стовпців [час (epoch), ph, temperature, salinity, oxygen_level]."""
+    order = np.argsort(columns[0], kind="stable")
+    columns = columns[:, order]
+    # Відлік від першої точки, щоб площі трикутників не втрачали точність на великих epoch
+    x = columns[0] - columns[0][0] if columns.shape[1] else columns[0]
+    timestamps = np.round(columns[0] * 1000).astype(np.int64)
+
+    series = {}
+    for m, metric in enumerate(METRICS, start=1):
+        indexes = DOWNSAMPLERS[method](x, columns[m], max_points)
+        series[metric] = {
+            "timestamps": timestamps[indexes].tolist(),
+            "values": columns[m][indexes].tolist(),
+        }
+    return series
+
+
+def reduce_columns(columns: np.ndarray, max_points: int, method: str) -> np.ndarray:
+    """Стовпці лише з точками, які метод відбирає хоча б для одного з показників."""
+    columns = columns[:, np.argsort(columns[0], kind="stable")]
+    x = columns[0] - columns[0][0] if columns.shape[1] else columns[0]
+    indexes = np.unique(np.concatenate(
+        [DOWNSAMPLERS[method](x, columns[m], max_points) for m in range(1, len(METRICS) + 1)]))
+    return columns[:, indexes]
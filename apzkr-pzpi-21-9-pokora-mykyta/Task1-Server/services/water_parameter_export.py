@@ -0,0 +1,84 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Iterable, Iterator, Optional
+
+from sqlalchemy import select
+
+from data.models import WaterParameter, Aquarium
+from data.session import DatabaseSession
+from services.water_parameter_archive import iter_archived
+
+EXPORT_COLUMNS = ("id", "aquarium_id", "measured_at", "ph", "temperature", "salinity", "oxygen_level")
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+EXPORT_BATCH_SIZE = 2000
+
+
+def iter_water_parameter_rows(start_date: datetime, end_date: datetime, aquarium_id: Optional[int] = None,
+                              company_id: Optional[int] = None) -> Iterator[tuple]:
+    # Окрема сесія живе стільки ж, скільки і відповідь; рядки читаються серверним курсором пачками
+    with DatabaseSession() as db:
+        if aquarium_id is not None:
+            aquarium_ids = [aquarium_id]
+        else:
+            query = db.query(Aquarium.id).order_by(Aquarium.id)
+            if company_id is not None:
+                query = query.filter(Aquarium.company_id == company_id)
+            aquarium_ids = [row.id for row in query]
+
+        for current_id in aquarium_ids:
+            # Архівні показники старші за гарячу таблицю, тож ідуть першими і без ідентифікаторів
+            # Блоки розпаковуються по одному, щоб пам'ять не росла з довжиною діапазону
+            for times, values in iter_archived(db, current_id, start_date, end_date):
+                for measured_at, row_values in zip(times.tolist(), values.T.tolist()):
+                    yield (None, current_id, measured_at, *row_values)
+
+            stmt = select(*(getattr(WaterParameter, column) for column in EXPORT_COLUMNS)).where(
+                WaterParameter.aquarium_id == current_id,
+                WaterParameter.measured_at >= start_date,
+                WaterParameter.measured_at <= end_date
+            ).order_by(WaterParameter.measured_at).execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+            for row in db.execute(stmt):
+                yield tuple(row)
+
+
+def format_ndjson(rows: Iterable[tuple]) -> Iterator[str]:
+    chunk = []
+    for row in rows:
+        record = dict(zip(EXPORT_COLUMNS, row))
+        record["measured_at"] = record["measured_at"].isoformat()
+        chunk.append(json.dumps(record))
+        if len(chunk) >= EXPORT_BATCH_SIZE:
+            yield "\n".join(chunk) + "\n"
+            chunk = []
+    if chunk:
+        yield "\n".join(chunk) + "\n"
+
+
+def format_csv(rows: Iterable[tuple]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    count = 0
+    for row in rows:
+        writer.writerow(row[:2] + (row[2].isoformat(),) + row[3:])
+        count += 1
+        if count >= EXPORT_BATCH_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            count = 0
+    yield buffer.getvalue()
+
+
+def export_water_parameters(export_format: str, start_date: datetime, end_date: datetime,
+                            aquarium_id: Optional[int] = None, company_id: Optional[int] = None) -> Iterator[str]:
+    rows = iter_water_parameter_rows(start_date, end_date, aquarium_id=aquarium_id, company_id=company_id)
+    if export_format == "csv":
+        return format_csv(rows)
+    return format_ndjson(rows)
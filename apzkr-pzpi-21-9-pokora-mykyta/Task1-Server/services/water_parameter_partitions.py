@@ -0,0 +1,90 @@
+import logging
+import re
+from datetime import date, datetime
+from typing import List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = "water_parameters"
+DEFAULT_PARTITION = "water_parameters_default"
+PARTITION_NAME = re.compile(r"^water_parameters_(\d{4})_(\d{2})$")
+
+
+def month_start(moment: datetime) -> date:
+    return date(moment.year, moment.month, 1)
+
+
+def next_month(month: date) -> date:
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARENT_TABLE}_{month:%Y_%m}"
+
+
+def list_partitions(db: Session) -> List[Tuple[str, date]]:
+    rows = db.execute(text("""
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = :parent
+    """), {"parent": PARENT_TABLE}).scalars()
+
+    partitions = []
+    for name in rows:
+        match = PARTITION_NAME.match(name)
+        if match:
+            partitions.append((name, date(int(match.group(1)), int(match.group(2)), 1)))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def create_partition(db: Session, month: date):
+    name, start, end = partition_name(month), month.isoformat(), next_month(month).isoformat()
+    # Показники за цей місяць могли раніше потрапити до секції за замовчуванням, тому вони
+    # переносяться в нову таблицю до її приєднання
+    db.execute(text(f"CREATE TABLE {name} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    db.execute(text(f"""
+        WITH moved AS (
+            DELETE FROM {DEFAULT_PARTITION}
+            WHERE measured_at >= :start AND measured_at < :end
+            RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """), {"start": start, "end": end})
+    db.execute(text(f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {name} FOR VALUES FROM ('{start}') TO ('{end}')"))
+    db.commit()
+    logger.info(f"Створено секцію {name} показників води")
+
+
+def drop_partition(db: Session, name: str) -> bool:
+    if db.execute(text(f"SELECT EXISTS (SELECT 1 FROM {name})")).scalar():
+        logger.warning(f"Секція {name} ще містить незаархівовані показники, видалення відкладено")
+        return False
+    db.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+    db.execute(text(f"DROP TABLE {name}"))
+    db.commit()
+    logger.info(f"Видалено порожню секцію {name} показників води")
+    return True
+
+
+def maintain_partitions(db: Session, months_ahead: int, expire_before: datetime):
+    """
+    Створює секції на поточний і months_ahead наступних місяців та видаляє секції, що цілком
+    старші за expire_before. Такі секції вже перенесені в архів, і видалення таблиці звільняє
+    місце одразу, на відміну від DELETE.
+    """
+    existing = {month: name for name, month in list_partitions(db)}
+
+    month = month_start(datetime.now())
+    for _ in range(months_ahead + 1):
+        if month not in existing:
+            create_partition(db, month)
+        month = next_month(month)
+
+    for month, name in existing.items():
+        if next_month(month) <= expire_before.date():
+            drop_partition(db, name)
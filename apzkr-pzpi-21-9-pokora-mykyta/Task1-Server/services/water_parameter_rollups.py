@@ -0,0 +1,124 @@
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, func, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from data.models import WaterParameterRollup, RollupResolution
+from schemas.water_parameter_schemas import WaterParameterRollupResponse
+
+METRICS = ("ph", "temperature", "salinity", "oxygen_level")
+
+RESOLUTION_TRUNCATE = {
+    RollupResolution.MINUTE: lambda dt: dt.replace(second=0, microsecond=0),
+    RollupResolution.HOUR: lambda dt: dt.replace(minute=0, second=0, microsecond=0),
+    RollupResolution.DAY: lambda dt: dt.replace(hour=0, minute=0, second=0, microsecond=0),
+}
+
+# Від найдрібнішої до найгрубішої роздільності
+RESOLUTIONS = (RollupResolution.MINUTE, RollupResolution.HOUR, RollupResolution.DAY)
+
+
+def aggregate_rows(rows: Iterable[dict]) -> List[dict]:
+    buckets: Dict[Tuple[int, RollupResolution, datetime], dict] = {}
+    for row in rows:
+        for resolution, truncate in RESOLUTION_TRUNCATE.items():
+            key = (row["aquarium_id"], resolution, truncate(row["measured_at"]))
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = {"aquarium_id": key[0], "resolution": resolution, "bucket_start": key[2], "count": 0}
+                for metric in METRICS:
+                    bucket[f"{metric}_min"] = row[metric]
+                    bucket[f"{metric}_max"] = row[metric]
+                    bucket[f"{metric}_sum"] = 0.0
+                buckets[key] = bucket
+
+            bucket["count"] += 1
+            for metric in METRICS:
+                value = row[metric]
+                if value < bucket[f"{metric}_min"]:
+                    bucket[f"{metric}_min"] = value
+                if value > bucket[f"{metric}_max"]:
+                    bucket[f"{metric}_max"] = value
+                bucket[f"{metric}_sum"] += value
+
+    # Сталий порядок оновлення рядків, щоб паралельні записи не блокували один одного
+    return [buckets[key] for key in sorted(buckets, key=lambda k: (k[0], k[1].name, k[2]))]
+
+
+def upsert_rollups(db: Session, rows: List[dict]):
+    aggregates = aggregate_rows(rows)
+    if not aggregates:
+        return
+
+    stmt = pg_insert(WaterParameterRollup)
+    table = WaterParameterRollup.__table__
+    excluded = stmt.excluded
+    set_ = {"count": table.c["count"] + excluded["count"]}
+    for metric in METRICS:
+        set_[f"{metric}_min"] = func.least(table.c[f"{metric}_min"], excluded[f"{metric}_min"])
+        set_[f"{metric}_max"] = func.greatest(table.c[f"{metric}_max"], excluded[f"{metric}_max"])
+        set_[f"{metric}_sum"] = table.c[f"{metric}_sum"] + excluded[f"{metric}_sum"]
+
+    stmt = stmt.on_conflict_do_update(constraint="uq_water_parameter_rollups_bucket", set_=set_)
+    db.execute(stmt, aggregates)
+
+
+def count_points(db: Session, aquarium_id: int, start_date: datetime, end_date: datetime) -> Tuple[int, dict]:
+    rows = db.query(
+        WaterParameterRollup.resolution,
+        func.count(WaterParameterRollup.id),
+        func.coalesce(func.sum(WaterParameterRollup.count), 0)
+    ).filter(
+        WaterParameterRollup.aquarium_id == aquarium_id,
+        # Та сама нижня межа кожної роздільності, що й у get_rollups, інакше підрахунок не збігається з вибіркою
+        or_(*(and_(WaterParameterRollup.resolution == resolution,
+                   WaterParameterRollup.bucket_start >= RESOLUTION_TRUNCATE[resolution](start_date))
+              for resolution in RESOLUTIONS)),
+        WaterParameterRollup.bucket_start <= end_date
+    ).group_by(WaterParameterRollup.resolution).all()
+
+    buckets = {resolution: 0 for resolution in RESOLUTIONS}
+    raw_count = 0
+    for resolution, bucket_count, sample_count in rows:
+        buckets[resolution] = bucket_count
+        if resolution == RollupResolution.MINUTE:
+            raw_count = int(sample_count)
+    return raw_count, buckets
+
+
+def select_resolution(raw_count: int, buckets: dict, max_points: int) -> Optional[RollupResolution]:
+    """Повертає None, якщо сирі показники вміщуються в бюджет точок, інакше найдрібнішу придатну роздільність."""
+    if raw_count <= max_points:
+        return None
+    for resolution in RESOLUTIONS:
+        if buckets[resolution] <= max_points:
+            return resolution
+    return RESOLUTIONS[-1]
+
+
+def get_rollups(db: Session, aquarium_id: int, resolution: RollupResolution, start_date: datetime,
+                end_date: datetime) -> List[WaterParameterRollupResponse]:
+    rollups = db.query(WaterParameterRollup).filter(
+        WaterParameterRollup.aquarium_id == aquarium_id,
+        WaterParameterRollup.resolution == resolution,
+        WaterParameterRollup.bucket_start >= RESOLUTION_TRUNCATE[resolution](start_date),
+        WaterParameterRollup.bucket_start <= end_date
+    ).order_by(WaterParameterRollup.bucket_start.desc()).all()
+    return [rollup_to_response(rollup) for rollup in rollups]
+
+
+def rollup_to_response(rollup: WaterParameterRollup) -> WaterParameterRollupResponse:
+    values = {}
+    for metric in METRICS:
+        values[metric] = getattr(rollup, f"{metric}_sum") / rollup.count
+        values[f"{metric}_min"] = getattr(rollup, f"{metric}_min")
+        values[f"{metric}_max"] = getattr(rollup, f"{metric}_max")
+    return WaterParameterRollupResponse(
+        aquarium_id=rollup.aquarium_id,
+        resolution=rollup.resolution.value,
+        measured_at=rollup.bucket_start,
+        count=rollup.count,
+        **values
+    )
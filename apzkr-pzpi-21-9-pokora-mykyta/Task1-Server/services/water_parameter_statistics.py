@@ -0,0 +1,116 @@
+from datetime import datetime, timedelta
+from typing import List
+
+import numpy as np
+from sqlalchemy import extract, func, select
+from sqlalchemy.orm import Session
+
+from data.models import WaterParameter
+
+METRICS = ("ph", "temperature", "salinity", "oxygen_level")
+PERCENTILES = (("p5", 0.05), ("p50", 0.5), ("p95", 0.95))
+MAX_BUCKETS = 10_000
+
+
+def bucket_start(start_date: datetime, bucket_seconds: int, index: int) -> datetime:
+    return start_date + timedelta(seconds=bucket_seconds * index)
+
+
+def sql_bucket_statistics(db: Session, aquarium_id: int, start_date: datetime, end_date: datetime,
+                          bucket_seconds: int, end_exclusive: bool = False) -> List[dict]:
+    bucket = func.floor(extract("epoch", WaterParameter.measured_at - start_date) / bucket_seconds).label("bucket")
+    columns = [bucket, func.count().label("count")]
+    for metric in METRICS:
+        column = getattr(WaterParameter, metric)
+        columns += [
+            func.avg(column), func.min(column), func.max(column), func.stddev_samp(column),
+            *(func.percentile_cont(q).within_group(column) for _, q in PERCENTILES)
+        ]
+
+    end_filter = WaterParameter.measured_at < end_date if end_exclusive else WaterParameter.measured_at <= end_date
+    stmt = select(*columns).where(
+        WaterParameter.aquarium_id == aquarium_id,
+        WaterParameter.measured_at >= start_date,
+        end_filter
+    ).group_by(bucket).order_by(bucket)
+
+    result = []
+    for row in db.execute(stmt):
+        item = {"bucket_start": bucket_start(start_date, bucket_seconds, int(row[0])), "count": row[1]}
+        offset = 2
+        for metric in METRICS:
+            mean, minimum, maximum, stddev, *percentiles = row[offset:offset + 4 + len(PERCENTILES)]
+            item[metric] = {
+                "mean": float(mean), "min": minimum, "max": maximum,
+                "stddev": float(stddev) if stddev is not None else None,
+                **{name: float(value) for (name, _), value in zip(PERCENTILES, percentiles)}
+            }
+            offset += 4 + len(PERCENTILES)
+        result.append(item)
+    return result
+
+
+def fetch_columns(db: Session, aquarium_id: int, start_date: datetime, end_date: datetime,
+                  end_exclusive: bool = True) -> np.ndarray:
+    """Стовпці [час (epoch), ph, temperature, salinity, oxygen_level] з діапазону [start_date, end_date)."""
+    end_filter = WaterParameter.measured_at < end_date if end_exclusive else WaterParameter.measured_at <= end_date
+    stmt = select(WaterParameter.measured_at, *(getattr(WaterParameter, metric) for metric in METRICS)).where(
+        WaterParameter.aquarium_id == aquarium_id,
+        WaterParameter.measured_at >= start_date,
+        end_filter
+    )
+    rows = db.execute(stmt).all()
+    columns = np.empty((len(METRICS) + 1, len(rows)), dtype=np.float64)
+    if rows:
+        columns[0] = [row[0].timestamp() for row in rows]
+        columns[1:] = np.array([row[1:] for row in rows], dtype=np.float64).T
+    return columns
+
+
+def numpy_bucket_statistics(columns: np.ndarray, start_date: datetime, bucket_seconds: int) -> List[dict]:
+    if columns.shape[1] == 0:
+        return []
+
+    indexes = np.floor((columns[0] - start_date.timestamp()) / bucket_seconds).astype(np.int64)
+    order = np.argsort(indexes, kind="stable")
+    indexes = indexes[order]
+    columns = columns[:, order]
+
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(indexes)) + 1))
+    counts = np.diff(np.append(starts, len(indexes)))
+    buckets = indexes[starts]
+
+    stats = {}
+    for m, metric in enumerate(METRICS, start=1):
+        values = columns[m]
+        mean = np.add.reduceat(values, starts) / counts
+        deviations = values - np.repeat(mean, counts)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            stddev = np.sqrt(np.add.reduceat(deviations ** 2, starts) / (counts - 1))
+
+        # Сортування значень всередині кожного інтервалу дає перцентилі без циклу по інтервалах
+        sorted_values = values[np.lexsort((values, indexes))]
+        metric_stats = {
+            "mean": mean,
+            "min": np.minimum.reduceat(values, starts),
+            "max": np.maximum.reduceat(values, starts),
+            "stddev": stddev,
+        }
+        for name, q in PERCENTILES:
+            position = q * (counts - 1)
+            lower = np.floor(position).astype(np.int64)
+            upper = np.ceil(position).astype(np.int64)
+            low_values = sorted_values[starts + lower]
+            metric_stats[name] = low_values + (position - lower) * (sorted_values[starts + upper] - low_values)
+        stats[metric] = metric_stats
+
+    result = []
+    for i, index in enumerate(buckets.tolist()):
+        item = {"bucket_start": bucket_start(start_date, bucket_seconds, index), "count": int(counts[i])}
+        for metric in METRICS:
+            item[metric] = {
+                name: (float(values[i]) if not (name == "stddev" and counts[i] < 2) else None)
+                for name, values in stats[metric].items()
+            }
+        result.append(item)
+    return result
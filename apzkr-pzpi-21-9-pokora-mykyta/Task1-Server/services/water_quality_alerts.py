@@ -0,0 +1,246 @@
+import asyncio
+import logging
+import math
+import time
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from data.models import Aquarium, Notification, NotificationType, WaterQualityThreshold
+from data.models.user import user_companies
+from data.session import DatabaseSession
+from services.telemetry_buffer import TelemetryBuffer
+
+logger = logging.getLogger(__name__)
+
+METRICS = ("ph", "temperature", "salinity", "oxygen_level")
+PARAMETER_NAMES = {
+    "ph": "pH",
+    "temperature": "температура",
+    "salinity": "солоність",
+    "oxygen_level": "рівень кисню",
+}
+# Тривога швидкості зміни чи аномалії знімається, коли показник опускається нижче цієї частки порогу
+CLEAR_RATIO = 0.8
+
+
+class ThresholdRule(NamedTuple):
+    min_value: Optional[float]
+    max_value: Optional[float]
+    max_rate: Optional[float]
+    max_z_score: Optional[float]
+    hysteresis: float
+
+
+class AquariumRules(NamedTuple):
+    name: Optional[str]
+    company_id: Optional[int]
+    user_ids: List[int]
+    thresholds: Dict[str, ThresholdRule]
+    loaded_at: float
+
+
+class MetricState:
+    """Інкрементальна статистика одного показника: EWMA швидкості зміни та дисперсія за Велфордом."""
+
+    __slots__ = ("last_value", "last_ts", "rate", "count", "mean", "m2", "variance")
+
+    def __init__(self):
+        self.last_value = 0.0
+        self.last_ts: Optional[float] = None
+        self.rate: Optional[float] = None
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.variance = 0.0
+
+    def z_score(self, value: float, warmup: int) -> Optional[float]:
+        if self.count < warmup or self.variance <= 0:
+            return None
+        return abs(value - self.mean) / math.sqrt(self.variance)
+
+    def update(self, value: float, timestamp: float, alpha: float, window: int):
+        if self.last_ts is not None and timestamp > self.last_ts:
+            rate = (value - self.last_value) / ((timestamp - self.last_ts) / 60)
+            self.rate = rate if self.rate is None else alpha * rate + (1 - alpha) * self.rate
+        self.last_value = value
+        self.last_ts = timestamp
+
+        delta = value - self.mean
+        if self.count < window:
+            self.count += 1
+            self.mean += delta / self.count
+            self.m2 += delta * (value - self.mean)
+            self.variance = self.m2 / (self.count - 1) if self.count > 1 else 0.0
+        else:
+            # Після заповнення вікна переходимо до експоненційно зваженого варіанту, щоб статистика не застигала
+            self.mean += delta / window
+            self.variance = (1 - 1 / window) * (self.variance + delta * delta / window)
+
+
+def write_notifications(db: Session, rows: List[dict]):
+    db.execute(insert(Notification), rows)
+
+
+class WaterQualityAlerts:
+    def __init__(self, ewma_alpha: float, stats_window: int, warmup: int, rules_ttl: float,
+                 flush_interval: float):
+        self.ewma_alpha = ewma_alpha
+        self.stats_window = stats_window
+        self.warmup = warmup
+        self.rules_ttl = rules_ttl
+        self.rules: Dict[int, AquariumRules] = {}
+        self.loading: Set[int] = set()
+        self.states: Dict[Tuple[int, str], MetricState] = {}
+        self.active: Set[Tuple[int, str, str]] = set()
+        self.alerts_raised = 0
+        self.notifications = TelemetryBuffer(
+            flush_size=200,
+            flush_interval=flush_interval,
+            max_queue=10_000,
+            writer=write_notifications,
+            name="сповіщень"
+        )
+
+    def start(self):
+        self.notifications.start()
+
+    async def stop(self):
+        await self.notifications.stop()
+
+    def invalidate(self, aquarium_id: int):
+        self.rules.pop(aquarium_id, None)
+
+    def invalidate_company(self, company_id: int):
+        # Склад компанії визначає отримувачів сповіщень, тож правила її акваріумів перечитуються
+        for aquarium_id in [aquarium_id for aquarium_id, rules in self.rules.items() if rules.company_id == company_id]:
+            del self.rules[aquarium_id]
+
+    def invalidate_user(self, user_id: int):
+        for aquarium_id in [aquarium_id for aquarium_id, rules in self.rules.items() if user_id in rules.user_ids]:
+            del self.rules[aquarium_id]
+
+    def observe(self, aquarium_id: int, measured_at: datetime, params: dict):
+        rules = self.rules.get(aquarium_id)
+        if rules is None or time.monotonic() - rules.loaded_at > self.rules_ttl:
+            self._schedule_load(aquarium_id)
+
+        timestamp = measured_at.timestamp()
+        for metric in METRICS:
+            value = params[metric]
+            state = self.states.get((aquarium_id, metric))
+            if state is None:
+                state = self.states[(aquarium_id, metric)] = MetricState()
+
+            if rules is not None:
+                rule = rules.thresholds.get(metric)
+                if rule is not None:
+                    z_score = state.z_score(value, self.warmup)
+                    state.update(value, timestamp, self.ewma_alpha, self.stats_window)
+                    self._evaluate(aquarium_id, metric, rule, rules, state, value, z_score)
+                    continue
+                self._clear_metric(aquarium_id, metric)
+            state.update(value, timestamp, self.ewma_alpha, self.stats_window)
+
+    def _evaluate(self, aquarium_id: int, metric: str, rule: ThresholdRule, rules: AquariumRules,
+                  state: MetricState, value: float, z_score: Optional[float]):
+        label = PARAMETER_NAMES[metric]
+        checks = []
+        if rule.min_value is not None:
+            checks.append(("low", value < rule.min_value, value >= rule.min_value + rule.hysteresis,
+                           f"{label} {value:.2f} нижче мінімуму {rule.min_value}"))
+        if rule.max_value is not None:
+            checks.append(("high", value > rule.max_value, value <= rule.max_value - rule.hysteresis,
+                           f"{label} {value:.2f} вище максимуму {rule.max_value}"))
+        if rule.max_rate is not None and state.rate is not None:
+            rate = abs(state.rate)
+            checks.append(("rate", rate > rule.max_rate, rate < rule.max_rate * CLEAR_RATIO,
+                           f"{label} змінюється надто швидко ({state.rate:+.2f} за хвилину, "
+                           f"допустимо {rule.max_rate})"))
+        if rule.max_z_score is not None and z_score is not None:
+            checks.append(("anomaly", z_score > rule.max_z_score, z_score < rule.max_z_score * CLEAR_RATIO,
+                           f"{label} {value:.2f} аномально відхиляється від середнього {state.mean:.2f} "
+                           f"(z = {z_score:.1f})"))
+
+        for kind, triggered, cleared, message in checks:
+            key = (aquarium_id, metric, kind)
+            if key in self.active:
+                if cleared:
+                    self.active.discard(key)
+            elif triggered:
+                self.active.add(key)
+                self._notify(rules, message)
+
+    def _clear_metric(self, aquarium_id: int, metric: str):
+        for kind in ("low", "high", "rate", "anomaly"):
+            self.active.discard((aquarium_id, metric, kind))
+
+    def _notify(self, rules: AquariumRules, message: str):
+        self.alerts_raised += 1
+        text = f"Акваріум «{rules.name}»: {message}"
+        for user_id in rules.user_ids:
+            self.notifications.add({"type": NotificationType.WATER_QUALITY, "message": text, "user_id": user_id})
+
+    def _schedule_load(self, aquarium_id: int):
+        if aquarium_id in self.loading:
+            return
+        self.loading.add(aquarium_id)
+        asyncio.create_task(self._load(aquarium_id))
+
+    async def _load(self, aquarium_id: int):
+        try:
+            self.rules[aquarium_id] = await asyncio.to_thread(self._load_rules, aquarium_id)
+        except Exception as e:
+            logger.error(f"Помилка при завантаженні порогів якості води для акваріума {aquarium_id}: {str(e)}")
+        finally:
+            self.loading.discard(aquarium_id)
+
+    @staticmethod
+    def _load_rules(aquarium_id: int) -> AquariumRules:
+        with DatabaseSession() as db:
+            aquarium = db.query(Aquarium).filter(Aquarium.id == aquarium_id).first()
+            if not aquarium:
+                return AquariumRules(None, None, [], {}, time.monotonic())
+
+            thresholds = db.query(WaterQualityThreshold).filter(
+                WaterQualityThreshold.aquarium_id == aquarium_id).all()
+            user_ids = [row.user_id for row in db.query(user_companies.c.user_id).filter(
+                user_companies.c.company_id == aquarium.company_id)]
+
+            return AquariumRules(
+                name=aquarium.name,
+                company_id=aquarium.company_id,
+                user_ids=user_ids,
+                thresholds={
+                    threshold.parameter: ThresholdRule(
+                        threshold.min_value, threshold.max_value, threshold.max_rate,
+                        threshold.max_z_score, threshold.hysteresis or 0.0
+                    )
+                    for threshold in thresholds
+                },
+                loaded_at=time.monotonic()
+            )
+
+    def stats(self) -> dict:
+        return {
+            "aquariums": len(self.rules),
+            "active_alerts": len(self.active),
+            "alerts_raised": self.alerts_raised,
+            "notifications": self.notifications.stats(),
+        }
+
+
+water_quality_alerts = WaterQualityAlerts(
+    ewma_alpha=settings.WATER_QUALITY_EWMA_ALPHA,
+    stats_window=settings.WATER_QUALITY_STATS_WINDOW,
+    warmup=settings.WATER_QUALITY_WARMUP,
+    rules_ttl=settings.WATER_QUALITY_RULES_TTL,
+    flush_interval=settings.WATER_QUALITY_FLUSH_INTERVAL
+)
+
+
+def get_water_quality_alerts() -> WaterQualityAlerts:
+    return water_quality_alerts
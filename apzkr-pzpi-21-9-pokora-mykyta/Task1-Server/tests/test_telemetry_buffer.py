@@ -0,0 +1,88 @@
+"""
+Буфер відкладеного запису телеметрії на справжній базі Postgres, яку задає DATABASE_URL.
+
+Запуск з каталогу Task1-Server:
+    python -m pytest tests
+"""
+import asyncio
+import pathlib
+import sys
+from datetime import datetime, timedelta
+from typing import List
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+sys.path.insert(0, str(pathlib.Path(__file__).parents[1]))
+
+try:
+    from data.session import DatabaseSession, db_engine
+except OperationalError:
+    pytest.skip("база Postgres недоступна", allow_module_level=True)
+
+from data.models import Aquarium, Company, WaterParameter  # noqa: E402
+from services.telemetry_buffer import TelemetryBuffer  # noqa: E402
+
+db_engine.echo = False
+
+
+@pytest.fixture
+def aquarium_id():
+    with DatabaseSession() as db:
+        company = Company(name="Тестова компанія буфера телеметрії")
+        aquarium = Aquarium(name="Тестовий акваріум буфера", capacity=100, company=company)
+        db.add(aquarium)
+        db.commit()
+        aquarium_id, company_id = aquarium.id, company.id
+    yield aquarium_id
+    with DatabaseSession() as db:
+        # Показники та агрегати видаляються каскадом разом з акваріумом
+        db.delete(db.get(Aquarium, aquarium_id))
+        db.delete(db.get(Company, company_id))
+        db.commit()
+
+
+def reading(aquarium_id: int, measured_at: datetime) -> dict:
+    return {"ph": 7.0, "temperature": 25.0, "salinity": 30.0, "oxygen_level": 8.0,
+            "measured_at": measured_at, "aquarium_id": aquarium_id}
+
+
+def test_rejects_only_rows_violating_constraints(aquarium_id):
+    # Рядок видаленого акваріума порушує зовнішній ключ і не повинен зупинити запис решти пакета
+    buffer = TelemetryBuffer(flush_size=10, flush_interval=60, max_queue=100)
+    started = datetime.now().replace(microsecond=0)
+    rows = [reading(aquarium_id, started + timedelta(seconds=i)) for i in range(9)]
+    rows.insert(4, reading(-1, started))
+    for row in rows:
+        buffer.add(row)
+
+    asyncio.run(buffer.flush())
+
+    with DatabaseSession() as db:
+        written = db.query(WaterParameter).filter(WaterParameter.aquarium_id == aquarium_id).count()
+    stats = buffer.stats()
+    assert written == 9
+    assert stats["rows_flushed"] == 9
+    assert stats["rows_rejected"] == 1
+    assert stats["failed_flushes"] == 0
+    assert stats["queue_depth"] == 0
+
+
+def test_requeues_batch_on_connection_error():
+    failures = []
+
+    def unavailable(db, rows: List[dict]):
+        failures.append(len(rows))
+        raise OperationalError("INSERT", {}, Exception("з'єднання розірвано"))
+
+    buffer = TelemetryBuffer(flush_size=10, flush_interval=60, max_queue=100, writer=unavailable)
+    for i in range(5):
+        buffer.add({"value": i})
+
+    asyncio.run(buffer.flush())
+
+    stats = buffer.stats()
+    assert failures == [5]
+    assert list(buffer.queue) == [{"value": i} for i in range(5)]
+    assert stats["failed_flushes"] == 1
+    assert stats["rows_rejected"] == 0
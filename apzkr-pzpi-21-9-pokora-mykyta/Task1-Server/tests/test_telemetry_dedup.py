@@ -0,0 +1,45 @@
+import asyncio
+import pathlib
+import sys
+from datetime import datetime
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+sys.path.insert(0, str(pathlib.Path(__file__).parents[1]))
+
+try:
+    import data.session  # noqa: F401
+except OperationalError:
+    pytest.skip("база Postgres недоступна", allow_module_level=True)
+
+from services.telemetry_dedup import FrameSequence, TelemetryDeduplicator  # noqa: E402
+
+
+def test_frame_is_seen_only_after_accept():
+    deduplicator = TelemetryDeduplicator(window_size=64, max_devices=100)
+    sequence = FrameSequence(device_id=1, boot_id=7, seq=5, device_ts=1000)
+
+    assert not deduplicator.is_duplicate(sequence)
+    assert not deduplicator.is_duplicate(sequence)
+    assert deduplicator.accept(sequence)
+    assert deduplicator.is_duplicate(sequence)
+    # Той самий кадр, що паралельно пройшов перевірку, відкидається при позначенні
+    assert not deduplicator.accept(sequence)
+
+
+def test_resend_after_failed_boot_lookup_is_not_duplicate(monkeypatch):
+    deduplicator = TelemetryDeduplicator(window_size=64, max_devices=100)
+    sequence = FrameSequence(device_id=1, boot_id=8, seq=1, device_ts=500)
+
+    def unavailable(frame: FrameSequence) -> datetime:
+        raise OperationalError("INSERT", {}, Exception("з'єднання розірвано"))
+
+    monkeypatch.setattr(TelemetryDeduplicator, "_load_boot", staticmethod(unavailable))
+    with pytest.raises(OperationalError):
+        asyncio.run(deduplicator.measured_at(sequence))
+
+    monkeypatch.setattr(TelemetryDeduplicator, "_load_boot", staticmethod(lambda frame: datetime(2026, 1, 1)))
+    assert not deduplicator.is_duplicate(sequence)
+    assert asyncio.run(deduplicator.measured_at(sequence)) == datetime(2026, 1, 1, 0, 0, 0, 500000)
+    assert deduplicator.accept(sequence)
@@ -0,0 +1,37 @@
+import pathlib
+import sys
+import time
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+sys.path.insert(0, str(pathlib.Path(__file__).parents[1]))
+
+try:
+    import data.session  # noqa: F401
+except OperationalError:
+    pytest.skip("база Postgres недоступна", allow_module_level=True)
+
+from services.water_quality_alerts import AquariumRules, WaterQualityAlerts  # noqa: E402
+
+
+def alerts_with_rules() -> WaterQualityAlerts:
+    alerts = WaterQualityAlerts(ewma_alpha=0.3, stats_window=100, warmup=10, rules_ttl=300, flush_interval=60)
+    alerts.rules = {
+        1: AquariumRules("Перший", 10, [100, 101], {}, time.monotonic()),
+        2: AquariumRules("Другий", 10, [100, 101], {}, time.monotonic()),
+        3: AquariumRules("Третій", 20, [102], {}, time.monotonic()),
+    }
+    return alerts
+
+
+def test_invalidate_company_drops_its_aquariums():
+    alerts = alerts_with_rules()
+    alerts.invalidate_company(10)
+    assert set(alerts.rules) == {3}
+
+
+def test_invalidate_user_drops_aquariums_notifying_them():
+    alerts = alerts_with_rules()
+    alerts.invalidate_user(102)
+    assert set(alerts.rules) == {1, 2}
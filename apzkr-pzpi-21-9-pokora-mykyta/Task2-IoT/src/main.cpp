@@ -10,7 +10,11 @@ void webSocketEvent(WStype_t type, uint8_t * payload, size_t length);
 void sendSensorData();
 void updateLCD(float temp, float ph, float salinity, float oxygen);
 void updateStatusLCD(bool connected);
-void feed();
+void feed(uint32_t command_id);
+void sendMessage(JsonDocument& doc);
+void handleCommand(const char* action, unsigned long interval, uint32_t command_id, uint32_t ts);
+void sendCommandResult(uint32_t command_id, bool success, const char* error);
+void sendPong(uint32_t ts);
 
 #define DHTPIN 15
 #define DHTTYPE DHT22
@@ -29,15 +33,26 @@ const char* websockets_server = "host.wokwi.internal";
 const uint16_t websockets_port = 8000;
 const char* websockets_route = "/ws/ESP21_0";
 const char* unique_address = "ESP21_0";
+const char* firmware_version = "1.4.0";
+// Бінарний протокол MessagePack з короткими ключами; сервер приймає і JSON від старих прошивок
+const char* websockets_protocol = "finfare.msgpack";
 
 
 WebSocketsClient webSocket;
 bool is_active = false;
 bool is_connected = false;
+// Період надсилання показників, сервер може збільшити його командою slow_down
+unsigned long sensor_interval = 600;
+// Ідентифікатор старту та номер кадру, за якими сервер відкидає повторно надіслані показники
+uint32_t boot_id = 0;
+uint32_t frame_seq = 0;
+// Останнє виконане годування: сервер повторює непідтверджену команду з тим самим ідентифікатором
+uint32_t last_feed_command_id = 0;
 
 void setup() {
   Serial.begin(115200);
   dht.begin();
+  boot_id = esp_random();
 
   Wire.begin();
   lcd.init();
@@ -58,7 +73,7 @@ void setup() {
   Serial.println(WiFi.localIP());
 
   Serial.print("Підключення до WebSocket: ");
-  webSocket.begin(websockets_server, websockets_port, websockets_route);
+  webSocket.begin(websockets_server, websockets_port, websockets_route, websockets_protocol);
   webSocket.onEvent(webSocketEvent);
   webSocket.setReconnectInterval(5000);
 }
@@ -71,14 +86,14 @@ void loop() {
     lastConnectionCheck = millis();
     if (!is_connected) {
       Serial.println("Спроба повторного підключення...");
-      webSocket.begin(websockets_server, websockets_port, websockets_route);
+      webSocket.begin(websockets_server, websockets_port, websockets_route, websockets_protocol);
     }
   }
   
   if (is_active && is_connected) {
     static unsigned long lastTime = 0;
     unsigned long now = millis();
-    if (now - lastTime > 600) {
+    if (now - lastTime > sensor_interval) {
       lastTime = now;
       sendSensorData();
     }
@@ -100,25 +115,26 @@ void webSocketEvent(WStype_t type, uint8_t * payload, size_t length) {
       Serial.println("Підключено до WebSocket сервера");
       is_connected = true;
       updateStatusLCD(is_connected);
-      webSocket.sendTXT("{\"action\":\"identify\",\"unique_address\":\"" + String(unique_address) + "\"}");
+      doc["a"] = "i";
+      doc["u"] = unique_address;
+      doc["fw"] = firmware_version;
+      sendMessage(doc);
       break;
     case WStype_TEXT:
       Serial.printf("Отримано повідомлення: %s\n", payload);
       if (deserializeJson(doc, payload) == DeserializationError::Ok) {
-        if (doc["action"] == "activate") {
-          is_active = true;
-          Serial.println("Пристрій активовано");
-        } else if (doc["action"] == "deactivate") {
-          is_active = false;
-          Serial.println("Пристрій деактивовано");
-          updateStatusLCD(is_connected);
-        } else if (doc["action"] == "feed" && is_active) {
-          feed();
-        }
+        handleCommand(doc["action"].as<const char*>(), doc["interval"] | 0UL, doc["command_id"] | 0UL, doc["ts"] | 0UL);
       } else {
         Serial.println("Помилка розбору JSON");
       }
       break;
+    case WStype_BIN:
+      if (deserializeMsgPack(doc, payload, length) == DeserializationError::Ok) {
+        handleCommand(doc["a"].as<const char*>(), doc["iv"] | 0UL, doc["c"] | 0UL, doc["ts"] | 0UL);
+      } else {
+        Serial.println("Помилка розбору MessagePack");
+      }
+      break;
     case WStype_ERROR:
       Serial.println("Помилка WebSocket з'єднання");
       break;
@@ -140,16 +156,16 @@ void sendSensorData() {
   float rawTemperature = dht.readTemperature();
 
   JsonDocument doc;
-  doc["action"] = "water_parameters";
-  doc["unique_address"] = unique_address;
-  doc["parameters"]["ph"] = rawPH;
-  doc["parameters"]["temperature"] = rawTemperature;
-  doc["parameters"]["salinity"] = rawSalinity;
-  doc["parameters"]["oxygen_level"] = rawOxygen;
-
-  String jsonString;
-  serializeJson(doc, jsonString);
-  webSocket.sendTXT(jsonString);
+  doc["a"] = "w";
+  doc["b"] = boot_id;
+  doc["n"] = frame_seq++;
+  doc["t"] = millis();
+  JsonArray parameters = doc["p"].to<JsonArray>();
+  parameters.add(rawPH);
+  parameters.add(rawTemperature);
+  parameters.add(rawSalinity);
+  parameters.add(rawOxygen);
+  sendMessage(doc);
 
   updateLCD(rawTemperature, rawPH, rawSalinity, rawOxygen);
 
@@ -175,22 +191,83 @@ void updateStatusLCD(bool connected) {
   lcd.print(is_active ? "Device: Active" : "Device: Inactive");
 }
 
-void feed() {
-  if (is_active) {
-    Serial.println("Годування...");
-    for (int pos = 0; pos <= 180; pos += 1) {
-      digitalWrite(SERVO_PIN, HIGH);
-      delayMicroseconds(pos * 10 + 600);
-      digitalWrite(SERVO_PIN, LOW);
-      delay(20);
-    }
-    webSocket.sendTXT("{\"action\":\"feed_result\",\"success\":true,\"unique_address\":\"" + String(unique_address) + "\"}");
-    Serial.println("Годування завершено");
-    
-    lcd.clear();
-    lcd.setCursor(0, 0);
-    lcd.print("Feeding...");
-    delay(2000);
-    sendSensorData();
+void feed(uint32_t command_id) {
+  if (!is_active) {
+    sendCommandResult(command_id, false, "inactive");
+    return;
+  }
+  if (command_id != 0 && command_id == last_feed_command_id) {
+    // Повтор уже виконаної команди: лише підтверджуємо її ще раз
+    sendCommandResult(command_id, true, nullptr);
+    return;
+  }
+  Serial.println("Годування...");
+  for (int pos = 0; pos <= 180; pos += 1) {
+    digitalWrite(SERVO_PIN, HIGH);
+    delayMicroseconds(pos * 10 + 600);
+    digitalWrite(SERVO_PIN, LOW);
+    delay(20);
+  }
+  last_feed_command_id = command_id;
+  JsonDocument doc;
+  doc["a"] = "r";
+  doc["c"] = command_id;
+  doc["ok"] = true;
+  sendMessage(doc);
+  Serial.println("Годування завершено");
+  
+  lcd.clear();
+  lcd.setCursor(0, 0);
+  lcd.print("Feeding...");
+  delay(2000);
+  sendSensorData();
+}
+
+void sendMessage(JsonDocument& doc) {
+  uint8_t buffer[128];
+  size_t length = serializeMsgPack(doc, buffer, sizeof(buffer));
+  webSocket.sendBIN(buffer, length);
+}
+
+void sendCommandResult(uint32_t command_id, bool success, const char* error) {
+  if (command_id == 0) return;
+  JsonDocument doc;
+  doc["a"] = "cr";
+  doc["c"] = command_id;
+  doc["ok"] = success;
+  if (error != nullptr) {
+    doc["e"] = error;
   }
-}
\ No newline at end of file
+  sendMessage(doc);
+}
+
+void handleCommand(const char* action, unsigned long interval, uint32_t command_id, uint32_t ts) {
+  if (action == nullptr) return;
+
+  // Сервер надсилає короткі коди дій у MessagePack і повні назви в JSON
+  if (strcmp(action, "a") == 0 || strcmp(action, "activate") == 0) {
+    is_active = true;
+    Serial.println("Пристрій активовано");
+    sendCommandResult(command_id, true, nullptr);
+  } else if (strcmp(action, "d") == 0 || strcmp(action, "deactivate") == 0) {
+    is_active = false;
+    Serial.println("Пристрій деактивовано");
+    updateStatusLCD(is_connected);
+    sendCommandResult(command_id, true, nullptr);
+  } else if (strcmp(action, "pi") == 0 || strcmp(action, "ping") == 0) {
+    sendPong(ts);
+  } else if (strcmp(action, "f") == 0 || strcmp(action, "feed") == 0) {
+    feed(command_id);
+  } else if ((strcmp(action, "sd") == 0 || strcmp(action, "slow_down") == 0) && interval > sensor_interval) {
+    sensor_interval = interval;
+    Serial.printf("Сервер просить надсилати показники не частіше ніж раз на %lu мс\n", sensor_interval);
+  }
+}
+
+void sendPong(uint32_t ts) {
+  // Сервер рахує затримку heartbeat за власною міткою, тож її повертаємо без змін
+  JsonDocument doc;
+  doc["a"] = "po";
+  doc["ts"] = ts;
+  sendMessage(doc);
+}
@@ -100,6 +100,17 @@ export const deviceApi = {
         api.get(`/aquariums/${aquariumId}/water-parameters`, { params: { start_date: startDate, end_date: endDate } }),
 };
 
+// Показники води та стан пристроїв наживо замість повторних запитів до /water-parameters
+export const liveApi = {
+    subscribe: (aquariumIds, onMessage) => {
+        const token = localStorage.getItem('access_token');
+        const socket = new WebSocket(`${API_URL.replace(/^http/, 'ws')}/live/water-parameters?token=${token}`);
+        socket.onopen = () => socket.send(JSON.stringify({ action: 'subscribe', aquarium_ids: aquariumIds }));
+        socket.onmessage = (event) => onMessage(JSON.parse(event.data));
+        return () => socket.close();
+    },
+};
+
 export const feedingScheduleApi = {
     getAquariumFeedingSchedules: (aquariumId) => api.get(`/aquariums/${aquariumId}/feeding-schedules`),
     addFeedingSchedule: (aquariumId, scheduleData) => api.post(`/aquariums/${aquariumId}/feeding-schedules`, scheduleData),
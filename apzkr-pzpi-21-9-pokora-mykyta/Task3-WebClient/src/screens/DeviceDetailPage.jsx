@@ -10,8 +10,8 @@ import { LocalizationProvider } from '@mui/x-date-pickers/LocalizationProvider';
 import { AdapterDateFns } from '@mui/x-date-pickers/AdapterDateFns';
 import ArrowBackIcon from '@mui/icons-material/ArrowBack';
 import { useTranslation } from 'react-i18next';
-import { deviceApi } from '../api';
-import { format, parseISO, subDays } from 'date-fns';
+import { deviceApi, liveApi } from '../api';
+import { format, isToday, parseISO, subDays } from 'date-fns';
 import { LineChart, Line, XAxis, YAxis, CartesianGrid, Tooltip, Legend, ResponsiveContainer } from 'recharts';
 
 const DeviceDetailPage = () => {
@@ -23,11 +23,25 @@ const DeviceDetailPage = () => {
     const [loading, setLoading] = useState(true);
     const [startDate, setStartDate] = useState(subDays(new Date(), 7));
     const [endDate, setEndDate] = useState(new Date());
+    const [online, setOnline] = useState(null);
 
     useEffect(() => {
         fetchDeviceAndParameters();
     }, [aquariumId, startDate, endDate]);
 
+    useEffect(() => {
+        if (!device) return;
+        return liveApi.subscribe([device.aquarium_id], (message) => {
+            if (message.type === 'status') {
+                if (message.online !== undefined) setOnline(message.online);
+                if (message.is_active !== undefined) setDevice((current) => ({ ...current, is_active: message.is_active }));
+            } else if (message.type === 'reading' && isToday(endDate)) {
+                // Нові показники додаються лише до періоду, що закінчується сьогодні
+                setWaterParameters((current) => [...current, message.data]);
+            }
+        });
+    }, [device?.aquarium_id, endDate]);
+
     const fetchDeviceAndParameters = async () => {
         setLoading(true);
         try {
@@ -77,6 +91,9 @@ const DeviceDetailPage = () => {
                 <Typography variant="h4" gutterBottom>{t('deviceDetails')}</Typography>
                 <Typography variant="h6">{t('deviceAddress')}: {device.unique_address}</Typography>
                 <Typography>{t('status')}: {device.is_active ? t('active') : t('inactive')}</Typography>
+                {online !== null && (
+                    <Typography>{t('connection')}: {online ? t('online') : t('offline')}</Typography>
+                )}
             </Paper>
 
             <Paper elevation={3} sx={{ mt: 3, p: 3 }}>
@@ -115,7 +132,7 @@ const DeviceDetailPage = () => {
                         </TableHead>
                         <TableBody>
                             {waterParameters.map((param) => (
-                                <TableRow key={param.id}>
+                                <TableRow key={param.id ?? param.measured_at}>
                                     <TableCell>{format(parseISO(param.measured_at), 'yyyy-MM-dd HH:mm:ss')}</TableCell>
                                     <TableCell>{param.ph}</TableCell>
                                     <TableCell>{param.temperature}°C</TableCell>